@@ -1,54 +1,88 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
 from sqlalchemy.orm import Session
-from app.db.session import SessionLocal
+from typing import Optional
+from datetime import datetime
+from app.api.deps import get_db
+from app.db.session import get_engine_main
+from app.db.streaming import iter_ndjson
 from app.models.admin import Administrador
 from app.schemas.admin_schema import AdminCreate, AdminOut
+from app.schemas.log_schema import LogOut
+from app.services.audit_service import registrar_evento, consultar_logs
+from app.services.credencial_service import hashear
+from app.services.uid_service import siguiente_uid
 
 router = APIRouter(prefix="/admin", tags=["Admin"])
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+# Columnas públicas (las de AdminOut) para el modo streaming
+COLUMNAS_SALIDA = [
+    Administrador.id, Administrador.uid, Administrador.nombre, Administrador.correo,
+    Administrador.rol, Administrador.foto_url, Administrador.activo,
+    Administrador.creado_en, Administrador.actualizado_en,
+]
 
 
 @router.post("/users", response_model=AdminOut)
 def crear_admin(admin: AdminCreate, db: Session = Depends(get_db)):
-    # 1️⃣ Buscar el último UID insertado
-    ultimo = db.query(Administrador).order_by(Administrador.uid.desc()).first()
-
-    if ultimo:
-        # 2️⃣ Extraer número de UID actual: ADM10 → 10
-        numero_actual = int(ultimo.uid.replace("ADM", ""))
-        nuevo_numero = numero_actual + 1
-    else:
-        nuevo_numero = 1  # Si no hay registros, empezamos desde 1
+    # 1️⃣ Generar UID nuevo (ADM1, ADM2, ...) desde el contador compartido
+    nuevo_uid = siguiente_uid("ADM")
 
-    # 3️⃣ Generar UID nuevo
-    nuevo_uid = f"ADM{nuevo_numero}"
-
-    # 4️⃣ Crear nuevo admin
+    # 2️⃣ Crear nuevo admin
     nuevo = Administrador(
         uid=nuevo_uid,
         nombre=admin.nombre,
         correo=admin.correo,
         rol=admin.rol,
         foto_url=admin.foto_url,
-        password=admin.password
+        password=hashear(admin.password)
     )
 
 
     db.add(nuevo)
     db.commit()
     db.refresh(nuevo)
+    registrar_evento("crear_admin", f"uid={nuevo.uid} correo={nuevo.correo}")
     return nuevo
 
 @router.get("/users", response_model=list[AdminOut])
-def listar_admins(db: Session = Depends(get_db)):
-    admins = db.query(Administrador).all()
+def listar_admins(
+    request: Request,
+    response: Response,
+    after: Optional[int] = Query(None, description="Cursor: id del último admin recibido"),
+    limit: int = Query(100, ge=1, le=1000),
+    formato: Optional[str] = Query(None, pattern="^(json|ndjson)$"),
+    db: Session = Depends(get_db)
+):
+    # Paginación por cursor sobre id; siguiente página con after=<X-Next-Cursor>
+    filtros = [Administrador.id > after] if after is not None else []
+
+    if formato == "ndjson" or (formato is None and "application/x-ndjson" in request.headers.get("accept", "")):
+        stmt = select(*COLUMNAS_SALIDA).where(*filtros).order_by(Administrador.id)
+        return StreamingResponse(iter_ndjson(get_engine_main(), stmt), media_type="application/x-ndjson")
+
+    admins = db.query(Administrador).filter(*filtros).order_by(Administrador.id).limit(limit + 1).all()
+    if len(admins) > limit:
+        admins = admins[:limit]
+        response.headers["X-Next-Cursor"] = str(admins[-1].id)
     return admins
-@router.get("/logs")
-def listar_logs():
-    return {"message": "Aquí irán los logs"}
+
+@router.get("/logs", response_model=list[LogOut])
+def listar_logs(
+    response: Response,
+    admin_id: Optional[int] = None,
+    accion: Optional[str] = None,
+    desde: Optional[datetime] = None,
+    hasta: Optional[datetime] = None,
+    cursor: Optional[str] = Query(None, description="Cursor: X-Next-Cursor de la página anterior"),
+    limit: int = Query(100, ge=1, le=1000),
+):
+    # Más recientes primero; siguiente página con cursor=<X-Next-Cursor>
+    try:
+        filas, siguiente = consultar_logs(admin_id, accion, desde, hasta, cursor, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if siguiente:
+        response.headers["X-Next-Cursor"] = siguiente
+    return filas
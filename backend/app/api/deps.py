@@ -0,0 +1,31 @@
+# app/api/deps.py
+# Dependencias compartidas por todos los routers
+from app.db.session import SessionLocal, SessionRadius, AsyncSessionLocal, AsyncSessionRadius
+
+# -------------------------------------------------------------
+# 📦 Sesiones síncronas (endpoints def, corren en el threadpool)
+# -------------------------------------------------------------
+def get_db():
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+def get_radius_db():
+    db = SessionRadius()
+    try:
+        yield db
+    finally:
+        db.close()
+
+# -------------------------------------------------------------
+# ⚡ Sesiones asíncronas (endpoints async def, no ocupan hilos)
+# -------------------------------------------------------------
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+async def get_async_radius_db():
+    async with AsyncSessionRadius() as db:
+        yield db
@@ -0,0 +1,41 @@
+from datetime import datetime
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+
+from app.services.exportacion_service import (
+    DATASETS, FORMATOS, ExportacionOcupada, ParquetNoDisponible, exportar, nombre_archivo,
+)
+
+router = APIRouter(prefix="/export", tags=["Exportación"])
+
+# -------------------------------------------------------------
+# 📦 1. Exportación en streaming (CSV gzip / Parquet)
+# -------------------------------------------------------------
+@router.get("/{dataset}")
+def exportar_dataset(
+    dataset: str,
+    formato: str = Query("csv", pattern="^(csv|parquet)$"),
+    desde: Optional[datetime] = Query(None, description="Inicio del rango (incluido)"),
+    hasta: Optional[datetime] = Query(None, description="Fin del rango (excluido)"),
+    tam_lote: Optional[int] = Query(None, ge=100, le=100000, description="Filas por partición del cursor"),
+):
+    """
+    Exporta usuarios_invitados (por creado_en), admin_logs (por fech) o
+    radacct (por acctstarttime) leyendo con un cursor del servidor: la
+    memoria no crece con el número de filas. Por ejemplo, un mes:
+    `?desde=2026-09-01&hasta=2026-10-01`.
+    """
+    if dataset not in DATASETS:
+        raise HTTPException(status_code=404, detail=f"Dataset desconocido; opciones: {', '.join(DATASETS)}")
+    try:
+        bloques = exportar(dataset, formato, desde, hasta, tam_lote)
+    except ParquetNoDisponible as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    except ExportacionOcupada:
+        raise HTTPException(status_code=429, detail="Hay demasiadas exportaciones en curso",
+                            headers={"Retry-After": "30"})
+    archivo = nombre_archivo(dataset, formato, desde, hasta)
+    return StreamingResponse(bloques, media_type=FORMATOS[formato][0],
+                             headers={"Content-Disposition": f'attachment; filename="{archivo}"'})
@@ -1,35 +1,79 @@
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, Request
+from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, Request, Response, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import bindparam, insert, select, update
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime, timedelta
-import time
+import hashlib
+import logging
+from typing import Optional
 
-from app.db.session import SessionLocal
+from app.api.deps import get_db, get_async_db
+from app.db.session import get_engine_main
+from app.db.streaming import iter_ndjson
 from app.models.invitado import UsuarioInvitado
-from app.schemas.invitado_schema import InvitadoCreate, InvitadoOut
-from app.services.radius_service import crear_usuario_radius
-from app.services.coa_service import enviar_coa
-from app.services.network_service import autorizar_usuario, revocar_usuario
+from app.schemas.invitado_schema import InvitadoCreate, InvitadoOut, InvitadoBulkCreate, InvitadoBulkOut, DesconexionBulk, RevocacionBulk
+from app.services.radius_service import crear_usuario_radius, crear_usuarios_radius, eliminar_usuarios_radius
+from app.services.audit_service import registrar_evento
+from app.services.cache_service import cache_invitados, invitado_por_uid
+from app.services.credencial_service import PENDIENTE, hashear, verificador
+from app.services.expiracion_service import calcular_expiracion
+from app.services.lease_service import registrar_lease
+from app.services.perfil_service import perfil_existe
+from app.services.revocacion_service import revocar_invitados
+from app.services.coa_service import desconectar_usuario_radius, desconectar_usuarios_radius
+from app.services.network_service import autorizar_usuario
+from app.services.scheduler_service import programar_revocacion
+from app.services.sesion_ip_service import indice_sesiones
+from app.services.uid_service import siguiente_uid, reservar_uids
 
 
 router = APIRouter(prefix="/users", tags=["Invitados"])
+logger = logging.getLogger(__name__)
 
-# -------------------------------------------------------------
-# 📦 Dependencia para obtener la sesión de base de datos
-# -------------------------------------------------------------
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+# Columnas públicas (las de InvitadoOut) para el modo streaming
+COLUMNAS_SALIDA = [
+    UsuarioInvitado.id, UsuarioInvitado.uid, UsuarioInvitado.username,
+    UsuarioInvitado.expiracion, UsuarioInvitado.session_timeout, UsuarioInvitado.estado,
+    UsuarioInvitado.creado_en, UsuarioInvitado.actualizado_en,
+]
 
 # -------------------------------------------------------------
 # 🧩 Sesión temporal (autoriza y revoca IP automáticamente)
 # -------------------------------------------------------------
-def sesion_temporal(ip: str, duracion_seg: int):
-    autorizar_usuario(ip)
-    time.sleep(duracion_seg)
-    revocar_usuario(ip)
+def sesion_temporal(ip: str, duracion_seg: int, username: Optional[str] = None):
+    # El lease en BD permite reconstruir el firewall tras un reinicio; va antes
+    # que la regla para que el reconciliador no la tome por huérfana
+    if username is not None:
+        registrar_lease(ip, username, duracion_seg)
+    autorizar_usuario(ip, duracion_seg)
+    if username is not None:
+        indice_sesiones.registrar_portal(ip, username, duracion_seg)
+    # La revocación la dispara el programador compartido, sin ocupar un worker;
+    # el username permite al barrido de expirados encontrar la IP
+    programar_revocacion(ip, duracion_seg, username)
+
+def hashear_alta_masiva(pendientes: list[tuple[int, str, str]], tam_lote: int = 100):
+    """
+    Calcula los hashes de un alta masiva, `(id, username, password)`, fuera
+    de la petición y los guarda por lotes. Solo reemplaza filas que siguen en
+    PENDIENTE: si el invitado ya entró, el login guardó su propio hash.
+    """
+    tabla = UsuarioInvitado.__table__
+    stmt = (
+        update(tabla)
+        .where(tabla.c.id == bindparam("b_id"), tabla.c.password == PENDIENTE)
+        .values(password=bindparam("b_hash"))
+    )
+    try:
+        for i in range(0, len(pendientes), tam_lote):
+            lote = pendientes[i:i + tam_lote]
+            filas = [{"b_id": id_, "b_hash": hashear(password)} for id_, _, password in lote]
+            with get_engine_main().begin() as conn:
+                conn.execute(stmt, filas)
+            cache_invitados.invalidar_usernames([username for _, username, _ in lote])
+    except Exception:
+        logger.exception("No se pudieron guardar los hashes de un alta masiva (quedan para el primer login)")
 
 # -------------------------------------------------------------
 # 🧩 1. Crear invitado nuevo
@@ -41,21 +85,17 @@ def crear_invitado(
     background_tasks: BackgroundTasks,
     db: Session = Depends(get_db)
 ):
-    # Generar UID autoincremental tipo USR1, USR2, etc.
-    ultimo = db.query(UsuarioInvitado).order_by(UsuarioInvitado.id.desc()).first()
-    nuevo_numero = 1
-    if ultimo and ultimo.uid and ultimo.uid.startswith("USR"):
-        try:
-            nuevo_numero = int(ultimo.uid.replace("USR", "")) + 1
-        except ValueError:
-            nuevo_numero = 1
-    nuevo_uid = f"USR{nuevo_numero}"
+    if data.perfil and not perfil_existe(data.perfil):
+        raise HTTPException(status_code=400, detail=f"El perfil {data.perfil} no existe")
+
+    # UID tipo USR1, USR2, etc. (reservado por bloques, sin consultar la tabla)
+    nuevo_uid = siguiente_uid("USR")
 
     nuevo = UsuarioInvitado(
         uid=nuevo_uid,
         username=data.username,
-        password=data.password,
-        expiracion=data.expiracion,
+        password=hashear(data.password),  # radcheck sigue en claro (Cleartext-Password)
+        expiracion=calcular_expiracion(data.expiracion, data.session_timeout),
         session_timeout=data.session_timeout,
         creado_por=data.creado_por,
         estado="activo"
@@ -64,6 +104,7 @@ def crear_invitado(
     db.add(nuevo)
     db.commit()
     db.refresh(nuevo)
+    cache_invitados.invalidar(username=nuevo.username)
 
     # Crear también en FreeRADIUS
     try:
@@ -72,34 +113,176 @@ def crear_invitado(
             password=data.password,
             session_timeout=data.session_timeout,
             max_down=getattr(data, "max_down", None),
-            max_up=getattr(data, "max_up", None)
+            max_up=getattr(data, "max_up", None),
+            perfil=data.perfil
         )
 
         # 🔹 Autorizar IP temporalmente
         ip_cliente = request.client.host
         duracion_seg = data.session_timeout * 60 if data.session_timeout else 600  # 10 min por defecto
-        background_tasks.add_task(sesion_temporal, ip_cliente, duracion_seg)
+        if nuevo.expiracion is not None:
+            # nunca más allá de la expiración del invitado (ni para uno ya vencido)
+            duracion_seg = min(duracion_seg, int((nuevo.expiracion - datetime.now()).total_seconds()))
+        if duracion_seg > 0:
+            background_tasks.add_task(sesion_temporal, ip_cliente, duracion_seg, data.username)
 
     except Exception as e:
         db.delete(nuevo)
         db.commit()
         raise HTTPException(status_code=500, detail=f"Error al crear en RADIUS: {e}")
 
+    registrar_evento("crear_invitado", f"uid={nuevo.uid} username={nuevo.username}", data.creado_por)
     return nuevo
 
+# -------------------------------------------------------------
+# 📦 1b. Alta masiva de invitados (eventos)
+# -------------------------------------------------------------
+@router.post("/bulk", response_model=InvitadoBulkOut)
+def crear_invitados_bulk(data: InvitadoBulkCreate, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
+    """
+    Crea muchos invitados con una transacción por base de datos:
+    un executemany para usuarios_invitados y otro por tabla de RADIUS.
+    Las filas inválidas (username repetido) se reportan en `errores`
+    y no impiden crear el resto.
+    Las contraseñas se guardan como PENDIENTE y se hashean después en un
+    hilo aparte (scrypt a costo de producción son ~50 ms por invitado); hasta
+    entonces el login las verifica contra radcheck.
+    """
+    errores = []
+    validos: list[tuple[int, InvitadoCreate]] = []
+    vistos = set()
+    perfiles = {inv.perfil for inv in data.invitados if inv.perfil}
+    perfiles_validos = {p for p in perfiles if perfil_existe(p)}
+    for i, inv in enumerate(data.invitados):
+        if inv.perfil and inv.perfil not in perfiles_validos:
+            errores.append({"indice": i, "username": inv.username, "error": "perfil no existe"})
+            continue
+        if inv.username in vistos:
+            errores.append({"indice": i, "username": inv.username, "error": "username repetido en el lote"})
+            continue
+        vistos.add(inv.username)
+        validos.append((i, inv))
+
+    if vistos:
+        # Trozos de 1000 para no pasar el límite de parámetros por sentencia
+        lista = list(vistos)
+        existentes = {
+            u
+            for i in range(0, len(lista), 1000)
+            for (u,) in db.query(UsuarioInvitado.username).filter(UsuarioInvitado.username.in_(lista[i:i + 1000]))
+        }
+        for i, inv in [v for v in validos if v[1].username in existentes]:
+            errores.append({"indice": i, "username": inv.username, "error": "username ya existe"})
+        validos = [v for v in validos if v[1].username not in existentes]
+
+    if not validos:
+        return {"creados": [], "errores": errores}
+
+    uids = reservar_uids("USR", len(validos))
+    ahora = datetime.now()
+    filas = [
+        {
+            "uid": uid,
+            "username": inv.username,
+            "password": PENDIENTE,
+            "expiracion": calcular_expiracion(inv.expiracion, inv.session_timeout, ahora),
+            "session_timeout": inv.session_timeout,
+            "creado_por": inv.creado_por,
+            "estado": "activo",
+        }
+        for uid, (_, inv) in zip(uids, validos)
+    ]
+    usernames = [f["username"] for f in filas]
+
+    try:
+        db.execute(insert(UsuarioInvitado), filas)
+        db.flush()
+        # RADIUS en su propia transacción; si falla, se descarta la principal
+        crear_usuarios_radius([
+            {
+                "username": inv.username,
+                "password": inv.password,
+                "session_timeout": inv.session_timeout or 0,
+                "max_down": inv.max_down,
+                "max_up": inv.max_up,
+                "perfil": inv.perfil,
+            }
+            for _, inv in validos
+        ])
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Error en alta masiva: {e}")
+
+    try:
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        eliminar_usuarios_radius(usernames)
+        raise HTTPException(status_code=500, detail=f"Error en alta masiva: {e}")
+
+    creados = sorted(
+        (c for i in range(0, len(usernames), 1000)
+         for c in db.query(UsuarioInvitado).filter(UsuarioInvitado.username.in_(usernames[i:i + 1000]))),
+        key=lambda c: c.id,
+    )
+    cache_invitados.invalidar_usernames(usernames)
+    passwords = {inv.username: inv.password for _, inv in validos}
+    # Se encola al terminar la respuesta, en el hilo de fondo del verificador
+    background_tasks.add_task(verificador.en_segundo_plano, hashear_alta_masiva,
+                              [(c.id, c.username, passwords[c.username]) for c in creados])
+    for c in creados:
+        registrar_evento("crear_invitado", f"uid={c.uid} username={c.username} (masivo)", c.creado_por)
+    return {"creados": creados, "errores": errores}
+
 # -------------------------------------------------------------
 # 📜 2. Listar todos los invitados
 # -------------------------------------------------------------
 @router.get("/", response_model=list[InvitadoOut])
-def listar_invitados(db: Session = Depends(get_db)):
-    return db.query(UsuarioInvitado).all()
+def listar_invitados(
+    request: Request,
+    response: Response,
+    after: Optional[int] = Query(None, description="Cursor: id del último invitado recibido"),
+    limit: int = Query(100, ge=1, le=1000),
+    estado: Optional[str] = None,
+    creado_por: Optional[int] = None,
+    formato: Optional[str] = Query(None, pattern="^(json|ndjson)$"),
+    db: Session = Depends(get_db)
+):
+    """
+    Paginación por cursor (keyset sobre id): la siguiente página se pide con
+    `after=<X-Next-Cursor>`. Con `formato=ndjson` (o Accept: application/x-ndjson)
+    se transmiten todas las filas filtradas sin construir objetos ORM.
+    """
+    filtros = []
+    if after is not None:
+        filtros.append(UsuarioInvitado.id > after)
+    if estado:
+        filtros.append(UsuarioInvitado.estado == estado)
+    if creado_por is not None:
+        filtros.append(UsuarioInvitado.creado_por == creado_por)
+
+    if formato == "ndjson" or (formato is None and "application/x-ndjson" in request.headers.get("accept", "")):
+        stmt = select(*COLUMNAS_SALIDA).where(*filtros).order_by(UsuarioInvitado.id)
+        return StreamingResponse(iter_ndjson(get_engine_main(), stmt), media_type="application/x-ndjson")
+
+    invitados = (
+        db.query(UsuarioInvitado)
+        .filter(*filtros)
+        .order_by(UsuarioInvitado.id)
+        .limit(limit + 1)
+        .all()
+    )
+    if len(invitados) > limit:
+        invitados = invitados[:limit]
+        response.headers["X-Next-Cursor"] = str(invitados[-1].id)
+    return invitados
 
 # -------------------------------------------------------------
 # 🔍 3. Obtener un invitado específico por UID
 # -------------------------------------------------------------
 @router.get("/{uid}", response_model=InvitadoOut)
-def obtener_invitado(uid: str, db: Session = Depends(get_db)):
-    invitado = db.query(UsuarioInvitado).filter_by(uid=uid).first()
+async def obtener_invitado(uid: str, db: AsyncSession = Depends(get_async_db)):
+    invitado = await invitado_por_uid(db, uid)
     if not invitado:
         raise HTTPException(status_code=404, detail="Invitado no encontrado")
     return invitado
@@ -108,33 +291,48 @@ def obtener_invitado(uid: str, db: Session = Depends(get_db)):
 # ❌ 4. Eliminar un invitado
 # -------------------------------------------------------------
 @router.delete("/{uid}")
-def eliminar_invitado(uid: str, db: Session = Depends(get_db)):
-    invitado = db.query(UsuarioInvitado).filter_by(uid=uid).first()
+async def eliminar_invitado(uid: str, db: AsyncSession = Depends(get_async_db)):
+    invitado = await invitado_por_uid(db, uid)
     if not invitado:
         raise HTTPException(status_code=404, detail="Invitado no encontrado")
 
-    db.delete(invitado)
-    db.commit()
-    return {"message": f"Invitado {uid} eliminado correctamente"}
+    # Borra la fila y además sus credenciales RADIUS, su sesión (CoA) y su IP en el firewall
+    [resultado] = await revocar_invitados([invitado.username], eliminar=True)
+    return {"message": f"Invitado {uid} eliminado correctamente", "revocacion": resultado}
 
 # -------------------------------------------------------------
 # ⏳ 5. Verificar estado de sesión
 # -------------------------------------------------------------
 @router.get("/{uid}/estado")
-def verificar_estado(uid: str, db: Session = Depends(get_db)):
-    invitado = db.query(UsuarioInvitado).filter_by(uid=uid).first()
+async def verificar_estado(
+    uid: str,
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db)
+):
+    invitado = await invitado_por_uid(db, uid)
     if not invitado:
         raise HTTPException(status_code=404, detail="Invitado no encontrado")
 
+    # `expiracion` se fija al crear y el barrido mantiene `estado` al día;
+    # el cálculo con creado_en solo cubre filas anteriores a ese cambio
     expiracion = invitado.expiracion or (
-        invitado.creado_en + timedelta(minutes=invitado.session_timeout)
+        invitado.creado_en + timedelta(minutes=invitado.session_timeout or 0)
     )
     tiempo_restante = expiracion - datetime.now()
     activo = tiempo_restante.total_seconds() > 0 and invitado.estado == "activo"
 
+    # El ETag no incluye el tiempo restante (cambia en cada llamada): el cliente
+    # lo calcula con `expiracion` y solo recibe cuerpo nuevo si algo cambió
+    etag = 'W/"' + hashlib.sha1(f"{uid}|{invitado.estado}|{expiracion}|{activo}".encode()).hexdigest()[:20] + '"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache"
     return {
         "uid": uid,
         "activo": activo,
+        "expiracion": expiracion,
         "tiempo_restante_min": max(tiempo_restante.total_seconds() / 60, 0)
     }
 
@@ -142,11 +340,40 @@ def verificar_estado(uid: str, db: Session = Depends(get_db)):
 # ⚙️ 6. Desconectar manualmente un usuario (CoA)
 # -------------------------------------------------------------
 @router.post("/{username}/desconectar")
-def desconectar_usuario(username: str):
+async def desconectar_usuario(username: str):
     try:
-        enviar_coa(username, ap_ip="192.168.18.1", secret="clave_radius")
+        resultado = await desconectar_usuario_radius(username)
         # También puedes revocar su IP (si la tienes guardada)
         # revocar_usuario(ip_cliente)
-        return {"message": f"Usuario {username} desconectado correctamente"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al desconectar: {e}")
+    registrar_evento("desconectar_coa", f"username={username} ok={resultado['ok']}")
+    if not resultado["ok"]:
+        raise HTTPException(status_code=502, detail=f"El NAS no confirmó la desconexión: {resultado['respuesta']}")
+    return {"message": f"Usuario {username} desconectado correctamente"}
+
+# -------------------------------------------------------------
+# 🚫 6b. Revocar muchos invitados (BD, RADIUS, CoA y firewall)
+# -------------------------------------------------------------
+@router.post("/revoke")
+async def revocar_invitados_bulk(data: RevocacionBulk):
+    """
+    Marca los invitados como revocados (o los borra con `eliminar`), borra
+    sus credenciales RADIUS por lotes y en paralelo desconecta sus sesiones
+    y retira sus IPs del firewall. Devuelve un resultado por username.
+    """
+    resultados = await revocar_invitados(data.usernames, eliminar=data.eliminar)
+    return {
+        "revocados": sum(1 for r in resultados if r["encontrado"]),
+        "resultados": resultados,
+    }
+
+# -------------------------------------------------------------
+# ⚙️ 7. Desconectar varios usuarios a la vez (CoA en paralelo)
+# -------------------------------------------------------------
+@router.post("/desconectar")
+async def desconectar_usuarios(data: DesconexionBulk):
+    resultados = await desconectar_usuarios_radius(data.usernames)
+    for r in resultados:
+        registrar_evento("desconectar_coa", f"username={r['username']} ok={r['ok']} (masivo)")
+    return {"resultados": resultados}
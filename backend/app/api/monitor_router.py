@@ -0,0 +1,124 @@
+# app/api/monitor_router.py
+import asyncio
+import json
+
+from datetime import datetime
+
+from fastapi import APIRouter, Depends, HTTPException, Request, Header, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from typing import Optional
+
+from app.api.deps import get_db
+from app.models.invitado import UsuarioInvitado
+from app.services.monitor_service import obtener_sesiones_activas, obtener_cambios_sesiones, session_feed
+from app.services.network_service import ip_autorizada
+from app.services.rollup_service import consultar_uso, ejecutar_rollup
+from app.services.sesion_ip_service import indice_sesiones
+
+router = APIRouter(prefix="/monitor", tags=["Monitor"])
+
+# -------------------------------------------------------------
+# 📡 1. Sesiones activas (foto completa)
+# -------------------------------------------------------------
+@router.get("/sesiones")
+def listar_sesiones_activas():
+    return obtener_sesiones_activas()
+
+# -------------------------------------------------------------
+# 🔁 2. Cambios desde un cursor (sondeo incremental)
+# -------------------------------------------------------------
+@router.get("/sesiones/cambios")
+def cambios_sesiones(cursor: Optional[str] = None):
+    """
+    Sin cursor devuelve las sesiones activas y el cursor inicial; con cursor
+    solo las sesiones que empezaron (start), cambiaron (update) o terminaron
+    (stop) desde entonces.
+    """
+    try:
+        return obtener_cambios_sesiones(cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+# -------------------------------------------------------------
+# 📤 3. Cambios empujados por Server-Sent Events
+# -------------------------------------------------------------
+def _evento_sse(datos: dict) -> str:
+    return f"id: {datos['cursor']}\nevent: sesiones\ndata: {json.dumps(datos, default=str)}\n\n"
+
+
+@router.get("/sesiones/stream")
+async def stream_sesiones(request: Request, last_event_id: Optional[str] = Header(None)):
+    """
+    Primer evento: foto de sesiones activas (o los cambios desde Last-Event-ID
+    si el cliente se reconecta). Después, un evento por cada lote de cambios
+    del sondeo compartido del proceso.
+    """
+    async def eventos():
+        cola = await session_feed.suscribir()
+        try:
+            try:
+                inicial = await run_in_threadpool(obtener_cambios_sesiones, last_event_id)
+            except ValueError:
+                inicial = await run_in_threadpool(obtener_cambios_sesiones, None)
+            yield _evento_sse(inicial)
+            while not await request.is_disconnected():
+                try:
+                    delta = await asyncio.wait_for(cola.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"  # mantiene viva la conexión a través de proxies
+                    continue
+                yield _evento_sse(delta)
+        finally:
+            session_feed.desuscribir(cola)
+
+    return StreamingResponse(eventos(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+# -------------------------------------------------------------
+# 📊 4. Uso agregado (tablas uso_por_hora / uso_por_dia)
+# -------------------------------------------------------------
+GRANULARIDAD = Query("hora", pattern="^(hora|dia)$")
+
+
+@router.get("/uso/usuarios/{username}")
+def uso_por_usuario(
+    username: str,
+    granularidad: str = GRANULARIDAD,
+    desde: Optional[datetime] = None,
+    hasta: Optional[datetime] = None,
+):
+    return {"username": username, "granularidad": granularidad,
+            "serie": consultar_uso([username], granularidad, desde, hasta)}
+
+
+@router.get("/uso/admins/{admin_id}")
+def uso_por_admin(
+    admin_id: int,
+    granularidad: str = GRANULARIDAD,
+    desde: Optional[datetime] = None,
+    hasta: Optional[datetime] = None,
+    db: Session = Depends(get_db),
+):
+    """Suma el uso de todos los invitados creados por el admin."""
+    usernames = [u for (u,) in db.query(UsuarioInvitado.username).filter(UsuarioInvitado.creado_por == admin_id)]
+    return {"admin_id": admin_id, "granularidad": granularidad, "invitados": len(usernames),
+            "serie": consultar_uso(usernames, granularidad, desde, hasta)}
+
+
+@router.post("/uso/rollup")
+def forzar_rollup():
+    """Procesa ya los deltas pendientes de radacct (además del job periódico)."""
+    return ejecutar_rollup()
+
+
+# -------------------------------------------------------------
+# 🔎 5. Sesión por IP (índice en memoria: portal + feed de radacct)
+# -------------------------------------------------------------
+@router.get("/ip/{ip}")
+def sesion_por_ip(ip: str):
+    sesion = indice_sesiones.consultar(ip)
+    if sesion is None:
+        raise HTTPException(status_code=404, detail="Sin sesión conocida para esa IP")
+    return {**sesion, "autorizada": ip_autorizada(ip)}
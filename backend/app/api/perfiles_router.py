@@ -0,0 +1,79 @@
+from fastapi import APIRouter, HTTPException
+
+from app.schemas.perfil_schema import PerfilCreate, PerfilDatos, PerfilOut, PerfilAsignacion, PerfilMovimiento
+from app.services.audit_service import registrar_evento
+from app.services.perfil_service import (
+    PerfilExistente, PerfilNoEncontrado, guardar_perfil, listar_perfiles, obtener_perfil,
+    asignar_perfil, mover_perfil,
+)
+
+router = APIRouter(prefix="/perfiles", tags=["Perfiles"])
+
+# -------------------------------------------------------------
+# 🆕 1. Crear perfil de servicio
+# -------------------------------------------------------------
+@router.post("/", response_model=PerfilOut)
+def crear_perfil(data: PerfilCreate):
+    try:
+        guardar_perfil(data.nombre, data.session_timeout, data.max_down, data.max_up, crear=True)
+    except PerfilExistente:
+        raise HTTPException(status_code=409, detail=f"El perfil {data.nombre} ya existe")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    registrar_evento("crear_perfil", f"perfil={data.nombre}")
+    return obtener_perfil(data.nombre)
+
+# -------------------------------------------------------------
+# 📜 2. Listar perfiles
+# -------------------------------------------------------------
+@router.get("/", response_model=list[PerfilOut])
+def listar():
+    return listar_perfiles()
+
+# -------------------------------------------------------------
+# 🔍 3. Obtener un perfil
+# -------------------------------------------------------------
+@router.get("/{nombre}", response_model=PerfilOut)
+def obtener(nombre: str):
+    try:
+        return obtener_perfil(nombre)
+    except PerfilNoEncontrado:
+        raise HTTPException(status_code=404, detail="Perfil no encontrado")
+
+# -------------------------------------------------------------
+# ✏️ 4. Editar perfil (aplica a todos sus usuarios a la vez)
+# -------------------------------------------------------------
+@router.put("/{nombre}", response_model=PerfilOut)
+def editar_perfil(nombre: str, data: PerfilDatos):
+    try:
+        guardar_perfil(nombre, data.session_timeout, data.max_down, data.max_up, crear=False)
+    except PerfilNoEncontrado:
+        raise HTTPException(status_code=404, detail="Perfil no encontrado")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    registrar_evento("editar_perfil", f"perfil={nombre}")
+    return obtener_perfil(nombre)
+
+# -------------------------------------------------------------
+# 🔀 5. Pasar invitados a un perfil (un solo UPDATE)
+# -------------------------------------------------------------
+@router.post("/{nombre}/usuarios")
+def asignar_usuarios(nombre: str, data: PerfilAsignacion):
+    try:
+        resultado = asignar_perfil(nombre, data.usernames)
+    except PerfilNoEncontrado:
+        raise HTTPException(status_code=404, detail="Perfil no encontrado")
+    registrar_evento("asignar_perfil", f"perfil={nombre} usuarios={len(data.usernames)}")
+    return resultado
+
+# -------------------------------------------------------------
+# 🔀 6. Mover todos los miembros de otro perfil a este
+# -------------------------------------------------------------
+@router.post("/{nombre}/mover")
+def mover_usuarios(nombre: str, data: PerfilMovimiento):
+    try:
+        resultado = mover_perfil(data.desde, nombre)
+    except PerfilNoEncontrado:
+        raise HTTPException(status_code=404, detail="Perfil no encontrado")
+    registrar_evento("mover_perfil", f"desde={data.desde} hacia={nombre} movidos={resultado['movidos']}")
+    return resultado
@@ -1,27 +1,29 @@
 # app/api/portal_router.py
-from fastapi import APIRouter, Request, Form, Depends, BackgroundTasks, HTTPException
+from fastapi import APIRouter, Request, Response, Form, Depends, HTTPException
 from fastapi.responses import HTMLResponse, RedirectResponse
-from sqlalchemy.orm import Session
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
 from datetime import datetime, timedelta
-import time
 
-from app.db.session import SessionLocal
+from app.api.deps import get_async_db
 from app.models.invitado import UsuarioInvitado
-from app.services.network_service import autorizar_usuario, revocar_usuario
+from app.services.audit_service import registrar_evento
+from app.services.cache_service import cache_invitados, invitado_por_username
+from app.services.credencial_service import PENDIENTE, VerificacionSaturada, es_pendiente, necesita_rehash, verificador
+from app.services.limite_service import limite_login_ip, limite_login_usuario
+from app.services.lease_service import registrar_lease
+from app.services.network_service import autorizar_usuario
+from app.services.network_service import ip_autorizada
+from app.services.radius_service import password_radius
+from app.services.scheduler_service import programar_revocacion
+from app.services.sesion_ip_service import indice_sesiones
 
 router = APIRouter(prefix="/portal", tags=["Portal"])
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-# Simple login page (browser)
-@router.get("/login", response_class=HTMLResponse)
-def login_page():
-    html = """
+# Simple login page (browser), renderizada una sola vez al importar:
+# en una tormenta de sondeos cada redirección termina aquí
+_LOGIN_HTML = """
     <html>
       <head><title>Login - MiniNac</title></head>
       <body>
@@ -33,54 +35,102 @@ def login_page():
         </form>
       </body>
     </html>
-    """
-    return HTMLResponse(content=html)
+    """.encode()
+_YA_CONECTADO_HTML = "<html><body><h3>Ya tienes acceso a la red</h3></body></html>".encode()
+
+
+def _sesion_abierta(ip: str, username: str | None = None) -> float | None:
+    """Segundos de acceso que le quedan a la IP, solo con memoria (índice + espejo del firewall)."""
+    restante = indice_sesiones.sesion_vigente(ip, username)
+    return restante if restante is not None and ip_autorizada(ip) else None
 
-def sesion_temporal_task(ip: str, duracion_seg: int):
-    autorizar_usuario(ip)
-    time.sleep(duracion_seg)
-    revocar_usuario(ip)
+
+@router.get("/login", response_class=HTMLResponse)
+def login_page(request: Request):
+    # Cliente que vuelve con la sesión abierta: no necesita el formulario
+    if _sesion_abierta(request.client.host) is not None:
+        return Response(content=_YA_CONECTADO_HTML, media_type="text/html; charset=utf-8",
+                        headers={"Cache-Control": "no-store"})
+    return Response(content=_LOGIN_HTML, media_type="text/html; charset=utf-8",
+                    headers={"Cache-Control": "private, no-cache"})
 
 @router.post("/login")
-def portal_login(
+async def portal_login(
     request: Request,
     username: str = Form(...),
     password: str = Form(...),
-    background_tasks: BackgroundTasks = None,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Procesa el login del portal. Valida contra la tabla usuarios_invitados
     (o puedes validar con radcheck/radius si prefieres).
     Autoriza la IP cliente durante session_timeout segundos.
+    Si esa IP ya tiene una sesión abierta del mismo usuario, responde sin
+    consultar la BD ni el firewall.
     """
-    invitado = db.query(UsuarioInvitado).filter_by(username=username).first()
+    restante = _sesion_abierta(request.client.host, username)
+    if restante is not None:
+        return HTMLResponse(f"<html><body><h3>Sesión activa: quedan {int(restante)} segundos</h3></body></html>")
+
+    # Fuerza bruta: se corta antes de la BD y del hash
+    ip = request.client.host
+    if not limite_login_ip.permitir(ip) or not limite_login_usuario.permitir(username):
+        espera = max(limite_login_ip.espera(ip), limite_login_usuario.espera(username), 1)
+        return HTMLResponse("<h3>Demasiados intentos, espera un momento</h3>", status_code=429,
+                            headers={"Retry-After": str(espera)})
+
+    invitado = await invitado_por_username(db, username)
     if not invitado:
+        registrar_evento("login_portal_fallido", f"username={username} ip={request.client.host} motivo=no_existe")
         return HTMLResponse("<h3>Usuario no encontrado</h3>", status_code=401)
 
-    # *IMPORTANTE*: Aquí asumimos contraseña en claro en DB (solo prueba).
-    # En producción usar hashing (bcrypt) y comparar.
-    if password != invitado.password:
+    # scrypt en el pool de credenciales (fuera del event loop); las filas
+    # viejas en claro se aceptan y se rehashean aquí mismo, igual que las de
+    # un alta masiva cuyo hash aún no se calculó (se comparan con radcheck)
+    almacenado = invitado.password
+    if es_pendiente(almacenado):
+        almacenado = await run_in_threadpool(password_radius, invitado.username) or PENDIENTE
+    try:
+        valida = await verificador.verificar(password, almacenado, invitado.username)
+    except VerificacionSaturada:
+        return HTMLResponse("<h3>Servidor ocupado, intenta de nuevo</h3>", status_code=503, headers={"Retry-After": "1"})
+    if not valida:
+        registrar_evento("login_portal_fallido", f"username={username} ip={request.client.host} motivo=password")
         return HTMLResponse("<h3>Contraseña inválida</h3>", status_code=401)
 
+    # Vencido o dado de baja: no entra aunque el barrido aún no lo haya marcado
+    ahora = datetime.now()
+    if invitado.estado != "activo" or (invitado.expiracion and invitado.expiracion <= ahora):
+        motivo = invitado.estado if invitado.estado != "activo" else "expirado"
+        registrar_evento("login_portal_fallido", f"username={username} ip={request.client.host} motivo={motivo}")
+        return HTMLResponse("<h3>Usuario sin acceso vigente</h3>", status_code=403)
+    if necesita_rehash(invitado.password):
+        await db.execute(update(UsuarioInvitado).where(UsuarioInvitado.id == invitado.id)
+                         .values(password=await verificador.hashear(password)))
+        await db.commit()
+        cache_invitados.invalidar(username=invitado.username)
+
     # calcular duración en segundos (si session_timeout=0 usa expiracion diff)
+    restante_invitado = int((invitado.expiracion - ahora).total_seconds()) if invitado.expiracion else None
     if invitado.session_timeout and invitado.session_timeout > 0:
         duracion = invitado.session_timeout * 60
     else:
         # si expiracion existe, usa diferencia; si no, default 1 hora
-        if invitado.expiracion:
-            diff = (invitado.expiracion - datetime.utcnow()).total_seconds()
-            duracion = max(0, int(diff))
-        else:
-            duracion = 3600
+        duracion = restante_invitado if restante_invitado is not None else 3600
+    # el acceso nunca pasa de la expiración del invitado
+    if restante_invitado is not None:
+        duracion = max(1, min(duracion, restante_invitado))
 
     # obtener ip del cliente (nota: si hay proxy / NAT, request.client.host cambia)
     ip_cliente = request.client.host
 
-    # autorizar y programar revocación en background
-    autorizar_usuario(ip_cliente)
-    if background_tasks:
-        background_tasks.add_task(sesion_temporal_task, ip_cliente, duracion)
+    # lease primero y después el firewall (fuera del event loop): así el
+    # reconciliador nunca ve la regla nueva sin su lease y no la retira
+    await run_in_threadpool(registrar_lease, ip_cliente, invitado.username, duracion)
+    await run_in_threadpool(autorizar_usuario, ip_cliente, duracion)
+    programar_revocacion(ip_cliente, duracion, invitado.username)
+    indice_sesiones.registrar_portal(ip_cliente, invitado.username, duracion)
+    registrar_evento("login_portal", f"username={username} ip={ip_cliente} duracion={duracion}")
 
     # registra evento opcional en BD o radacct (si quieres)
     # redirige a página de éxito o al recurso solicitado
@@ -0,0 +1,58 @@
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+
+from app.api.deps import get_db
+from app.models.invitado import UsuarioInvitado
+from app.schemas.qr_schema import QrLote
+from app.services.qr_service import FORMATOS, registrar_qrs, obtener_imagen, renderizar_lote, iter_zip
+
+router = APIRouter(prefix="/qr", tags=["QR"])
+
+# -------------------------------------------------------------
+# 📷 1. QR de conexión WiFi de un invitado
+# -------------------------------------------------------------
+@router.get("/{uid}")
+def qr_invitado(
+    uid: str,
+    request: Request,
+    formato: str = Query("png", pattern="^(png|svg)$"),
+    db: Session = Depends(get_db),
+):
+    invitado = db.query(UsuarioInvitado).filter_by(uid=uid).first()
+    if not invitado:
+        raise HTTPException(status_code=404, detail="Invitado no encontrado")
+    cadena = registrar_qrs(db, [invitado]).get(invitado.id)
+    if cadena is None:
+        raise HTTPException(status_code=409, detail="El invitado no tiene credencial WiFi vigente")
+
+    # La imagen depende solo de la cadena: caché por contenido y ETag estable
+    imagen, clave = obtener_imagen(cadena, formato)
+    etag = f'"{clave}"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    return Response(imagen, media_type=FORMATOS[formato], headers={"ETag": etag, "Cache-Control": "private"})
+
+# -------------------------------------------------------------
+# 🗂️ 2. Lote de QRs en un ZIP (impresión de credenciales)
+# -------------------------------------------------------------
+@router.post("/lote")
+def qr_lote(data: QrLote, db: Session = Depends(get_db)):
+    """
+    Renderiza los QRs de todos los invitados pedidos en el pool de procesos y
+    los transmite como ZIP a medida que salen (`<username>.<formato>`).
+    """
+    invitados = db.query(UsuarioInvitado).filter(UsuarioInvitado.uid.in_(data.uids)).order_by(UsuarioInvitado.id).all()
+    faltan = set(data.uids) - {inv.uid for inv in invitados}
+    if faltan:
+        raise HTTPException(status_code=404, detail=f"Invitados no encontrados: {sorted(faltan)[:20]}")
+    cadenas = registrar_qrs(db, invitados)
+    sin_clave = [inv.uid for inv in invitados if inv.id not in cadenas]
+    if sin_clave:
+        raise HTTPException(status_code=409, detail=f"Invitados sin credencial WiFi vigente: {sin_clave[:20]}")
+    items = [(f"{inv.username}.{data.formato}", cadenas[inv.id]) for inv in invitados]
+    return StreamingResponse(
+        iter_zip(renderizar_lote(items, data.formato)),
+        media_type="application/zip",
+        headers={"Content-Disposition": 'attachment; filename="qrs.zip"'},
+    )
@@ -0,0 +1,57 @@
+"""
+Comandos de operación del backend.
+
+    python -m app.cli exportar radacct --formato parquet --desde 2026-09-01 --hasta 2026-10-01
+    python -m app.cli exportar invitados --out invitados.csv.gz
+
+Usa la misma configuración (.env / variables de entorno) que la API.
+"""
+import argparse
+import sys
+from datetime import datetime
+
+
+def _fecha(texto: str) -> datetime:
+    return datetime.fromisoformat(texto)
+
+
+def comando_exportar(args) -> int:
+    from app.services.exportacion_service import ParquetNoDisponible, exportar, nombre_archivo
+
+    destino = args.out or nombre_archivo(args.dataset, args.formato, args.desde, args.hasta)
+    try:
+        # Sin cupo: el límite de exportaciones simultáneas es para los workers de la API
+        bloques = exportar(args.dataset, args.formato, args.desde, args.hasta, args.tam_lote, limitar=False)
+    except ParquetNoDisponible as e:
+        print(e, file=sys.stderr)
+        return 1
+    total = 0
+    with (sys.stdout.buffer if destino == "-" else open(destino, "wb")) as f:
+        for bloque in bloques:
+            f.write(bloque)
+            total += len(bloque)
+    if destino != "-":
+        print(f"{destino}: {total} bytes", file=sys.stderr)
+    return 0
+
+
+def main(argv=None) -> int:
+    from app.services.exportacion_service import DATASETS, FORMATOS
+
+    parser = argparse.ArgumentParser(prog="python -m app.cli", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="comando", required=True)
+    exp = sub.add_parser("exportar", help="exporta un dataset a CSV gzip o Parquet en streaming")
+    exp.add_argument("dataset", choices=list(DATASETS))
+    exp.add_argument("--formato", choices=list(FORMATOS), default="csv")
+    exp.add_argument("--desde", type=_fecha, help="inicio del rango (incluido), ISO 8601")
+    exp.add_argument("--hasta", type=_fecha, help="fin del rango (excluido), ISO 8601")
+    exp.add_argument("--tam-lote", type=int, help="filas por partición del cursor")
+    exp.add_argument("--out", help="archivo de salida ('-' para stdout); por defecto, nombre según dataset y rango")
+    exp.set_defaults(funcion=comando_exportar)
+    args = parser.parse_args(argv)
+    return args.funcion(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,12 +1,99 @@
 #Archivo donde se configuran las variables de entorno, extraidas desde el .env
+from typing import Optional
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
     MYSQL_MAIN_URL: str
     MYSQL_RADIUS_URL: str
     FIREBASE_CREDENTIALS: str
-    
-    
+
+    # URLs asíncronas opcionales; si faltan se derivan de las síncronas
+    # (mysql+pymysql -> mysql+aiomysql, sqlite -> sqlite+aiosqlite)
+    MYSQL_MAIN_ASYNC_URL: Optional[str] = None
+    MYSQL_RADIUS_ASYNC_URL: Optional[str] = None
+
+    # Pool de conexiones (se aplica a los motores síncronos y asíncronos)
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: int = 30  # segundos esperando una conexión libre
+    DB_POOL_RECYCLE: int = 1800  # MySQL cierra conexiones inactivas (wait_timeout)
+    DB_POOL_PRE_PING: bool = True
+
+    # Firewall: "ipset" (una regla + set con timeouts) o "iptables" (una regla por IP)
+    FIREWALL_BACKEND: str = "ipset"
+    IPSET_NAME: str = "mininac_auth"
+
+    # Cantidad de UIDs que cada proceso reserva de una vez en contadores_uid
+    UID_BLOCK_SIZE: int = 50
+
+    # RADIUS CoA / Disconnect (RFC 5176) hacia el AP / NAS
+    COA_HOST: str = "192.168.18.1"
+    COA_PORT: int = 3799
+    COA_SECRET: str = "clave_radius"
+    COA_TIMEOUT: float = 2.0  # segundos del primer intento; se duplica en cada reintento
+    COA_REINTENTOS: int = 3
+    REVOCACION_CONCURRENCIA: int = 64  # Disconnect-Request simultáneos en POST /users/revoke
+
+    # Outbox de notificaciones push (FCM)
+    FCM_TAM_LOTE: int = 500  # máximo que acepta send_each
+    FCM_MAX_INTENTOS: int = 5
+    FCM_OUTBOX_PERSISTIR: bool = False  # guarda la cola en notificaciones_pendientes
+
+    # Agregados de uso (uso_por_hora / uso_por_dia); 0 desactiva el job periódico
+    ROLLUP_INTERVALO_SEG: int = 300
+
+    # Credenciales: hash scrypt (hashlib, sin dependencias) verificado fuera del event loop
+    HASH_SCRYPT_N: int = 16384  # costo de scrypt; 2**14 ronda los 50 ms por hash
+    CREDENCIALES_HILOS: int = 4  # hilos de verificación (hashlib.scrypt libera el GIL)
+    CREDENCIALES_MAX_PENDIENTES: int = 256  # verificaciones en curso o en cola; por encima -> 503
+    CREDENCIALES_CACHE_TTL_SEG: float = 60  # credenciales ya verificadas que no vuelven a hashearse
+    CREDENCIALES_CACHE_ITEMS: int = 10000
+
+    # Límite de intentos de POST /portal/login (token bucket por IP y por username); 0 lo desactiva
+    LOGIN_RAFAGA_IP: int = 20
+    LOGIN_POR_MIN_IP: float = 30
+    LOGIN_RAFAGA_USUARIO: int = 10
+    LOGIN_POR_MIN_USUARIO: float = 10
+
+    # Exportaciones (CSV gzip / Parquet) por cursor del servidor
+    EXPORT_TAM_LOTE: int = 10000  # filas por partición (y por row group en Parquet)
+    EXPORT_MAX_CONCURRENTES: int = 2  # por proceso; por encima -> 429
+
+    # Portal cautivo: respuesta directa a los sondeos de conectividad de los
+    # sistemas operativos (/generate_204, /hotspot-detect.html, ...)
+    SONDEOS_HABILITADOS: bool = True
+    PORTAL_LOGIN_URL: str = "/portal/login"  # destino de la redirección; conviene absoluta (http://<ip-del-portal>/portal/login)
+    SONDEOS_REFRESCO_SEG: float = 5  # recarga del espejo de IPs autorizadas desde los leases; 0 lo desactiva
+    SESIONES_IP_DESDE_FEED: bool = True  # el índice IP -> sesión escucha el feed de radacct (framedipaddress)
+
+    # Barrido de invitados vencidos (estado -> expirado, RADIUS y firewall); 0 lo desactiva
+    BARRIDO_INTERVALO_SEG: int = 60
+    BARRIDO_TAM_LOTE: int = 1000
+
+    # Reconciliación firewall <-> sesiones_lease (también corre al arrancar); 0 desactiva el job periódico
+    RECONCILIAR_INTERVALO_SEG: int = 60
+
+    # Auditoría (admin_logs): se escribe por lotes desde un buffer en memoria
+    AUDIT_TAM_LOTE: int = 500
+    AUDIT_INTERVALO_SEG: float = 1.0
+    AUDIT_MAX_BUFFER: int = 50000
+
+    # Códigos QR de conexión WiFi para invitados
+    WIFI_SSID: str = "MiniNAC"
+    WIFI_TIPO_AUTH: str = "WPA2-EAP"  # o "WPA" para red con clave compartida
+    WIFI_EAP: str = "PEAP"
+    WIFI_FASE2: str = "MSCHAPV2"
+    QR_CACHE_ITEMS: int = 2048  # imágenes en memoria (LRU)
+    QR_PROCESOS: int = 0  # workers del pool de renderizado; 0 = núcleos disponibles
+
+    # Métricas Prometheus (GET /metrics)
+    METRICAS_HABILITADAS: bool = True
+    METRICAS_LENTO_MS: float = 0  # > 0: registra el desglose (BD, comandos) de peticiones más lentas
+
+    # Caché en proceso de invitados (portal, /users/{uid}, /estado)
+    CACHE_INVITADOS_ITEMS: int = 10000
+    CACHE_INVITADOS_TTL_SEG: float = 30  # tope para ver escrituras hechas por otros workers
+
     class Config:
         env_file = ".env"
 settings = Settings()
\ No newline at end of file
@@ -0,0 +1,185 @@
+#Archivo con las métricas Prometheus del backend (GET /metrics) y la
+#instrumentación de los caminos calientes: peticiones HTTP, pools y consultas
+#de SQLAlchemy, comandos externos (iptables/ipset/radclient) y CoA
+import contextvars
+import logging
+import time
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+from sqlalchemy import event
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+logger = logging.getLogger(__name__)
+
+# Cubetas pensadas para un backend que responde en milisegundos
+_CUBETAS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+HTTP_DURACION = Histogram(
+    "nac_http_request_duration_seconds", "Duración de las peticiones HTTP por ruta",
+    ["method", "route", "status"], buckets=_CUBETAS,
+)
+HTTP_EN_CURSO = Gauge("nac_http_requests_in_progress", "Peticiones HTTP en curso", ["method"])
+DB_ESPERA_POOL = Histogram(
+    "nac_db_pool_checkout_wait_seconds", "Espera para obtener una conexión del pool", ["engine"], buckets=_CUBETAS,
+)
+DB_CONSULTA = Histogram(
+    "nac_db_query_duration_seconds", "Duración de cada sentencia SQL", ["engine"], buckets=_CUBETAS,
+)
+COMANDO_DURACION = Histogram(
+    "nac_command_duration_seconds", "Duración de comandos externos y peticiones CoA", ["comando"], buckets=_CUBETAS,
+)
+COMANDO_FALLOS = Counter("nac_command_failures_total", "Comandos externos o CoA fallidos", ["comando"])
+REVOCACIONES_PENDIENTES = Gauge("nac_revocaciones_pendientes", "Revocaciones de sesión programadas")
+CACHE_INVITADOS = Counter("nac_cache_invitados_total", "Búsquedas en la caché de invitados", ["resultado"])
+SONDEOS_PORTAL = Counter("nac_sondeos_portal_total", "Sondeos de portal cautivo respondidos en memoria", ["resultado"])
+
+
+def respuesta_metricas() -> tuple[bytes, str]:
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+
+# -------------------------------------------------------------
+# Desglose por petición (para el registro de peticiones lentas)
+# -------------------------------------------------------------
+# anyio copia el contexto al threadpool, así que los endpoints síncronos
+# también suman a la petición que los originó
+_desglose: contextvars.ContextVar[Optional[dict]] = contextvars.ContextVar("desglose_peticion", default=None)
+
+
+def _sumar(clave: str, segundos: float):
+    desglose = _desglose.get()
+    if desglose is not None:
+        n, total = desglose.get(clave, (0, 0.0))
+        desglose[clave] = (n + 1, total + segundos)
+
+
+@contextmanager
+def medir_comando(comando: str):
+    """Mide un comando externo; una excepción cuenta como fallo y se propaga."""
+    inicio = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        COMANDO_FALLOS.labels(comando).inc()
+        raise
+    finally:
+        duracion = time.perf_counter() - inicio
+        COMANDO_DURACION.labels(comando).observe(duracion)
+        _sumar(f"cmd:{comando}", duracion)
+
+
+# -------------------------------------------------------------
+# SQLAlchemy: espera en el pool y tiempo de consulta
+# -------------------------------------------------------------
+class _CheckoutMedido:
+    """Mide cuánto espera cada checkout (incluye abrir conexiones nuevas)."""
+    engine_label = "desconocido"
+
+    def _do_get(self):
+        inicio = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            duracion = time.perf_counter() - inicio
+            DB_ESPERA_POOL.labels(self.engine_label).observe(duracion)
+            _sumar("pool", duracion)
+
+
+class PoolMedido(_CheckoutMedido, QueuePool):
+    """QueuePool medido, para los motores síncronos."""
+
+
+class PoolMedidoAsync(_CheckoutMedido, AsyncAdaptedQueuePool):
+    """El mismo pool para create_async_engine (QueuePool no sirve con asyncio)."""
+
+
+_clases_pool: dict[str, type] = {}
+
+
+def clase_pool(nombre: str, asincrono: bool = False) -> type:
+    """Subclase con la etiqueta fija: sobrevive a pool.recreate() tras dispose()."""
+    if nombre not in _clases_pool:
+        base = PoolMedidoAsync if asincrono else PoolMedido
+        _clases_pool[nombre] = type(f"{base.__name__}_{nombre}", (base,), {"engine_label": nombre})
+    return _clases_pool[nombre]
+
+
+def instrumentar_engine(engine, nombre: str):
+    """Tiempo de cada sentencia. Para un AsyncEngine, pasar `engine.sync_engine`."""
+    @event.listens_for(engine, "before_cursor_execute")
+    def _antes(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("inicio_consulta", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _despues(conn, cursor, statement, parameters, context, executemany):
+        pila = conn.info.get("inicio_consulta")
+        if pila:
+            duracion = time.perf_counter() - pila.pop()
+            DB_CONSULTA.labels(nombre).observe(duracion)
+            _sumar(f"db:{nombre}", duracion)
+
+    @event.listens_for(engine, "handle_error")
+    def _error(contexto):
+        pila = contexto.connection.info.get("inicio_consulta") if contexto.connection is not None else None
+        if pila:
+            pila.pop()
+
+
+# -------------------------------------------------------------
+# Middleware ASGI (puro, sin BaseHTTPMiddleware: menos sobrecarga)
+# -------------------------------------------------------------
+def _registrar_lenta(metodo: str, ruta: str, duracion: float, desglose: dict):
+    partes = ", ".join(f"{k} x{n} {total * 1000:.1f}ms" for k, (n, total) in sorted(desglose.items()))
+    logger.warning("Petición lenta %s %s: %.1fms (%s)", metodo, ruta, duracion * 1000, partes or "sin desglose")
+
+
+# Hook para peticiones lentas: recibe (método, ruta, segundos, desglose)
+hook_lenta: Callable[[str, str, float, dict], None] = _registrar_lenta
+
+
+class MetricsMiddleware:
+    """
+    Histograma por (método, plantilla de ruta, status) y gauge de peticiones
+    en curso. Si `umbral_lento_ms` > 0, además acumula el tiempo de base de
+    datos y comandos de cada petición y llama a `hook_lenta` con ese
+    desglose cuando la petición supera el umbral.
+    """
+
+    def __init__(self, app, umbral_lento_ms: float = 0):
+        self.app = app
+        self.umbral = umbral_lento_ms / 1000
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        metodo = scope["method"]
+        status = [500]
+
+        async def enviar(mensaje):
+            if mensaje["type"] == "http.response.start":
+                status[0] = mensaje["status"]
+            await send(mensaje)
+
+        token = _desglose.set({}) if self.umbral else None
+        en_curso = HTTP_EN_CURSO.labels(metodo)
+        en_curso.inc()
+        inicio = time.perf_counter()
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            duracion = time.perf_counter() - inicio
+            en_curso.dec()
+            # Plantilla (/users/{uid}) y no la ruta real, para acotar la cardinalidad
+            route = scope.get("route")
+            ruta = getattr(route, "path", "sin_ruta")
+            HTTP_DURACION.labels(metodo, ruta, str(status[0])).observe(duracion)
+            if token is not None:
+                desglose = _desglose.get()
+                _desglose.reset(token)
+                if duracion >= self.umbral:
+                    try:
+                        hook_lenta(metodo, ruta, duracion, desglose)
+                    except Exception:
+                        logger.exception("Error en el hook de peticiones lentas")
@@ -0,0 +1,43 @@
+#Archivo con el ejecutor de tareas periódicas de fondo (rollups, barridos, etc.)
+import logging
+import threading
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+
+class TareaPeriodica:
+    """
+    Ejecuta `funcion` cada `intervalo` segundos en un hilo propio.
+    Un error en una ejecución se registra y no detiene las siguientes.
+    """
+
+    def __init__(self, nombre: str, intervalo: float, funcion: Callable[[], object]):
+        self.nombre = nombre
+        self.intervalo = intervalo
+        self.funcion = funcion
+        self._detener = threading.Event()
+        self._hilo: threading.Thread | None = None
+
+    def iniciar(self):
+        if self.intervalo <= 0 or (self._hilo is not None and self._hilo.is_alive()):
+            return
+        self._detener.clear()
+        self._hilo = threading.Thread(target=self._loop, name=self.nombre, daemon=True)
+        self._hilo.start()
+
+    def detener(self, timeout: float = 5.0):
+        self._detener.set()
+        if self._hilo is not None:
+            self._hilo.join(timeout=timeout)
+            self._hilo = None
+
+    def ejecutar_ahora(self):
+        return self.funcion()
+
+    def _loop(self):
+        while not self._detener.wait(self.intervalo):
+            try:
+                self.funcion()
+            except Exception:
+                logger.exception("Error en la tarea periódica %s", self.nombre)
@@ -0,0 +1,67 @@
+#Archivo con el atajo para los sondeos de portal cautivo: cada teléfono que
+#se conecta a la red repite estas peticiones hasta quedar autorizado, así que
+#se responden en el middleware (antes del routing) con bytes precalculados y
+#un set en memoria de IPs autorizadas, sin base de datos ni threadpool
+from typing import Callable
+
+from app.core.metrics import SONDEOS_PORTAL
+
+_APPLE_EXITO = b"<HTML><HEAD><TITLE>Success</TITLE></HEAD><BODY>Success</BODY></HTML>"
+
+# ruta -> (status, content-type, cuerpo) que espera el sistema operativo cuando hay Internet
+RESPUESTAS_EXITO: dict[str, tuple[int, bytes, bytes]] = {
+    # Android / ChromeOS
+    "/generate_204": (204, b"", b""),
+    "/gen_204": (204, b"", b""),
+    # Apple (iOS / macOS)
+    "/hotspot-detect.html": (200, b"text/html", _APPLE_EXITO),
+    "/library/test/success.html": (200, b"text/html", _APPLE_EXITO),
+    # Windows
+    "/connecttest.txt": (200, b"text/plain", b"Microsoft Connect Test"),
+    "/ncsi.txt": (200, b"text/plain", b"Microsoft NCSI"),
+    # Firefox
+    "/success.txt": (200, b"text/plain", b"success\n"),
+}
+
+
+def _inicio(status: int, tipo: bytes, cuerpo: bytes, extra: list = ()) -> dict:
+    headers = [(b"content-length", str(len(cuerpo)).encode()), (b"cache-control", b"no-store"), *extra]
+    if tipo:
+        headers.append((b"content-type", tipo))
+    return {"type": "http.response.start", "status": status, "headers": headers}
+
+
+class SondeosPortalMiddleware:
+    """
+    Responde los sondeos de conectividad con la respuesta de éxito si la IP
+    del cliente está autorizada y con un 302 al login si no. Todo lo demás
+    pasa intacto a la app. Los mensajes ASGI se arman una sola vez.
+    """
+
+    def __init__(self, app, es_autorizada: Callable[[str], bool], url_login: str = "/portal/login"):
+        self.app = app
+        self.es_autorizada = es_autorizada
+        self._exito = {
+            ruta: (_inicio(status, tipo, cuerpo), {"type": "http.response.body", "body": cuerpo})
+            for ruta, (status, tipo, cuerpo) in RESPUESTAS_EXITO.items()
+        }
+        cuerpo = f'<html><body><a href="{url_login}">Iniciar sesión</a></body></html>'.encode()
+        self._redireccion = (
+            _inicio(302, b"text/html; charset=utf-8", cuerpo, [(b"location", url_login.encode())]),
+            {"type": "http.response.body", "body": cuerpo},
+        )
+        self._autorizados = SONDEOS_PORTAL.labels("autorizado")
+        self._redirigidos = SONDEOS_PORTAL.labels("redirigido")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self._exito or scope["method"] not in ("GET", "HEAD"):
+            return await self.app(scope, receive, send)
+        cliente = scope.get("client")
+        if cliente and self.es_autorizada(cliente[0]):
+            inicio, cuerpo = self._exito[scope["path"]]
+            self._autorizados.inc()
+        else:
+            inicio, cuerpo = self._redireccion
+            self._redirigidos.inc()
+        await send(inicio)
+        await send(cuerpo if scope["method"] == "GET" else {"type": "http.response.body", "body": b""})
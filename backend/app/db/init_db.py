@@ -0,0 +1,17 @@
+#Archivo que crea las tablas auxiliares que el backend necesita y que no
+#existían en el esquema original (las tablas base y las de FreeRADIUS se
+#administran fuera de la app)
+from app.db.base_class import Base
+from app.db.rollup_schema import rollup_metadata
+from app.db.session import get_engine_main, get_engine_radius
+from app.models.contador_uid import ContadorUid
+from app.models.notificacion import NotificacionPendiente
+from app.models.sesion_lease import SesionLease
+
+TABLAS_AUXILIARES_MAIN = [ContadorUid.__table__, NotificacionPendiente.__table__, SesionLease.__table__]
+
+
+def crear_tablas_auxiliares():
+    Base.metadata.create_all(get_engine_main(), tables=TABLAS_AUXILIARES_MAIN, checkfirst=True)
+    # Agregados de uso, en la base RADIUS junto a radacct
+    rollup_metadata.create_all(get_engine_radius(), checkfirst=True)
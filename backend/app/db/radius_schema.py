@@ -0,0 +1,68 @@
+#Archivo con las tablas de FreeRADIUS que usa el backend (esquema SQL estándar)
+#No son modelos ORM: FreeRADIUS es dueño de estas tablas y aquí solo se describen
+#para poder hacer inserciones por lotes y crear el esquema en entornos locales (SQLite)
+from sqlalchemy import MetaData, Table, Column, Integer, BigInteger, String, DateTime, Index
+
+radius_metadata = MetaData()
+
+# En SQLite solo INTEGER PRIMARY KEY es autoincremental
+_Id = BigInteger().with_variant(Integer, "sqlite")
+
+radcheck = Table(
+    "radcheck", radius_metadata,
+    Column("id", Integer, primary_key=True),
+    Column("username", String(64), nullable=False, default="", index=True),
+    Column("attribute", String(64), nullable=False, default=""),
+    Column("op", String(2), nullable=False, default="=="),
+    Column("value", String(253), nullable=False, default=""),
+)
+
+radreply = Table(
+    "radreply", radius_metadata,
+    Column("id", Integer, primary_key=True),
+    Column("username", String(64), nullable=False, default="", index=True),
+    Column("attribute", String(64), nullable=False, default=""),
+    Column("op", String(2), nullable=False, default="="),
+    Column("value", String(253), nullable=False, default=""),
+)
+
+# Perfiles de servicio: atributos por grupo y un grupo por usuario
+radgroupreply = Table(
+    "radgroupreply", radius_metadata,
+    Column("id", Integer, primary_key=True),
+    Column("groupname", String(64), nullable=False, default="", index=True),
+    Column("attribute", String(64), nullable=False, default=""),
+    Column("op", String(2), nullable=False, default="="),
+    Column("value", String(253), nullable=False, default=""),
+)
+
+radusergroup = Table(
+    "radusergroup", radius_metadata,
+    Column("id", Integer, primary_key=True),
+    Column("username", String(64), nullable=False, default="", index=True),
+    Column("groupname", String(64), nullable=False, default=""),
+    Column("priority", Integer, nullable=False, default=1),
+    # migrations/004_radusergroup_groupname.sql
+    Index("idx_radusergroup_groupname", "groupname"),
+)
+
+radacct = Table(
+    "radacct", radius_metadata,
+    Column("radacctid", _Id, primary_key=True),
+    Column("acctsessionid", String(64), nullable=False, default=""),
+    Column("acctuniqueid", String(32), nullable=False, default="", unique=True),
+    Column("username", String(64), nullable=False, default="", index=True),
+    Column("nasipaddress", String(15), nullable=False, default=""),
+    Column("acctstarttime", DateTime),
+    Column("acctupdatetime", DateTime),
+    Column("acctstoptime", DateTime),
+    Column("acctsessiontime", Integer),
+    Column("acctinputoctets", BigInteger),
+    Column("acctoutputoctets", BigInteger),
+    Column("callingstationid", String(50), nullable=False, default=""),
+    Column("acctterminatecause", String(32), nullable=False, default=""),
+    Column("framedipaddress", String(15), nullable=False, default=""),
+    Index("acctstoptime", "acctstoptime"),
+    # migrations/001_radacct_feed_indices.sql
+    Index("idx_radacct_update", "acctupdatetime", "radacctid"),
+)
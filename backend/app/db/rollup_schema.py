@@ -0,0 +1,51 @@
+#Archivo con las tablas de agregados de uso que la app mantiene en la base RADIUS
+#(junto a radacct, para leer los deltas sin mover datos entre servidores)
+from sqlalchemy import MetaData, Table, Column, Integer, BigInteger, String, DateTime, Date, Boolean, Index
+
+rollup_metadata = MetaData()
+
+_Id = BigInteger().with_variant(Integer, "sqlite")
+
+# Uso por usuario y hora (hora truncada: 2026-01-01 10:00:00)
+uso_por_hora = Table(
+    "uso_por_hora", rollup_metadata,
+    Column("username", String(64), primary_key=True),
+    Column("hora", DateTime, primary_key=True),
+    Column("bytes_in", BigInteger, nullable=False, default=0),
+    Column("bytes_out", BigInteger, nullable=False, default=0),
+    Column("sesiones", Integer, nullable=False, default=0),
+    Column("segundos", BigInteger, nullable=False, default=0),
+    Index("idx_uso_hora_hora", "hora"),
+)
+
+# Uso por usuario y día
+uso_por_dia = Table(
+    "uso_por_dia", rollup_metadata,
+    Column("username", String(64), primary_key=True),
+    Column("dia", Date, primary_key=True),
+    Column("bytes_in", BigInteger, nullable=False, default=0),
+    Column("bytes_out", BigInteger, nullable=False, default=0),
+    Column("sesiones", Integer, nullable=False, default=0),
+    Column("segundos", BigInteger, nullable=False, default=0),
+    Index("idx_uso_dia_dia", "dia"),
+)
+
+# Últimos contadores ya sumados de cada sesión de radacct (para sumar solo deltas)
+rollup_sesiones = Table(
+    "rollup_sesiones", rollup_metadata,
+    Column("radacctid", _Id, primary_key=True, autoincrement=False),
+    Column("bytes_in", BigInteger, nullable=False, default=0),
+    Column("bytes_out", BigInteger, nullable=False, default=0),
+    Column("segundos", BigInteger, nullable=False, default=0),
+    Column("cerrada", Boolean, nullable=False, default=False),
+    Column("visto_en", DateTime),
+    Index("idx_rollup_sesiones_cerrada", "cerrada", "visto_en"),
+)
+
+# Marca de agua de cada job (acctupdatetime y radacctid ya procesados)
+rollup_checkpoint = Table(
+    "rollup_checkpoint", rollup_metadata,
+    Column("nombre", String(50), primary_key=True),
+    Column("ts", DateTime),
+    Column("ultimo_id", _Id, nullable=False, default=0),
+)
@@ -1,13 +1,155 @@
 #Archivo encargado de centralizar conexiones y definer sesiones
+import threading
+
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker
 #Importar la configuracion de .env desde el settings de config en el core
 from app.core.config import settings
+from app.core.metrics import clase_pool, instrumentar_engine
+
+# Driver asíncrono equivalente a cada driver síncrono
+DRIVERS_ASYNC = {
+    "mysql": "mysql+aiomysql",
+    "mysql+pymysql": "mysql+aiomysql",
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+}
+
+
+def opciones_pool(url: str) -> dict:
+    """Parámetros del pool desde Settings (SQLite no usa tamaño ni overflow)."""
+    opciones = {
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+    }
+    if make_url(url).get_backend_name() != "sqlite":
+        opciones.update(
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT,
+        )
+    return opciones
+
+
+def url_async(url: str) -> str:
+    """mysql+pymysql://... -> mysql+aiomysql://..., sqlite://... -> sqlite+aiosqlite://..."""
+    u = make_url(url)
+    driver = DRIVERS_ASYNC.get(u.drivername)
+    if driver is None:
+        return url
+    return u.set(drivername=driver).render_as_string(hide_password=False)
+
+
+# -------------------------------------------------------------
+# Motores síncronos: se crean al primer uso, no al importar, para que
+# el arranque no dependa de que la base de datos esté disponible
+# -------------------------------------------------------------
+_engines = {}
+_sessionmakers = {}
+_lock = threading.Lock()
+
+
+def _opciones_medidas(nombre: str, url: str, asincrono: bool = False) -> dict:
+    opciones = opciones_pool(url)
+    if settings.METRICAS_HABILITADAS:
+        u = make_url(url)
+        # SQLite en memoria usa su propio pool (SingletonThreadPool / StaticPool); el resto, uno medido
+        if u.get_backend_name() != "sqlite" or u.database not in (None, "", ":memory:"):
+            opciones["poolclass"] = clase_pool(nombre, asincrono)
+    return opciones
+
+
+def _engine(nombre: str, url: str):
+    engine = _engines.get(nombre)
+    if engine is None:
+        with _lock:
+            engine = _engines.get(nombre)
+            if engine is None:
+                engine = create_engine(url, **_opciones_medidas(nombre, url))
+                if settings.METRICAS_HABILITADAS:
+                    instrumentar_engine(engine, nombre)
+                _sessionmakers[nombre] = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+                _engines[nombre] = engine
+    return engine
+
 
 # Motor para base de datos principal
-engine_main = create_engine(settings.MYSQL_MAIN_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine_main)
+def get_engine_main():
+    return _engine("main", settings.MYSQL_MAIN_URL)
+
+
+def SessionLocal():
+    get_engine_main()
+    return _sessionmakers["main"]()
+
 
 # Motor para base de datos RADIUS
-engine_radius = create_engine(settings.MYSQL_RADIUS_URL)
-SessionRadius = sessionmaker(autocommit=False, autoflush=False, bind=engine_radius)
\ No newline at end of file
+def get_engine_radius():
+    return _engine("radius", settings.MYSQL_RADIUS_URL)
+
+
+def SessionRadius():
+    get_engine_radius()
+    return _sessionmakers["radius"]()
+
+
+def __getattr__(nombre):
+    # Compatibilidad: `from app.db.session import engine_main` sigue funcionando
+    if nombre == "engine_main":
+        return get_engine_main()
+    if nombre == "engine_radius":
+        return get_engine_radius()
+    raise AttributeError(nombre)
+
+
+def dispose_engines():
+    for engine in _engines.values():
+        engine.dispose()
+
+
+# -------------------------------------------------------------
+# Motores asíncronos (opcionales: se crean al primer uso, así el
+# driver aiomysql/aiosqlite solo es necesario si se usan)
+# -------------------------------------------------------------
+_async_engines = {}
+_async_sessionmakers = {}
+
+
+def _async_engine(nombre: str, url: str):
+    if nombre not in _async_engines:
+        from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+        etiqueta = f"{nombre}_async"  # pool propio: se mide aparte del síncrono
+        engine = create_async_engine(url, **_opciones_medidas(etiqueta, url, asincrono=True))
+        if settings.METRICAS_HABILITADAS:
+            # Los eventos de sentencia viven en el Engine síncrono que envuelve
+            instrumentar_engine(engine.sync_engine, etiqueta)
+        _async_engines[nombre] = engine
+        _async_sessionmakers[nombre] = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+    return _async_engines[nombre]
+
+
+def get_async_engine_main():
+    return _async_engine("main", settings.MYSQL_MAIN_ASYNC_URL or url_async(settings.MYSQL_MAIN_URL))
+
+
+def get_async_engine_radius():
+    return _async_engine("radius", settings.MYSQL_RADIUS_ASYNC_URL or url_async(settings.MYSQL_RADIUS_URL))
+
+
+def AsyncSessionLocal():
+    get_async_engine_main()
+    return _async_sessionmakers["main"]()
+
+
+def AsyncSessionRadius():
+    get_async_engine_radius()
+    return _async_sessionmakers["radius"]()
+
+
+async def dispose_async_engines():
+    """Cierra los pools asíncronos (las conexiones quedan ligadas a su event loop)."""
+    for engine in _async_engines.values():
+        await engine.dispose()
+    _async_engines.clear()
+    _async_sessionmakers.clear()
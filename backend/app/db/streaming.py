@@ -0,0 +1,36 @@
+#Archivo con utilidades para recorrer consultas grandes sin cargarlas en memoria
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+
+def stream_rows(engine, stmt, yield_per: int = 1000):
+    """
+    Ejecuta `stmt` con un cursor del lado del servidor y entrega las filas
+    por particiones de `yield_per` tuplas (no hidrata objetos ORM).
+    La conexión se abre al empezar a iterar y se cierra al terminar.
+    """
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=yield_per).execute(stmt)
+        for particion in result.partitions():
+            yield particion
+
+
+def _json_default(valor):
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat()
+    if isinstance(valor, Decimal):
+        return float(valor)
+    raise TypeError(f"Tipo no serializable: {type(valor).__name__}")
+
+
+def iter_ndjson(engine, stmt, yield_per: int = 1000):
+    """Serializa el resultado como NDJSON: un objeto por línea, un bloque de bytes por partición."""
+    columnas = None
+    for particion in stream_rows(engine, stmt, yield_per):
+        if columnas is None and particion:
+            columnas = list(particion[0]._fields)
+        yield "".join(
+            json.dumps(dict(zip(columnas, fila)), default=_json_default, ensure_ascii=False) + "\n"
+            for fila in particion
+        ).encode()
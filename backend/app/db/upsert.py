@@ -0,0 +1,24 @@
+#Archivo con el upsert portable que usan los servicios (MySQL en producción,
+#SQLite en pruebas y entornos locales)
+from sqlalchemy.dialects import mysql, sqlite
+
+
+def upsert(conn, tabla, filas: list[dict], claves: list[str], sumar=(), reemplazar=()):
+    """
+    INSERT de varias filas que, ante clave duplicada, suma las columnas de
+    `sumar` y sobrescribe las de `reemplazar`
+    (MySQL: ON DUPLICATE KEY UPDATE, SQLite: ON CONFLICT DO UPDATE).
+    """
+    if not filas:
+        return
+    if conn.dialect.name == "mysql":
+        stmt = mysql.insert(tabla)
+        nuevos = stmt.inserted
+        valores = {c: tabla.c[c] + nuevos[c] for c in sumar} | {c: nuevos[c] for c in reemplazar}
+        stmt = stmt.on_duplicate_key_update(valores)
+    else:
+        stmt = sqlite.insert(tabla)
+        nuevos = stmt.excluded
+        valores = {c: tabla.c[c] + nuevos[c] for c in sumar} | {c: nuevos[c] for c in reemplazar}
+        stmt = stmt.on_conflict_do_update(index_elements=claves, set_=valores)
+    conn.execute(stmt, filas)
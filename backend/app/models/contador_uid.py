@@ -0,0 +1,10 @@
+#Archivo de modelo de la tabla de contadores de UIDs (USRn, ADMn, ...)
+#Tipos de columnas y datos a usar
+from sqlalchemy import Column, Integer, String
+#Importacion de la base declarativa
+from app.db.base_class import Base
+
+class ContadorUid(Base):
+    __tablename__="contadores_uid"
+    prefijo=Column(String(10), primary_key=True)
+    siguiente=Column(Integer, nullable=False, default=1)  # primer número aún no reservado
@@ -1,12 +1,14 @@
 #Archivo de modelo de la tabla de los usuarios invitados
 #Tipos de columnas y datos a usar
-from sqlalchemy import Column, Integer, String, DateTime, Enum, ForeignKey, TIMESTAMP
+from sqlalchemy import Column, Integer, String, DateTime, Enum, ForeignKey, TIMESTAMP, Index
 from sqlalchemy.sql import func
 #Importacion de la base declarativa
 from app.db.base_class import Base
 
 class UsuarioInvitado(Base):
     __tablename__="usuarios_invitados"
+    # El barrido de expirados busca por (estado, expiracion) sin recorrer la tabla
+    __table_args__ = (Index("idx_invitados_estado_expiracion", "estado", "expiracion"),)
     id=Column(Integer, primary_key=True, index=True)
     uid = Column(String(20), unique=True, nullable=False)
     username = Column(String(100), unique=True, nullable=False)
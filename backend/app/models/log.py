@@ -1,12 +1,19 @@
 #Archivo de modelo de la tabla de logs
 #Tipos de columnas y datos a usar
-from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, TIMESTAMP
+from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, TIMESTAMP, Index
 from sqlalchemy.sql import func
 #Importacion de la base declarativa
 from app.db.base_class import Base
 
 class Logs(Base):
     __tablename__="admin_logs"
+    # Consultas del panel: por admin o por acción dentro de un rango de fechas,
+    # y el listado sin filtro, paginado por (fech, id)
+    __table_args__ = (
+        Index("idx_logs_admin_fech", "admin_id", "fech"),
+        Index("idx_logs_accion_fech", "accion", "fech"),
+        Index("idx_logs_fech_id", "fech", "id"),
+    )
     id=Column(Integer, primary_key=True)
     admin_id=Column(Integer, ForeignKey("administradores.id", ondelete="CASCADE"))
     accion=Column(String(200), nullable=False)
@@ -0,0 +1,14 @@
+#Archivo de modelo de la tabla de notificaciones push pendientes (outbox FCM)
+#Tipos de columnas y datos a usar
+from sqlalchemy import Column, Integer, String, Text, TIMESTAMP
+from sqlalchemy.sql import func
+#Importacion de la base declarativa
+from app.db.base_class import Base
+
+class NotificacionPendiente(Base):
+    __tablename__="notificaciones_pendientes"
+    id=Column(Integer, primary_key=True)
+    topic=Column(String(100), nullable=False)
+    titulo=Column(String(200), nullable=False)
+    cuerpo=Column(Text)
+    creado_en=Column(TIMESTAMP, server_default=func.now())
@@ -0,0 +1,13 @@
+#Archivo de modelo de la tabla de leases de sesión (IP autorizada en el firewall)
+#Tipos de columnas y datos a usar
+from sqlalchemy import Column, String, DateTime, TIMESTAMP
+from sqlalchemy.sql import func
+#Importacion de la base declarativa
+from app.db.base_class import Base
+
+class SesionLease(Base):
+    __tablename__="sesiones_lease"
+    ip=Column(String(45), primary_key=True)  # una autorización vigente por IP
+    username=Column(String(100), nullable=False, index=True)
+    expira_en=Column(DateTime, nullable=False, index=True)
+    creado_en=Column(TIMESTAMP, server_default=func.now())
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional
 from datetime import datetime
 
@@ -19,6 +19,7 @@ class InvitadoCreate(InvitadoBase):
     creado_por: int  # ID del admin que crea el invitado
     max_down: Optional[int] = None  # en Kbps
     max_up: Optional[int] = None  # en Kbps
+    perfil: Optional[str] = None  # perfil de servicio (radgroupreply); reemplaza los límites propios
 
 # -------------------------------------------------------------
 # 📤 Esquema de salida (lo que la API devuelve)
@@ -31,3 +32,31 @@ class InvitadoOut(InvitadoBase):
 
     class Config:
         orm_mode = True  # 👈 necesario para convertir desde objetos SQLAlchemy
+
+# -------------------------------------------------------------
+# 📦 Esquemas para alta masiva de invitados
+# -------------------------------------------------------------
+class InvitadoBulkCreate(BaseModel):
+    invitados: list[InvitadoCreate] = Field(..., max_length=10000)
+
+class InvitadoBulkError(BaseModel):
+    indice: int  # posición en la lista enviada
+    username: str
+    error: str
+
+class InvitadoBulkOut(BaseModel):
+    creados: list[InvitadoOut]
+    errores: list[InvitadoBulkError]
+
+# -------------------------------------------------------------
+# ⚙️ Desconexión masiva (CoA / Disconnect-Request)
+# -------------------------------------------------------------
+class DesconexionBulk(BaseModel):
+    usernames: list[str]
+
+# -------------------------------------------------------------
+# 🚫 Revocación masiva (POST /users/revoke)
+# -------------------------------------------------------------
+class RevocacionBulk(BaseModel):
+    usernames: list[str] = Field(..., min_length=1, max_length=10000)
+    eliminar: bool = False  # True: además borra las filas de usuarios_invitados
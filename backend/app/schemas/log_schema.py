@@ -1,17 +1,17 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional
 from datetime import datetime
 
 # Modelo base (campos comunes)
 class LogBase(BaseModel):
     accion: str
-    detalle: str
+    detalle: Optional[str] = None
     admin_id: Optional[int] = None  # quién realizó la acción
 
 # Modelo de salida (lo que devuelve la API)
 class LogOut(LogBase):
     id: int
-    fecha: datetime
+    fecha: datetime = Field(validation_alias="fech")  # columna fech en admin_logs
 
     class Config:
         from_attributes = True
@@ -0,0 +1,31 @@
+from pydantic import BaseModel, Field
+from typing import Optional
+
+# -------------------------------------------------------------
+# 🧩 Atributos de un perfil de servicio (radgroupreply)
+# -------------------------------------------------------------
+class PerfilDatos(BaseModel):
+    session_timeout: Optional[int] = 0  # en minutos
+    max_down: Optional[int] = None  # en Kbps
+    max_up: Optional[int] = None  # en Kbps
+
+# -------------------------------------------------------------
+# 🆕 Crear perfil
+# -------------------------------------------------------------
+class PerfilCreate(PerfilDatos):
+    nombre: str = Field(..., min_length=1, max_length=64)
+
+# -------------------------------------------------------------
+# 📤 Perfil con la cantidad de usuarios asignados
+# -------------------------------------------------------------
+class PerfilOut(PerfilCreate):
+    usuarios: int = 0
+
+# -------------------------------------------------------------
+# 🔀 Asignación masiva de invitados a un perfil
+# -------------------------------------------------------------
+class PerfilAsignacion(BaseModel):
+    usernames: list[str] = Field(..., min_length=1)
+
+class PerfilMovimiento(BaseModel):
+    desde: str  # perfil de origen: se mueven todos sus miembros
@@ -0,0 +1,9 @@
+from pydantic import BaseModel, Field
+from typing import Optional
+
+# -------------------------------------------------------------
+# 📦 Lote de QRs para imprimir credenciales de un evento
+# -------------------------------------------------------------
+class QrLote(BaseModel):
+    uids: list[str] = Field(..., min_length=1, max_length=5000)  # UIDs de invitados (USR...)
+    formato: Optional[str] = Field("png", pattern="^(png|svg)$")
@@ -0,0 +1,208 @@
+# app/services/audit_service.py
+import base64
+import json
+import logging
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import insert, select, or_, and_
+
+from app.core.config import settings
+from app.db.session import get_engine_main
+from app.models.log import Logs
+
+logger = logging.getLogger(__name__)
+
+
+# -------------------------------------------------------------
+# Escritura: buffer en memoria + hilo que inserta por lotes
+# -------------------------------------------------------------
+class AuditWriter:
+    """
+    `registrar` solo agrega a un buffer en memoria y regresa de inmediato.
+    Un hilo escribe el buffer en admin_logs con un INSERT de varias filas
+    cuando junta `tam_lote` eventos o cuando el más viejo lleva `intervalo`
+    segundos esperando. Si la base no responde, el buffer se acota a
+    `max_buffer` descartando los eventos más antiguos.
+    """
+
+    def __init__(self, tam_lote: int = 500, intervalo: float = 1.0, max_buffer: int = 50000,
+                 engine_factory=get_engine_main):
+        self.tam_lote = tam_lote
+        self.intervalo = intervalo
+        self.max_buffer = max_buffer
+        self._engine_factory = engine_factory
+        self._buffer: deque[dict] = deque()
+        self._primero = 0.0  # cuándo llegó el evento más viejo del buffer
+        self._forzar = False
+        self._en_escritura = 0
+        self._cond = threading.Condition()
+        self._hilo: Optional[threading.Thread] = None
+        self._detenido = False
+        self.escritas = 0
+        self.descartadas = 0
+
+    def registrar(self, accion: str, detalle: Optional[str] = None, admin_id: Optional[int] = None):
+        fila = {"admin_id": admin_id, "accion": accion[:200], "detalle": detalle, "fech": datetime.now()}
+        with self._cond:
+            if len(self._buffer) >= self.max_buffer:
+                self._buffer.popleft()
+                self.descartadas += 1
+            if not self._buffer:
+                self._primero = time.monotonic()
+            self._buffer.append(fila)
+            self._asegurar_hilo()
+            if len(self._buffer) == 1 or len(self._buffer) >= self.tam_lote:
+                self._cond.notify()
+
+    def pendientes(self) -> int:
+        with self._cond:
+            return len(self._buffer) + self._en_escritura
+
+    def vaciar(self, timeout: float = 5.0) -> bool:
+        """Fuerza la escritura de lo pendiente y espera a que termine."""
+        with self._cond:
+            self._forzar = True
+            self._cond.notify()
+        limite = time.monotonic() + timeout
+        while time.monotonic() < limite:
+            if self.pendientes() == 0:
+                return True
+            time.sleep(0.01)
+        return False
+
+    def detener(self, timeout: float = 5.0):
+        self.vaciar(timeout)
+        with self._cond:
+            self._detenido = True
+            self._cond.notify()
+        if self._hilo is not None:
+            self._hilo.join(timeout=timeout)
+            self._hilo = None
+
+    # ---------------------------------------------------------
+    # Internos
+    # ---------------------------------------------------------
+    def _asegurar_hilo(self):
+        if self._hilo is None or not self._hilo.is_alive():
+            self._detenido = False
+            self._hilo = threading.Thread(target=self._loop, name="audit-writer", daemon=True)
+            self._hilo.start()
+
+    def _tomar_lote(self) -> list[dict]:
+        with self._cond:
+            while True:
+                if self._buffer:
+                    listo = (
+                        self._detenido or self._forzar or len(self._buffer) >= self.tam_lote
+                        or time.monotonic() - self._primero >= self.intervalo
+                    )
+                    if listo:
+                        lote = [self._buffer.popleft() for _ in range(min(len(self._buffer), self.tam_lote))]
+                        self._en_escritura = len(lote)
+                        if not self._buffer:
+                            self._forzar = False
+                        return lote
+                    self._cond.wait(timeout=self._primero + self.intervalo - time.monotonic())
+                elif self._detenido:
+                    return []
+                else:
+                    self._forzar = False
+                    self._cond.wait()
+
+    def _escribir(self, lote: list[dict]):
+        tabla = Logs.__table__
+        try:
+            with self._engine_factory().begin() as conn:
+                conn.execute(insert(tabla).values(lote))
+            self.escritas += len(lote)
+            return
+        except Exception:
+            logger.exception("Error escribiendo %s eventos de auditoría; se reintentan uno por uno", len(lote))
+        # Una fila inválida (p. ej. admin_id inexistente) no debe arrastrar al lote entero
+        for fila in lote:
+            try:
+                with self._engine_factory().begin() as conn:
+                    conn.execute(insert(tabla).values(fila))
+                self.escritas += 1
+            except Exception:
+                self.descartadas += 1
+                logger.warning("Evento de auditoría descartado: %s", fila["accion"])
+
+    def _loop(self):
+        while True:
+            lote = self._tomar_lote()
+            if not lote:
+                return
+            try:
+                self._escribir(lote)
+            finally:
+                with self._cond:
+                    self._en_escritura = 0
+
+
+auditoria = AuditWriter(
+    tam_lote=settings.AUDIT_TAM_LOTE,
+    intervalo=settings.AUDIT_INTERVALO_SEG,
+    max_buffer=settings.AUDIT_MAX_BUFFER,
+)
+
+
+def registrar_evento(accion: str, detalle: Optional[str] = None, admin_id: Optional[int] = None):
+    """Encola el evento; la escritura real la hace el hilo de auditoría."""
+    auditoria.registrar(accion, detalle, admin_id)
+
+
+# -------------------------------------------------------------
+# Lectura: paginación por cursor sobre (fech, id), más reciente primero
+# -------------------------------------------------------------
+def _codificar_cursor(fech: datetime, id_: int) -> str:
+    datos = {"fech": fech.isoformat(), "id": id_}
+    return base64.urlsafe_b64encode(json.dumps(datos).encode()).decode()
+
+
+def _decodificar_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        datos = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(datos["fech"]), int(datos["id"])
+    except Exception:
+        raise ValueError("Cursor inválido")
+
+
+def consultar_logs(admin_id: Optional[int] = None, accion: Optional[str] = None,
+                   desde: Optional[datetime] = None, hasta: Optional[datetime] = None,
+                   cursor: Optional[str] = None, limit: int = 100) -> tuple[list, Optional[str]]:
+    """
+    Devuelve (filas, siguiente_cursor). Con admin_id o accion la consulta
+    recorre idx_logs_admin_fech / idx_logs_accion_fech en orden descendente;
+    sin filtros, idx_logs_fech_id.
+    """
+    filtros = []
+    if admin_id is not None:
+        filtros.append(Logs.admin_id == admin_id)
+    if accion:
+        filtros.append(Logs.accion == accion)
+    if desde is not None:
+        filtros.append(Logs.fech >= desde)
+    if hasta is not None:
+        filtros.append(Logs.fech <= hasta)
+    if cursor:
+        fech, id_ = _decodificar_cursor(cursor)
+        filtros.append(or_(Logs.fech < fech, and_(Logs.fech == fech, Logs.id < id_)))
+
+    stmt = (
+        select(Logs.id, Logs.admin_id, Logs.accion, Logs.detalle, Logs.fech)
+        .where(*filtros)
+        .order_by(Logs.fech.desc(), Logs.id.desc())
+        .limit(limit + 1)
+    )
+    with get_engine_main().connect() as conn:
+        filas = conn.execute(stmt).all()
+    siguiente = None
+    if len(filas) > limit:
+        filas = filas[:limit]
+        siguiente = _codificar_cursor(filas[-1].fech, filas[-1].id)
+    return filas, siguiente
@@ -0,0 +1,128 @@
+# app/services/cache_service.py
+import threading
+import time
+from collections import OrderedDict
+from types import SimpleNamespace
+from typing import Callable, Iterable, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.metrics import CACHE_INVITADOS
+from app.models.invitado import UsuarioInvitado
+
+# Columnas que se copian al cachear (nunca se guarda el objeto ORM: se
+# desliga de su sesión y no puede compartirse entre peticiones)
+COLUMNAS = [c.key for c in UsuarioInvitado.__table__.columns]
+
+
+def a_snapshot(invitado) -> SimpleNamespace:
+    return SimpleNamespace(**{c: getattr(invitado, c) for c in COLUMNAS})
+
+
+class CacheInvitados:
+    """
+    LRU acotado con TTL para registros de usuarios_invitados, accesible por
+    uid y por username. Cada proceso tiene el suyo: las escrituras locales lo
+    invalidan al instante y el TTL acota lo que tarda en verse una escritura
+    hecha por otro worker.
+    """
+
+    def __init__(self, max_items: int = 10000, ttl: float = 30.0, clock: Callable[[], float] = time.monotonic):
+        self.max_items = max_items
+        self.ttl = ttl
+        self._clock = clock
+        self._items: "OrderedDict[str, tuple[float, SimpleNamespace]]" = OrderedDict()  # uid -> (vence, datos)
+        self._por_username: dict[str, str] = {}
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def _contar(self, acierto: bool):
+        if acierto:
+            self.aciertos += 1
+        else:
+            self.fallos += 1
+        CACHE_INVITADOS.labels("hit" if acierto else "miss").inc()
+
+    def obtener_por_uid(self, uid: str) -> Optional[SimpleNamespace]:
+        with self._lock:
+            entrada = self._items.get(uid)
+            if entrada is not None and entrada[0] <= self._clock():
+                self._quitar(uid)
+                entrada = None
+            if entrada is not None:
+                self._items.move_to_end(uid)
+            self._contar(entrada is not None)
+            return entrada[1] if entrada else None
+
+    def obtener_por_username(self, username: str) -> Optional[SimpleNamespace]:
+        with self._lock:
+            uid = self._por_username.get(username)
+        if uid is None:
+            with self._lock:
+                self._contar(False)
+            return None
+        return self.obtener_por_uid(uid)
+
+    def guardar(self, datos: SimpleNamespace):
+        with self._lock:
+            self._quitar(datos.uid)
+            self._items[datos.uid] = (self._clock() + self.ttl, datos)
+            self._por_username[datos.username] = datos.uid
+            while len(self._items) > self.max_items:
+                self._quitar(next(iter(self._items)))
+
+    def invalidar(self, uid: Optional[str] = None, username: Optional[str] = None):
+        with self._lock:
+            if uid is None and username is not None:
+                uid = self._por_username.get(username)
+            if uid is not None:
+                self._quitar(uid)
+
+    def invalidar_usernames(self, usernames: Iterable[str]):
+        with self._lock:
+            for username in usernames:
+                uid = self._por_username.get(username)
+                if uid is not None:
+                    self._quitar(uid)
+
+    def limpiar(self):
+        with self._lock:
+            self._items.clear()
+            self._por_username.clear()
+
+    def __len__(self):
+        return len(self._items)
+
+    def _quitar(self, uid: str):
+        entrada = self._items.pop(uid, None)
+        if entrada is not None and self._por_username.get(entrada[1].username) == uid:
+            del self._por_username[entrada[1].username]
+
+
+cache_invitados = CacheInvitados(settings.CACHE_INVITADOS_ITEMS, settings.CACHE_INVITADOS_TTL_SEG)
+
+
+# -------------------------------------------------------------
+# Lecturas con caché (endpoints asíncronos)
+# -------------------------------------------------------------
+async def invitado_por_uid(db: AsyncSession, uid: str) -> Optional[SimpleNamespace]:
+    datos = cache_invitados.obtener_por_uid(uid)
+    if datos is None:
+        invitado = (await db.execute(select(UsuarioInvitado).filter_by(uid=uid))).scalars().first()
+        if invitado is not None:
+            datos = a_snapshot(invitado)
+            cache_invitados.guardar(datos)
+    return datos
+
+
+async def invitado_por_username(db: AsyncSession, username: str) -> Optional[SimpleNamespace]:
+    datos = cache_invitados.obtener_por_username(username)
+    if datos is None:
+        invitado = (await db.execute(select(UsuarioInvitado).filter_by(username=username))).scalars().first()
+        if invitado is not None:
+            datos = a_snapshot(invitado)
+            cache_invitados.guardar(datos)
+    return datos
@@ -1,9 +1,287 @@
-import subprocess
-
-def enviar_coa(username: str, ap_ip: str, secret: str):
-    try:
-        cmd = f"(echo 'User-Name = {username}') | radclient -x {ap_ip}:3799 coa {secret}"
-        result = subprocess.run(cmd, shell=True, check=True, capture_output=True, text=True)
-        return result.stdout
-    except subprocess.CalledProcessError as e:
-        return f"Error al enviar CoA: {e.stderr}"
+import asyncio
+import hashlib
+import socket
+import struct
+import weakref
+from collections import deque
+from typing import Callable, Optional
+
+from app.core.config import settings
+from app.core.metrics import COMANDO_FALLOS, medir_comando
+
+# -------------------------------------------------------------
+# Constantes RFC 2865 / RFC 5176
+# -------------------------------------------------------------
+DISCONNECT_REQUEST = 40
+DISCONNECT_ACK = 41
+DISCONNECT_NAK = 42
+COA_REQUEST = 43
+COA_ACK = 44
+COA_NAK = 45
+
+NOMBRES_CODIGO = {
+    DISCONNECT_ACK: "Disconnect-ACK",
+    DISCONNECT_NAK: "Disconnect-NAK",
+    COA_ACK: "CoA-ACK",
+    COA_NAK: "CoA-NAK",
+}
+
+# Respuestas aceptables para cada tipo de petición
+RESPUESTAS_VALIDAS = {
+    DISCONNECT_REQUEST: (DISCONNECT_ACK, DISCONNECT_NAK),
+    COA_REQUEST: (COA_ACK, COA_NAK),
+}
+
+ATTR_USER_NAME = 1
+ATTR_FRAMED_IP_ADDRESS = 8
+ATTR_ACCT_SESSION_ID = 44
+ATTR_ERROR_CAUSE = 101
+
+
+# -------------------------------------------------------------
+# Codificación de paquetes
+# -------------------------------------------------------------
+def codificar_atributos(atributos: list[tuple[int, bytes]]) -> bytes:
+    return b"".join(struct.pack("!BB", tipo, len(valor) + 2) + valor for tipo, valor in atributos)
+
+
+def decodificar_atributos(datos: bytes) -> list[tuple[int, bytes]]:
+    atributos, i = [], 0
+    while i + 2 <= len(datos):
+        tipo, largo = datos[i], datos[i + 1]
+        if largo < 2 or i + largo > len(datos):
+            break
+        atributos.append((tipo, datos[i + 2:i + largo]))
+        i += largo
+    return atributos
+
+
+def construir_paquete(codigo: int, identificador: int, atributos: bytes, secret: bytes) -> bytes:
+    """Request Authenticator = MD5(Code+ID+Length+16 ceros+Atributos+Secret) (RFC 5176 §3)."""
+    largo = 20 + len(atributos)
+    cabecera = struct.pack("!BBH", codigo, identificador, largo)
+    autenticador = hashlib.md5(cabecera + b"\x00" * 16 + atributos + secret).digest()
+    return cabecera + autenticador + atributos
+
+
+def autenticador_respuesta(paquete: bytes, autenticador_pedido: bytes, secret: bytes) -> bytes:
+    return hashlib.md5(paquete[:4] + autenticador_pedido + paquete[20:] + secret).digest()
+
+
+def atributos_usuario(username: str, framed_ip: Optional[str] = None, session_id: Optional[str] = None):
+    atributos = [(ATTR_USER_NAME, username.encode())]
+    if framed_ip:
+        atributos.append((ATTR_FRAMED_IP_ADDRESS, socket.inet_aton(framed_ip)))
+    if session_id:
+        atributos.append((ATTR_ACCT_SESSION_ID, session_id.encode()))
+    return atributos
+
+
+# -------------------------------------------------------------
+# Cliente asíncrono (un socket UDP, hasta 256 peticiones en vuelo)
+# -------------------------------------------------------------
+class _ProtocoloCliente(asyncio.DatagramProtocol):
+    def __init__(self, cliente: "CoAClient"):
+        self.cliente = cliente
+
+    def datagram_received(self, data, addr):
+        self.cliente._recibir(data)
+
+    def error_received(self, exc):
+        pass  # ICMP port unreachable, etc.: lo cubre el timeout/reintento
+
+
+class CoAClient:
+    """
+    Cliente RFC 5176 en proceso. Multiplexa hasta 256 peticiones sobre un solo
+    socket usando el campo Identifier, retransmite con backoff exponencial y
+    valida el Response Authenticator antes de aceptar una respuesta.
+    """
+
+    def __init__(self, host: str, port: int, secret: str, timeout: float = 2.0, reintentos: int = 3):
+        self.host = host
+        self.port = port
+        self.secret = secret.encode()
+        self.timeout = timeout
+        self.reintentos = reintentos
+        self._transporte: Optional[asyncio.DatagramTransport] = None
+        self._ids_libres = deque(range(256))
+        self._cupos = asyncio.Semaphore(256)
+        self._pendientes: dict[int, tuple[asyncio.Future, bytes, int]] = {}
+        self._lock_socket = asyncio.Lock()
+
+    async def _asegurar_socket(self):
+        if self._transporte is None:
+            async with self._lock_socket:
+                if self._transporte is None:
+                    loop = asyncio.get_running_loop()
+                    self._transporte, _ = await loop.create_datagram_endpoint(
+                        lambda: _ProtocoloCliente(self), remote_addr=(self.host, self.port)
+                    )
+
+    def _recibir(self, data: bytes):
+        if len(data) < 20:
+            return
+        codigo, identificador, largo = struct.unpack("!BBH", data[:4])
+        pendiente = self._pendientes.get(identificador)
+        if pendiente is None or largo > len(data):
+            return
+        futuro, autenticador, pedido = pendiente
+        if codigo not in RESPUESTAS_VALIDAS.get(pedido, ()):
+            return  # p. ej. un CoA-ACK para un Disconnect-Request: se descarta
+        data = data[:largo]
+        if data[4:20] != autenticador_respuesta(data, autenticador, self.secret):
+            return  # respuesta falsificada o con otro secret: se descarta
+        if not futuro.done():
+            futuro.set_result((codigo, decodificar_atributos(data[20:])))
+
+    async def enviar(self, codigo: int, atributos: list[tuple[int, bytes]]) -> dict:
+        with medir_comando("coa"):
+            resultado = await self._enviar(codigo, atributos)
+        if not resultado["ok"]:
+            COMANDO_FALLOS.labels("coa").inc()
+        return resultado
+
+    async def _enviar(self, codigo: int, atributos: list[tuple[int, bytes]]) -> dict:
+        await self._asegurar_socket()
+        async with self._cupos:
+            identificador = self._ids_libres.popleft()
+            futuro = asyncio.get_running_loop().create_future()
+            paquete = construir_paquete(codigo, identificador, codificar_atributos(atributos), self.secret)
+            self._pendientes[identificador] = (futuro, paquete[4:20], codigo)
+            try:
+                espera = self.timeout
+                for intento in range(1, self.reintentos + 1):
+                    # Las retransmisiones son idénticas (mismo ID y autenticador)
+                    self._transporte.sendto(paquete)
+                    try:
+                        respuesta, attrs = await asyncio.wait_for(asyncio.shield(futuro), espera)
+                    except asyncio.TimeoutError:
+                        espera *= 2
+                        continue
+                    resultado = {
+                        "ok": respuesta in (DISCONNECT_ACK, COA_ACK),
+                        "codigo": respuesta,
+                        "respuesta": NOMBRES_CODIGO.get(respuesta, str(respuesta)),
+                        "intentos": intento,
+                    }
+                    causa = next((v for t, v in attrs if t == ATTR_ERROR_CAUSE and len(v) == 4), None)
+                    if causa is not None:
+                        resultado["error_cause"] = struct.unpack("!I", causa)[0]
+                    return resultado
+                return {"ok": False, "codigo": None, "respuesta": "timeout", "intentos": self.reintentos}
+            finally:
+                del self._pendientes[identificador]
+                self._ids_libres.append(identificador)
+                futuro.cancel()
+
+    async def desconectar(self, username: str, framed_ip: Optional[str] = None, session_id: Optional[str] = None) -> dict:
+        resultado = await self.enviar(DISCONNECT_REQUEST, atributos_usuario(username, framed_ip, session_id))
+        resultado["username"] = username
+        return resultado
+
+    async def coa(self, username: str, atributos_extra: list[tuple[int, bytes]] = ()) -> dict:
+        resultado = await self.enviar(COA_REQUEST, atributos_usuario(username) + list(atributos_extra))
+        resultado["username"] = username
+        return resultado
+
+    async def desconectar_varios(self, usernames: list[str]) -> list[dict]:
+        """Envía todos los Disconnect-Request en paralelo sobre el mismo socket."""
+        return list(await asyncio.gather(*(self.desconectar(u) for u in usernames)))
+
+    def cerrar(self):
+        if self._transporte is not None:
+            self._transporte.close()
+            self._transporte = None
+
+
+# Un cliente por event loop (los sockets asyncio no se comparten entre loops)
+_clientes: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, CoAClient]" = weakref.WeakKeyDictionary()
+
+
+def obtener_cliente_coa() -> CoAClient:
+    loop = asyncio.get_running_loop()
+    cliente = _clientes.get(loop)
+    if cliente is None:
+        cliente = _clientes[loop] = CoAClient(
+            settings.COA_HOST, settings.COA_PORT, settings.COA_SECRET,
+            timeout=settings.COA_TIMEOUT, reintentos=settings.COA_REINTENTOS,
+        )
+    return cliente
+
+
+async def desconectar_usuario_radius(username: str) -> dict:
+    return await obtener_cliente_coa().desconectar(username)
+
+
+async def desconectar_usuarios_radius(usernames: list[str]) -> list[dict]:
+    return await obtener_cliente_coa().desconectar_varios(usernames)
+
+
+# -------------------------------------------------------------
+# NAS de prueba: responde Disconnect/CoA localmente (pruebas y benchmarks)
+# -------------------------------------------------------------
+class _ProtocoloNas(asyncio.DatagramProtocol):
+    def __init__(self, nas: "StubNasServer"):
+        self.nas = nas
+
+    def connection_made(self, transport):
+        self.transporte = transport
+
+    def datagram_received(self, data, addr):
+        respuesta = self.nas._atender(data)
+        if respuesta is not None:
+            self.transporte.sendto(respuesta, addr)
+
+
+class StubNasServer:
+    """
+    NAS falso en 127.0.0.1. Valida el Request Authenticator, guarda cada
+    petición en `recibidos` y responde ACK (o lo que devuelva `responder`).
+    `descartar` hace que ignore los primeros N paquetes para probar reintentos.
+    """
+
+    def __init__(self, secret: str, responder: Optional[Callable[[str], bool]] = None, descartar: int = 0):
+        self.secret = secret.encode()
+        self.responder = responder or (lambda username: True)
+        self.descartar = descartar
+        self.recibidos: list[dict] = []
+        self.port: Optional[int] = None
+        self._transporte = None
+
+    async def iniciar(self, host: str = "127.0.0.1", port: int = 0) -> int:
+        loop = asyncio.get_running_loop()
+        self._transporte, _ = await loop.create_datagram_endpoint(
+            lambda: _ProtocoloNas(self), local_addr=(host, port)
+        )
+        self.port = self._transporte.get_extra_info("sockname")[1]
+        return self.port
+
+    def detener(self):
+        if self._transporte is not None:
+            self._transporte.close()
+
+    def _atender(self, data: bytes) -> Optional[bytes]:
+        if len(data) < 20:
+            return None
+        codigo, identificador, largo = struct.unpack("!BBH", data[:4])
+        data = data[:largo]
+        esperado = hashlib.md5(data[:4] + b"\x00" * 16 + data[20:] + self.secret).digest()
+        if data[4:20] != esperado:
+            return None
+        if self.descartar > 0:
+            self.descartar -= 1
+            return None
+        attrs = decodificar_atributos(data[20:])
+        username = next((v.decode() for t, v in attrs if t == ATTR_USER_NAME), "")
+        self.recibidos.append({"codigo": codigo, "id": identificador, "username": username})
+        ok = self.responder(username)
+        if codigo == DISCONNECT_REQUEST:
+            codigo_resp = DISCONNECT_ACK if ok else DISCONNECT_NAK
+        else:
+            codigo_resp = COA_ACK if ok else COA_NAK
+        # Error-Cause 503 "Session Context Not Found" en los NAK
+        attrs_resp = b"" if ok else codificar_atributos([(ATTR_ERROR_CAUSE, struct.pack("!I", 503))])
+        cabecera = struct.pack("!BBH", codigo_resp, identificador, 20 + len(attrs_resp))
+        autenticador = hashlib.md5(cabecera + data[4:20] + attrs_resp + self.secret).digest()
+        return cabecera + autenticador + attrs_resp
@@ -0,0 +1,200 @@
+# app/services/credencial_service.py
+import asyncio
+import base64
+import hashlib
+import hmac
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Iterable, Optional
+
+from app.core.config import settings
+
+PREFIJO = "scrypt$"
+# Alta masiva cuyo hash aún no se calculó: no guarda ninguna clave, el login
+# verifica contra radcheck (Cleartext-Password) y guarda el hash
+PENDIENTE = "pendiente$"
+_R, _P, _DKLEN = 8, 1, 32
+
+
+class VerificacionSaturada(Exception):
+    """Demasiadas verificaciones pendientes: se rechaza en vez de encolar sin límite."""
+
+
+# -------------------------------------------------------------
+# Hash y verificación (síncronos; costosos a propósito)
+# -------------------------------------------------------------
+def _b64(datos: bytes) -> str:
+    return base64.b64encode(datos).decode()
+
+
+def hashear(password: str, n: Optional[int] = None) -> str:
+    """Devuelve `scrypt$<n>$<r>$<p>$<sal>$<hash>` (sal y hash en base64)."""
+    n = n or settings.HASH_SCRYPT_N
+    sal = os.urandom(16)
+    dk = hashlib.scrypt(password.encode(), salt=sal, n=n, r=_R, p=_P, dklen=_DKLEN)
+    return f"{PREFIJO}{n}${_R}${_P}${_b64(sal)}${_b64(dk)}"
+
+
+def es_hash(almacenado: str) -> bool:
+    return almacenado.startswith(PREFIJO)
+
+
+def es_pendiente(almacenado: str) -> bool:
+    return almacenado == PENDIENTE
+
+
+def verificar(password: str, almacenado: str) -> bool:
+    """
+    Compara en tiempo constante. Los valores sin prefijo son contraseñas en
+    claro de antes de la migración: se aceptan y el login las rehashea.
+    """
+    if es_pendiente(almacenado):
+        return False
+    if not es_hash(almacenado):
+        return hmac.compare_digest(password.encode(), almacenado.encode())
+    try:
+        n, r, p, sal, dk = almacenado[len(PREFIJO):].split("$")
+        esperado = base64.b64decode(dk)
+        calculado = hashlib.scrypt(password.encode(), salt=base64.b64decode(sal),
+                                   n=int(n), r=int(r), p=int(p), dklen=len(esperado))
+    except (ValueError, TypeError):
+        return False
+    return hmac.compare_digest(calculado, esperado)
+
+
+def necesita_rehash(almacenado: str) -> bool:
+    """True si no es un hash scrypt con los parámetros actuales (incluido uno mal formado)."""
+    if not es_hash(almacenado):
+        return True
+    try:
+        n, r, p = (int(x) for x in almacenado[len(PREFIJO):].split("$")[:3])
+    except ValueError:
+        return True
+    return (n, r, p) != (settings.HASH_SCRYPT_N, _R, _P)
+
+
+# -------------------------------------------------------------
+# Pool acotado + caché de credenciales verificadas
+# -------------------------------------------------------------
+class VerificadorCredenciales:
+    """
+    Corre scrypt en un pool de hilos propio (no el threadpool de anyio, que
+    atiende al resto de endpoints síncronos) y rechaza con
+    `VerificacionSaturada` cuando hay más de `max_pendientes` en curso.
+    El trabajo diferido (hashes de altas masivas) va a un único hilo aparte
+    para no quitarle hilos al login.
+    Los aciertos se recuerdan `ttl` segundos bajo un HMAC de
+    (password, hash almacenado) con una clave aleatoria por proceso: la
+    caché nunca guarda la contraseña, y cambiarla invalida la entrada.
+    `olvidar` descarta las entradas de un username (al revocarlo).
+    """
+
+    def __init__(self, hilos: int = 4, max_pendientes: int = 256, ttl: float = 60.0,
+                 max_items: int = 10000, clock: Callable[[], float] = time.monotonic):
+        self.hilos = hilos
+        self.ttl = ttl
+        self.max_items = max_items
+        self._clock = clock
+        self._cupos = threading.BoundedSemaphore(max_pendientes)
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._pool_fondo: Optional[ThreadPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+        self._clave = os.urandom(32)
+        self._verificadas: "OrderedDict[bytes, tuple[float, Optional[str]]]" = OrderedDict()  # huella -> (vence, username)
+        self._por_usuario: dict[str, set[bytes]] = {}
+        self._lock = threading.Lock()
+
+    def _obtener_pool(self) -> ThreadPoolExecutor:
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(max_workers=self.hilos, thread_name_prefix="credenciales")
+        return self._pool
+
+    def _huella(self, password: str, almacenado: str) -> bytes:
+        return hmac.new(self._clave, f"{password}\0{almacenado}".encode(), hashlib.sha256).digest()
+
+    def _descartar(self, huella: bytes, username: Optional[str]):
+        # Con el lock tomado
+        huellas = self._por_usuario.get(username)
+        if huellas is not None:
+            huellas.discard(huella)
+            if not huellas:
+                del self._por_usuario[username]
+
+    def _en_cache(self, huella: bytes) -> bool:
+        with self._lock:
+            entrada = self._verificadas.get(huella)
+            if entrada is None:
+                return False
+            if entrada[0] <= self._clock():
+                del self._verificadas[huella]
+                self._descartar(huella, entrada[1])
+                return False
+            self._verificadas.move_to_end(huella)
+            return True
+
+    def _recordar(self, huella: bytes, username: Optional[str]):
+        with self._lock:
+            self._verificadas[huella] = (self._clock() + self.ttl, username)
+            self._verificadas.move_to_end(huella)
+            if username is not None:
+                self._por_usuario.setdefault(username, set()).add(huella)
+            while len(self._verificadas) > self.max_items:
+                vieja, (_, usuario) = self._verificadas.popitem(last=False)
+                self._descartar(vieja, usuario)
+
+    def olvidar(self, usernames: Iterable[str]):
+        with self._lock:
+            for username in usernames:
+                for huella in self._por_usuario.pop(username, ()):
+                    self._verificadas.pop(huella, None)
+
+    async def verificar(self, password: str, almacenado: str, username: Optional[str] = None) -> bool:
+        huella = self._huella(password, almacenado)
+        if self._en_cache(huella):
+            return True
+        if not self._cupos.acquire(blocking=False):
+            raise VerificacionSaturada()
+        try:
+            ok = await asyncio.get_running_loop().run_in_executor(self._obtener_pool(), verificar, password, almacenado)
+        finally:
+            self._cupos.release()
+        if ok:
+            self._recordar(huella, username)
+        return ok
+
+    async def hashear(self, password: str) -> str:
+        return await asyncio.get_running_loop().run_in_executor(self._obtener_pool(), hashear, password)
+
+    def en_segundo_plano(self, funcion: Callable, *args) -> Future:
+        with self._pool_lock:
+            if self._pool_fondo is None:
+                self._pool_fondo = ThreadPoolExecutor(max_workers=1, thread_name_prefix="credenciales-fondo")
+            return self._pool_fondo.submit(funcion, *args)
+
+    def esperar_fondo(self, timeout: Optional[float] = None):
+        """Espera a que termine el trabajo diferido encolado hasta ahora (el hilo es FIFO)."""
+        if self._pool_fondo is not None:
+            self.en_segundo_plano(lambda: None).result(timeout)
+
+    def limpiar(self):
+        with self._lock:
+            self._verificadas.clear()
+            self._por_usuario.clear()
+
+    def cerrar(self):
+        with self._pool_lock:
+            for pool in (self._pool, self._pool_fondo):
+                if pool is not None:
+                    pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = self._pool_fondo = None
+
+
+verificador = VerificadorCredenciales(
+    settings.CREDENCIALES_HILOS, settings.CREDENCIALES_MAX_PENDIENTES,
+    settings.CREDENCIALES_CACHE_TTL_SEG, settings.CREDENCIALES_CACHE_ITEMS,
+)
@@ -0,0 +1,98 @@
+# app/services/expiracion_service.py
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import select, update
+
+from app.core.config import settings
+from app.core.periodic import TareaPeriodica
+from app.db.session import SessionLocal
+from app.models.invitado import UsuarioInvitado
+from app.services.cache_service import cache_invitados
+from app.services.lease_service import liberar_leases
+from app.services.network_service import revocar_usuarios
+from app.services.radius_service import eliminar_usuarios_radius
+from app.services.scheduler_service import scheduler
+from app.services.sesion_ip_service import indice_sesiones
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()  # un solo barrido a la vez por proceso
+
+
+def calcular_expiracion(expiracion: Optional[datetime], session_timeout: Optional[int],
+                        desde: Optional[datetime] = None) -> Optional[datetime]:
+    """
+    Fija la expiración al crear el invitado para que el barrido y /estado
+    no tengan que recalcularla: la explícita manda; si no, `session_timeout`
+    minutos desde ahora. Sin ninguna de las dos, el invitado no vence.
+    """
+    if expiracion is not None:
+        return expiracion
+    if session_timeout and session_timeout > 0:
+        return (desde or datetime.now()) + timedelta(minutes=session_timeout)
+    return None
+
+
+def _siguiente_lote(ahora: datetime, tam_lote: int) -> list[tuple[int, str]]:
+    db = SessionLocal()
+    try:
+        filas = db.execute(
+            select(UsuarioInvitado.id, UsuarioInvitado.username)
+            .where(UsuarioInvitado.estado == "activo", UsuarioInvitado.expiracion <= ahora)
+            .order_by(UsuarioInvitado.expiracion)
+            .limit(tam_lote)
+        ).all()
+        if not filas:
+            return []
+        # Una sola sentencia para todo el lote; repetir la condición de estado
+        # evita pisar un invitado revocado entre el SELECT y el UPDATE
+        db.execute(
+            update(UsuarioInvitado)
+            .where(UsuarioInvitado.id.in_([f.id for f in filas]), UsuarioInvitado.estado == "activo")
+            .values(estado="expirado"),
+            execution_options={"synchronize_session": False},
+        )
+        db.commit()
+        return [(f.id, f.username) for f in filas]
+    finally:
+        db.close()
+
+
+def barrer_expirados(ahora: Optional[datetime] = None, tam_lote: Optional[int] = None) -> dict:
+    """
+    Marca como `expirado` a los invitados activos cuya expiración ya pasó,
+    borra sus credenciales de RADIUS y quita su acceso en el firewall,
+    todo por lotes (un UPDATE, un DELETE por tabla y una revocación masiva).
+    """
+    ahora = ahora or datetime.now()
+    tam_lote = tam_lote or settings.BARRIDO_TAM_LOTE
+    expirados, revocadas = 0, 0
+    with _lock:
+        while True:
+            lote = _siguiente_lote(ahora, tam_lote)
+            if not lote:
+                break
+            usernames = [u for _, u in lote]
+            expirados += len(lote)
+            cache_invitados.invalidar_usernames(usernames)
+            try:
+                eliminar_usuarios_radius(usernames)
+            except Exception:
+                logger.exception("Error borrando credenciales RADIUS de %s invitados expirados", len(usernames))
+            # Las IPs vienen del programador y de los leases (sesiones de otros workers)
+            ips = list(scheduler.cancelar_usuarios(usernames) | liberar_leases(usernames))
+            if ips:
+                indice_sesiones.quitar(ips)
+                revocar_usuarios(ips)
+                revocadas += len(ips)
+            if len(lote) < tam_lote:
+                break
+    if expirados:
+        logger.info("Barrido: %s invitados expirados, %s IPs revocadas", expirados, revocadas)
+    return {"expirados": expirados, "ips_revocadas": revocadas}
+
+
+tarea_barrido = TareaPeriodica("barrido-expirados", settings.BARRIDO_INTERVALO_SEG, barrer_expirados)
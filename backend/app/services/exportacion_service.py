@@ -0,0 +1,189 @@
+# app/services/exportacion_service.py
+import csv
+import io
+import threading
+import zlib
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Callable, Iterator, Optional
+
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.db.radius_schema import radacct
+from app.db.session import get_engine_main, get_engine_radius
+from app.db.streaming import stream_rows
+from app.models.invitado import UsuarioInvitado
+from app.models.log import Logs
+
+FORMATOS = {
+    "csv": ("application/gzip", "csv.gz"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+
+@dataclass(frozen=True)
+class Dataset:
+    engine: Callable
+    columnas: list
+    columna_tiempo: object  # filtro desde (incluido) / hasta (excluido)
+    orden: object
+
+
+_inv = UsuarioInvitado.__table__.c
+_log = Logs.__table__.c
+DATASETS = {
+    # Sin la columna password (hash o, en filas viejas, la clave en claro)
+    "invitados": Dataset(get_engine_main, [c for c in UsuarioInvitado.__table__.columns if c.key != "password"],
+                         _inv.creado_en, _inv.id),
+    "admin_logs": Dataset(get_engine_main, list(Logs.__table__.columns), _log.fech, _log.id),
+    "radacct": Dataset(get_engine_radius, list(radacct.columns), radacct.c.acctstarttime, radacct.c.radacctid),
+}
+
+_cupos = threading.BoundedSemaphore(max(1, settings.EXPORT_MAX_CONCURRENTES))
+
+
+class ExportacionOcupada(Exception):
+    """Ya hay EXPORT_MAX_CONCURRENTES exportaciones en curso."""
+
+
+class ParquetNoDisponible(Exception):
+    """pyarrow no está instalado (solo lo necesita el formato parquet)."""
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        raise ParquetNoDisponible("El formato parquet requiere pyarrow (pip install pyarrow)")
+    return pyarrow
+
+
+def consulta(nombre: str, desde: Optional[datetime] = None, hasta: Optional[datetime] = None):
+    dataset = DATASETS[nombre]
+    filtros = []
+    if desde is not None:
+        filtros.append(dataset.columna_tiempo >= desde)
+    if hasta is not None:
+        filtros.append(dataset.columna_tiempo < hasta)
+    return select(*dataset.columnas).where(*filtros).order_by(dataset.orden)
+
+
+# -------------------------------------------------------------
+# Serializadores: una partición del cursor a la vez
+# -------------------------------------------------------------
+def _valor_csv(valor):
+    if valor is None:
+        return ""
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat(sep=" ") if isinstance(valor, datetime) else valor.isoformat()
+    return valor
+
+
+def iter_csv_gzip(engine, stmt, tam_lote: int) -> Iterator[bytes]:
+    """CSV con encabezado, comprimido en gzip al vuelo (un bloque por partición)."""
+    gz = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31: contenedor gzip
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    escritor.writerow([c.name for c in stmt.selected_columns])
+    for particion in stream_rows(engine, stmt, tam_lote):
+        escritor.writerows([_valor_csv(v) for v in fila] for fila in particion)
+        bloque = gz.compress(buffer.getvalue().encode())
+        buffer.seek(0)
+        buffer.truncate()
+        if bloque:
+            yield bloque
+    yield gz.compress(buffer.getvalue().encode()) + gz.flush()
+
+
+class _Salida(io.RawIOBase):
+    """Destino no buscable para ParquetWriter: acumula lo escrito hasta que se recoge."""
+
+    def __init__(self):
+        self._partes: list[bytes] = []
+        self._posicion = 0
+
+    def writable(self):
+        return True
+
+    def write(self, datos):
+        self._partes.append(bytes(datos))
+        self._posicion += len(datos)
+        return len(datos)
+
+    def tell(self):
+        return self._posicion
+
+    def recoger(self) -> bytes:
+        datos = b"".join(self._partes)
+        self._partes.clear()
+        return datos
+
+
+def _tipo_arrow(pa, columna):
+    try:
+        tipo = columna.type.python_type
+    except NotImplementedError:
+        return pa.string()
+    if tipo is int:
+        return pa.int64()
+    if tipo is bool:
+        return pa.bool_()
+    if tipo is float:
+        return pa.float64()
+    if tipo is datetime:
+        return pa.timestamp("us")
+    if tipo is date:
+        return pa.date32()
+    return pa.string()
+
+
+def iter_parquet(engine, stmt, tam_lote: int) -> Iterator[bytes]:
+    """Parquet con un row group por partición del cursor; se emite cada row group al cerrarlo."""
+    pa = _pyarrow()
+    esquema = pa.schema([(c.name, _tipo_arrow(pa, c)) for c in stmt.selected_columns])
+    salida = _Salida()
+    with pa.parquet.ParquetWriter(salida, esquema, compression="snappy") as escritor:
+        for particion in stream_rows(engine, stmt, tam_lote):
+            columnas = list(zip(*particion))
+            lote = pa.RecordBatch.from_arrays(
+                [pa.array(valores, type=campo.type) for valores, campo in zip(columnas, esquema)], schema=esquema
+            )
+            escritor.write_batch(lote, row_group_size=len(particion))
+            yield salida.recoger()
+    yield salida.recoger()
+
+
+def exportar(nombre: str, formato: str, desde: Optional[datetime] = None, hasta: Optional[datetime] = None,
+             tam_lote: Optional[int] = None, limitar: bool = True) -> Iterator[bytes]:
+    """
+    Genera el archivo por bloques, leyendo con un cursor del servidor en
+    particiones de `tam_lote` filas: la memoria no depende del total.
+    Con `limitar`, ocupa un cupo de EXPORT_MAX_CONCURRENTES desde ya hasta
+    que el generador termina o se cierra (lanza ExportacionOcupada si no hay).
+    """
+    if formato == "parquet":
+        _pyarrow()
+    dataset = DATASETS[nombre]
+    stmt = consulta(nombre, desde, hasta)
+    serializar = iter_parquet if formato == "parquet" else iter_csv_gzip
+
+    def generar():
+        if limitar and not _cupos.acquire(blocking=False):
+            raise ExportacionOcupada()
+        try:
+            yield b""  # ya con el cupo: desde aquí, cerrar el generador lo libera
+            yield from serializar(dataset.engine(), stmt, tam_lote or settings.EXPORT_TAM_LOTE)
+        finally:
+            if limitar:
+                _cupos.release()
+
+    bloques = generar()
+    next(bloques)
+    return bloques
+
+
+def nombre_archivo(nombre: str, formato: str, desde: Optional[datetime], hasta: Optional[datetime]) -> str:
+    rango = "_".join(d.strftime("%Y%m%d") for d in (desde, hasta) if d is not None)
+    return f"{nombre}{'_' + rango if rango else ''}.{FORMATOS[formato][1]}"
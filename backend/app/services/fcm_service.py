@@ -1,14 +1,288 @@
-#revisar
-import firebase_admin
-from firebase_admin import credentials, messaging
+# app/services/fcm_service.py
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
 from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.notificacion import NotificacionPendiente
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Notificacion:
+    titulo: str
+    cuerpo: str
+    topic: str = "admins"
+    intentos: int = 0
+    proximo_intento: float = 0.0
+    id_db: Optional[int] = None  # fila en notificaciones_pendientes (si se persiste)
+
+    @property
+    def clave(self):
+        return (self.topic, self.titulo, self.cuerpo)
+
+
+# -------------------------------------------------------------
+# Transportes
+# -------------------------------------------------------------
+class FirebaseTransport:
+    """Envía lotes con messaging.send_each. Firebase se inicializa en el primer envío."""
+
+    def __init__(self, credenciales: str):
+        self.credenciales = credenciales
+        self._lock = threading.Lock()
+        self._messaging = None
+
+    def _inicializar(self):
+        with self._lock:
+            if self._messaging is None:
+                import firebase_admin
+                from firebase_admin import credentials, messaging
+                try:
+                    firebase_admin.get_app()
+                except ValueError:
+                    firebase_admin.initialize_app(credentials.Certificate(self.credenciales))
+                self._messaging = messaging
+        return self._messaging
+
+    def send_each(self, lote: list[Notificacion]) -> list[Optional[str]]:
+        """Devuelve, por mensaje, None si se envió o el texto del error."""
+        messaging = self._messaging or self._inicializar()
+        mensajes = [
+            messaging.Message(
+                notification=messaging.Notification(title=n.titulo, body=n.cuerpo),
+                topic=n.topic,
+            )
+            for n in lote
+        ]
+        respuesta = messaging.send_each(mensajes)
+        return [None if r.success else str(r.exception) for r in respuesta.responses]
+
+
+class FakeTransport:
+    """Transporte en memoria para pruebas: registra cada lote enviado."""
+
+    def __init__(self, fallar: int = 0, latencia: float = 0.0):
+        self.lotes: list[list[Notificacion]] = []
+        self.fallar = fallar  # cuántos mensajes fallan antes de empezar a aceptar
+        self.latencia = latencia
+
+    def send_each(self, lote: list[Notificacion]) -> list[Optional[str]]:
+        if self.latencia:
+            time.sleep(self.latencia)
+        self.lotes.append(list(lote))
+        resultados = []
+        for _ in lote:
+            if self.fallar > 0:
+                self.fallar -= 1
+                resultados.append("fake: unavailable")
+            else:
+                resultados.append(None)
+        return resultados
+
+    @property
+    def enviados(self) -> list[Notificacion]:
+        return [n for lote in self.lotes for n in lote]
+
+
+# -------------------------------------------------------------
+# Outbox: cola en proceso + worker que envía por lotes
+# -------------------------------------------------------------
+class Outbox:
+    """
+    `encolar` solo agrega a memoria (y opcionalmente a la tabla
+    notificaciones_pendientes) y regresa de inmediato. Un hilo vacía la cola
+    en lotes de hasta `tam_lote` con send_each, reintenta los fallos con
+    backoff exponencial y fusiona alertas idénticas aún no enviadas.
+    """
+
+    def __init__(self, transport=None, tam_lote: int = 500, max_intentos: int = 5,
+                 backoff: float = 1.0, persistir: bool = False):
+        self._transport = transport
+        self.tam_lote = tam_lote
+        self.max_intentos = max_intentos
+        self.backoff = backoff
+        self.persistir = persistir
+        self._pendientes: "OrderedDict[tuple, Notificacion]" = OrderedDict()
+        self._en_envio = 0
+        self._cond = threading.Condition()
+        self._hilo: Optional[threading.Thread] = None
+        self._detenido = False
+        self.fusionadas = 0
+        self.descartadas = 0
+
+    @property
+    def transport(self):
+        if self._transport is None:
+            self._transport = FirebaseTransport(settings.FIREBASE_CREDENTIALS)
+        return self._transport
+
+    def encolar(self, titulo: str, cuerpo: str, topic: str = "admins") -> bool:
+        """Devuelve False si la alerta se fusionó con otra idéntica pendiente."""
+        n = Notificacion(titulo, cuerpo, topic)
+        with self._cond:
+            if n.clave in self._pendientes:
+                self.fusionadas += 1
+                return False
+        if self.persistir:
+            # Se guarda antes de hacerla visible al worker, que la borra al enviarla
+            n.id_db = _guardar_pendiente(n)
+        with self._cond:
+            if n.clave in self._pendientes:
+                self.fusionadas += 1
+                fusionada = True
+            else:
+                self._pendientes[n.clave] = n
+                fusionada = False
+                self._asegurar_hilo()
+                self._cond.notify()
+        if fusionada and n.id_db is not None:
+            _borrar_pendientes([n.id_db])
+        return not fusionada
+
+    def pendientes(self) -> int:
+        with self._cond:
+            return len(self._pendientes) + self._en_envio
+
+    def vaciar(self, timeout: float = 5.0) -> bool:
+        """Espera a que no queden mensajes por enviar (incluidos reintentos)."""
+        limite = time.monotonic() + timeout
+        while time.monotonic() < limite:
+            if self.pendientes() == 0:
+                return True
+            time.sleep(0.01)
+        return False
+
+    def recuperar(self):
+        """Recarga lo que quedó en notificaciones_pendientes (tras reiniciar)."""
+        duplicadas = []
+        for n in _cargar_pendientes():
+            with self._cond:
+                if self._pendientes.setdefault(n.clave, n) is not n:
+                    duplicadas.append(n.id_db)
+        _borrar_pendientes(duplicadas)
+        with self._cond:
+            if self._pendientes:
+                self._asegurar_hilo()
+                self._cond.notify()
+
+    def detener(self, timeout: float = 5.0):
+        self.vaciar(timeout)
+        with self._cond:
+            self._detenido = True
+            self._cond.notify()
+        if self._hilo is not None:
+            self._hilo.join(timeout=timeout)
+            self._hilo = None
+
+    # ---------------------------------------------------------
+    # Internos
+    # ---------------------------------------------------------
+    def _asegurar_hilo(self):
+        if self._hilo is None or not self._hilo.is_alive():
+            self._detenido = False
+            self._hilo = threading.Thread(target=self._loop, name="fcm-outbox", daemon=True)
+            self._hilo.start()
+
+    def _tomar_lote(self) -> list[Notificacion]:
+        with self._cond:
+            while not self._detenido:
+                ahora = time.monotonic()
+                listos = [n for n in self._pendientes.values() if n.proximo_intento <= ahora][:self.tam_lote]
+                if listos:
+                    for n in listos:
+                        del self._pendientes[n.clave]
+                    self._en_envio = len(listos)
+                    return listos
+                if self._pendientes:
+                    espera = min(n.proximo_intento for n in self._pendientes.values()) - ahora
+                    self._cond.wait(timeout=max(espera, 0.001))
+                else:
+                    self._cond.wait()
+            return []
+
+    def _loop(self):
+        while True:
+            lote = self._tomar_lote()
+            if not lote:
+                return
+            try:
+                resultados = self.transport.send_each(lote)
+            except Exception as e:
+                logger.exception("Error enviando lote FCM")
+                resultados = [str(e)] * len(lote)
+
+            enviados = []
+            with self._cond:
+                for n, error in zip(lote, resultados):
+                    if error is None:
+                        enviados.append(n)
+                        continue
+                    n.intentos += 1
+                    if n.intentos >= self.max_intentos:
+                        self.descartadas += 1
+                        enviados.append(n)  # se da por perdida; sale de la tabla también
+                        logger.warning("Notificación descartada tras %s intentos: %s", n.intentos, error)
+                        continue
+                    n.proximo_intento = time.monotonic() + self.backoff * 2 ** (n.intentos - 1)
+                    if self._pendientes.setdefault(n.clave, n) is not n:
+                        # Mientras se enviaba se encoló otra idéntica: esa la
+                        # reemplaza, y la fila de esta ya no debe reenviarse
+                        self.fusionadas += 1
+                        enviados.append(n)
+                self._en_envio = 0
+            if self.persistir:
+                _borrar_pendientes([n.id_db for n in enviados if n.id_db is not None])
+
+
+# -------------------------------------------------------------
+# Persistencia opcional (tabla notificaciones_pendientes)
+# -------------------------------------------------------------
+def _guardar_pendiente(n: Notificacion) -> int:
+    db = SessionLocal()
+    try:
+        fila = NotificacionPendiente(topic=n.topic, titulo=n.titulo, cuerpo=n.cuerpo)
+        db.add(fila)
+        db.commit()
+        return fila.id
+    finally:
+        db.close()
+
+
+def _cargar_pendientes() -> list[Notificacion]:
+    db = SessionLocal()
+    try:
+        return [
+            Notificacion(f.titulo, f.cuerpo, f.topic, id_db=f.id)
+            for f in db.query(NotificacionPendiente).order_by(NotificacionPendiente.id)
+        ]
+    finally:
+        db.close()
+
+
+def _borrar_pendientes(ids: list[int]):
+    if not ids:
+        return
+    db = SessionLocal()
+    try:
+        db.query(NotificacionPendiente).filter(NotificacionPendiente.id.in_(ids)).delete(synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+
+outbox = Outbox(
+    tam_lote=settings.FCM_TAM_LOTE,
+    max_intentos=settings.FCM_MAX_INTENTOS,
+    persistir=settings.FCM_OUTBOX_PERSISTIR,
+)
 
-cred = credentials.Certificate(settings.FIREBASE_CREDENTIALS)
-firebase_admin.initialize_app(cred)
 
 def enviar_notificacion(titulo, cuerpo, topic="admins"):
-    msg = messaging.Message(
-        notification=messaging.Notification(title=titulo, body=cuerpo),
-        topic=topic
-    )
-    messaging.send(msg)
+    """Encola la notificación; el envío real lo hace el worker del outbox."""
+    return outbox.encolar(titulo, cuerpo, topic)
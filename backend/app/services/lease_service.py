@@ -0,0 +1,61 @@
+# app/services/lease_service.py
+from datetime import datetime, timedelta
+from typing import Iterable, Optional
+
+from sqlalchemy import select, delete
+
+from app.db.session import get_engine_main
+from app.db.upsert import upsert
+from app.models.sesion_lease import SesionLease
+
+_tabla = SesionLease.__table__
+
+
+def registrar_lease(ip: str, username: str, duracion_seg: float) -> datetime:
+    """
+    Guarda (o renueva) la autorización de `ip` hasta ahora + `duracion_seg`.
+    Es la fuente de verdad del reconciliador: sobrevive a reinicios y la
+    comparten todos los workers.
+    """
+    expira_en = datetime.now() + timedelta(seconds=duracion_seg)
+    with get_engine_main().begin() as conn:
+        upsert(conn, _tabla, [{"ip": ip, "username": username, "expira_en": expira_en}],
+               ["ip"], reemplazar=("username", "expira_en"))
+    return expira_en
+
+
+def lease_de(ip: str) -> Optional[tuple[str, datetime]]:
+    """(username, expira_en) del lease de la IP, o None."""
+    with get_engine_main().connect() as conn:
+        fila = conn.execute(select(_tabla.c.username, _tabla.c.expira_en).where(_tabla.c.ip == ip)).first()
+    return (fila.username, fila.expira_en) if fila else None
+
+
+def leases_activos(ahora: Optional[datetime] = None,
+                   ips: Optional[Iterable[str]] = None) -> dict[str, tuple[str, datetime]]:
+    """{ip: (username, expira_en)} de los leases no vencidos (solo de `ips`, si se indican)."""
+    ahora = ahora or datetime.now()
+    stmt = select(_tabla.c.ip, _tabla.c.username, _tabla.c.expira_en).where(_tabla.c.expira_en > ahora)
+    if ips is not None:
+        stmt = stmt.where(_tabla.c.ip.in_(list(ips)))
+    with get_engine_main().connect() as conn:
+        return {f.ip: (f.username, f.expira_en) for f in conn.execute(stmt)}
+
+
+def liberar_leases(usernames: Iterable[str] = (), ips: Iterable[str] = ()) -> dict[str, str]:
+    """Borra los leases de esos usuarios o IPs y devuelve {ip: username} de los borrados."""
+    usernames, ips = list(usernames), list(ips)
+    if not usernames and not ips:
+        return {}
+    condicion = _tabla.c.username.in_(usernames) | _tabla.c.ip.in_(ips)
+    with get_engine_main().begin() as conn:
+        borrados = {f.ip: f.username for f in conn.execute(select(_tabla.c.ip, _tabla.c.username).where(condicion))}
+        if borrados:
+            conn.execute(delete(_tabla).where(_tabla.c.ip.in_(list(borrados))))
+    return borrados
+
+
+def purgar_vencidos(ahora: Optional[datetime] = None) -> int:
+    ahora = ahora or datetime.now()
+    with get_engine_main().begin() as conn:
+        return conn.execute(delete(_tabla).where(_tabla.c.expira_en <= ahora)).rowcount
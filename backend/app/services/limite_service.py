@@ -0,0 +1,57 @@
+# app/services/limite_service.py
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable
+
+from app.core.config import settings
+
+
+class LimitadorTokens:
+    """
+    Token bucket por clave (IP, username...): `rafaga` intentos seguidos y
+    después `por_minuto` de forma sostenida. Todo en memoria y O(1); las
+    claves menos usadas se descartan al pasar de `max_claves` (una clave
+    descartada vuelve con el cubo lleno). `rafaga` <= 0 lo desactiva.
+    """
+
+    def __init__(self, rafaga: int, por_minuto: float, max_claves: int = 100000,
+                 clock: Callable[[], float] = time.monotonic):
+        self.rafaga = rafaga
+        self.tasa = por_minuto / 60
+        self.max_claves = max_claves
+        self._clock = clock
+        self._cubos: "OrderedDict[str, tuple[float, float]]" = OrderedDict()  # clave -> (tokens, instante)
+        self._lock = threading.Lock()
+
+    def permitir(self, clave: str) -> bool:
+        """Consume un token si hay; devuelve False si la clave agotó su cubo."""
+        if self.rafaga <= 0:
+            return True
+        ahora = self._clock()
+        with self._lock:
+            tokens, antes = self._cubos.get(clave, (float(self.rafaga), ahora))
+            tokens = min(float(self.rafaga), tokens + (ahora - antes) * self.tasa)
+            permitido = tokens >= 1
+            self._cubos[clave] = (tokens - 1 if permitido else tokens, ahora)
+            self._cubos.move_to_end(clave)
+            if len(self._cubos) > self.max_claves:
+                self._cubos.popitem(last=False)
+            return permitido
+
+    def espera(self, clave: str) -> int:
+        """Segundos (redondeados hacia arriba) hasta el próximo token; para Retry-After."""
+        with self._lock:
+            tokens, _ = self._cubos.get(clave, (float(self.rafaga), 0))
+        if tokens >= 1 or self.tasa <= 0:
+            return 0
+        return math.ceil((1 - tokens) / self.tasa)
+
+    def limpiar(self):
+        with self._lock:
+            self._cubos.clear()
+
+
+limite_login_ip = LimitadorTokens(settings.LOGIN_RAFAGA_IP, settings.LOGIN_POR_MIN_IP)
+limite_login_usuario = LimitadorTokens(settings.LOGIN_RAFAGA_USUARIO, settings.LOGIN_POR_MIN_USUARIO)
@@ -1,10 +1,22 @@
 # app/services/monitor_service.py
-from sqlalchemy import text
-from app.db.session import engine_radius
+import asyncio
+import base64
+import json
+import logging
+from datetime import datetime
+from typing import Callable
+
+from sqlalchemy import text, select, func, union
+from starlette.concurrency import run_in_threadpool
+
+from app.db.session import get_engine_radius
+from app.db.radius_schema import radacct
+
+logger = logging.getLogger(__name__)
 
 
 def obtener_sesiones_activas():
-    with engine_radius.connect() as conn:
+    with get_engine_radius().connect() as conn:
         resultado = conn.execute(text("""
             SELECT username, acctstarttime, acctstoptime,
                    acctinputoctets, acctoutputoctets
@@ -12,3 +24,183 @@ def obtener_sesiones_activas():
             WHERE acctstoptime IS NULL
         """))
         return [dict(row._mapping) for row in resultado]
+
+
+# -------------------------------------------------------------
+# Feed incremental de sesiones (altas, actualizaciones y bajas)
+# -------------------------------------------------------------
+COLUMNAS_FEED = [
+    radacct.c.radacctid, radacct.c.username, radacct.c.framedipaddress,
+    radacct.c.acctstarttime, radacct.c.acctupdatetime, radacct.c.acctstoptime,
+    radacct.c.acctinputoctets, radacct.c.acctoutputoctets,
+]
+
+
+def _codificar_cursor(ts: datetime | None, ultimo_id: int, vistos: list[int]) -> str:
+    datos = {"ts": ts.isoformat() if ts else None, "id": ultimo_id, "vistos": vistos}
+    return base64.urlsafe_b64encode(json.dumps(datos).encode()).decode()
+
+
+def _decodificar_cursor(cursor: str):
+    try:
+        datos = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        ts = datetime.fromisoformat(datos["ts"]) if datos["ts"] else None
+        return ts, int(datos["id"]), set(datos.get("vistos", []))
+    except Exception:
+        raise ValueError("Cursor inválido")
+
+
+def _serializar(fila, tipo: str) -> dict:
+    d = dict(fila._mapping)
+    d["tipo"] = tipo
+    for k in ("acctstarttime", "acctupdatetime", "acctstoptime"):
+        if d[k] is not None:
+            d[k] = d[k].isoformat()
+    return d
+
+
+def obtener_cambios_sesiones(cursor: str | None = None) -> dict:
+    """
+    Devuelve las sesiones que empezaron, se actualizaron o terminaron desde
+    `cursor` (marca de agua sobre acctupdatetime/radacctid). Sin cursor
+    devuelve la foto de sesiones activas y el cursor inicial.
+    El cursor recuerda los radacctid ya entregados con el mismo acctupdatetime
+    para no repetirlos cuando varias filas comparten el mismo segundo.
+    """
+    with get_engine_radius().connect() as conn:
+        if cursor is None:
+            ts, ultimo_id = conn.execute(
+                select(func.max(radacct.c.acctupdatetime), func.max(radacct.c.radacctid))
+            ).one()
+            ultimo_id = ultimo_id or 0
+            vistos = []
+            if ts is not None:
+                vistos = list(conn.execute(
+                    select(radacct.c.radacctid).where(radacct.c.acctupdatetime == ts)
+                ).scalars())
+            filas = conn.execute(
+                select(*COLUMNAS_FEED).where(radacct.c.acctstoptime.is_(None)).order_by(radacct.c.radacctid)
+            ).all()
+            return {
+                "cursor": _codificar_cursor(ts, ultimo_id, vistos),
+                "cambios": [_serializar(f, "activa") for f in filas],
+            }
+
+        ts, ultimo_id, vistos = _decodificar_cursor(cursor)
+        # Dos ramas para que cada una use su índice (OR suele impedirlo en MySQL)
+        nuevas = select(*COLUMNAS_FEED).where(radacct.c.radacctid > ultimo_id)
+        if ts is not None:
+            stmt = union(
+                select(*COLUMNAS_FEED).where(radacct.c.acctupdatetime >= ts), nuevas
+            ).order_by("radacctid")
+        else:
+            stmt = nuevas.order_by(radacct.c.radacctid)
+        filas = conn.execute(stmt).all()
+
+    cambios = []
+    nuevo_ts, nuevo_id = ts, ultimo_id
+    for f in filas:
+        if f.acctupdatetime is not None and f.acctupdatetime == ts and f.radacctid in vistos:
+            continue
+        if f.acctstoptime is not None:
+            tipo = "stop"
+        elif f.radacctid > ultimo_id:
+            tipo = "start"
+        else:
+            tipo = "update"
+        cambios.append(_serializar(f, tipo))
+        nuevo_id = max(nuevo_id, f.radacctid)
+        if f.acctupdatetime is not None and (nuevo_ts is None or f.acctupdatetime > nuevo_ts):
+            nuevo_ts = f.acctupdatetime
+
+    if nuevo_ts == ts:
+        nuevos_vistos = vistos | {f.radacctid for f in filas if f.acctupdatetime == ts}
+    else:
+        nuevos_vistos = {f.radacctid for f in filas if f.acctupdatetime == nuevo_ts}
+    return {
+        "cursor": _codificar_cursor(nuevo_ts, nuevo_id, sorted(nuevos_vistos)),
+        "cambios": cambios,
+    }
+
+
+class SessionFeed:
+    """
+    Un solo sondeo a radacct por proceso, repartido a todos los clientes
+    suscritos (SSE) y a los oyentes internos (p. ej. el índice IP -> sesión),
+    que reciben también la foto inicial. Arranca con el primer suscriptor
+    (o con `iniciar()` si hay oyentes) y se detiene al quedar sin ninguno.
+    """
+
+    def __init__(self, intervalo: float = 2.0):
+        self.intervalo = intervalo
+        self._suscriptores: set[asyncio.Queue] = set()
+        self._oyentes: list[Callable[[dict], object]] = []
+        self._tarea: asyncio.Task | None = None
+        self._cursor: str | None = None
+        self._listo: asyncio.Event | None = None
+
+    def agregar_oyente(self, oyente: Callable[[dict], object]):
+        """`oyente(delta)` se llama en el event loop con cada lote de cambios; debe ser rápido."""
+        if oyente not in self._oyentes:
+            self._oyentes.append(oyente)
+
+    def iniciar(self):
+        """Arranca el sondeo sin suscriptores SSE (lo mantienen vivo los oyentes)."""
+        if self._tarea is None or self._tarea.done():
+            self._listo = asyncio.Event()
+            self._tarea = asyncio.create_task(self._loop())
+
+    def detener(self):
+        if self._tarea is not None:
+            self._tarea.cancel()
+            self._tarea = None
+            self._cursor = None
+
+    async def suscribir(self) -> asyncio.Queue:
+        """
+        Registra un cliente y espera a que el feed tenga su marca de agua:
+        la foto que tome el cliente después ya no puede dejar huecos.
+        """
+        cola: asyncio.Queue = asyncio.Queue(maxsize=100)
+        self._suscriptores.add(cola)
+        self.iniciar()
+        await self._listo.wait()
+        return cola
+
+    def desuscribir(self, cola: asyncio.Queue):
+        self._suscriptores.discard(cola)
+        if not self._suscriptores and not self._oyentes:
+            self.detener()
+
+    def _notificar_oyentes(self, delta: dict):
+        for oyente in self._oyentes:
+            try:
+                oyente(delta)
+            except Exception:
+                logger.exception("Error en un oyente del feed de sesiones")
+
+    async def _loop(self):
+        while True:
+            try:
+                if self._cursor is None:
+                    foto = await run_in_threadpool(obtener_cambios_sesiones)
+                    self._cursor = foto["cursor"]
+                    self._notificar_oyentes(foto)
+                    self._listo.set()
+                else:
+                    delta = await run_in_threadpool(obtener_cambios_sesiones, self._cursor)
+                    self._cursor = delta["cursor"]
+                    if delta["cambios"]:
+                        self._notificar_oyentes(delta)
+                        for cola in list(self._suscriptores):
+                            if cola.full():
+                                cola.get_nowait()  # cliente lento: se descarta lo más viejo
+                            cola.put_nowait(delta)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Error consultando cambios de radacct")
+            await asyncio.sleep(self.intervalo)
+
+
+session_feed = SessionFeed()
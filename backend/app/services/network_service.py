@@ -1,30 +1,355 @@
 # app/services/network_service.py
 import subprocess
+import threading
+import time
+from typing import Optional
 
-def autorizar_usuario(ip: str):
+from app.core.config import settings
+from app.core.metrics import medir_comando
+
+
+# -------------------------------------------------------------
+# Ejecutores de comandos
+# -------------------------------------------------------------
+class SubprocessExecutor:
+    """Ejecuta los comandos reales del sistema (requiere sudo)."""
+
+    def run(self, cmd: list[str], input: Optional[str] = None) -> subprocess.CompletedProcess:
+        programa = cmd[1] if cmd and cmd[0] == "sudo" and len(cmd) > 1 else cmd[0]
+        with medir_comando(programa):
+            return subprocess.run(cmd, input=input, check=True, capture_output=True, text=True)
+
+
+class FakeExecutor:
+    """
+    Ejecutor en memoria para pruebas sin root. Guarda cada comando en
+    `comandos` y simula el estado mínimo de iptables/ipset para que
+    `-C`, `iptables-save/restore` y `ipset add/del/save/restore` respondan como en el kernel.
+    """
+
+    def __init__(self, sin_ipset: bool = False):
+        self.comandos: list[list[str]] = []
+        self.reglas: set[tuple[str, ...]] = set()
+        self.sets: dict[str, set[str]] = {}
+        self.timeouts: dict[tuple[str, str], int] = {}  # (set, ip) -> timeout del último add
+        self.sin_ipset = sin_ipset
+
+    def _falla(self, cmd):
+        raise subprocess.CalledProcessError(1, cmd, stderr="fake: error")
+
+    def run(self, cmd: list[str], input: Optional[str] = None) -> subprocess.CompletedProcess:
+        self.comandos.append(list(cmd))
+        args = cmd[1:] if cmd and cmd[0] == "sudo" else cmd
+        if args[0] == "iptables":
+            accion, regla = args[1], tuple(args[2:])
+            if accion == "-C" and regla not in self.reglas:
+                self._falla(cmd)
+            elif accion in ("-I", "-A"):
+                self.reglas.add(regla)
+            elif accion == "-D":
+                if regla not in self.reglas:
+                    self._falla(cmd)
+                self.reglas.discard(regla)
+        elif args[0] == "iptables-save":
+            lineas = ["*filter", ":FORWARD ACCEPT [0:0]", *(f"-A {' '.join(r)}" for r in sorted(self.reglas)), "COMMIT"]
+            return subprocess.CompletedProcess(cmd, 0, stdout="\n".join(lineas) + "\n", stderr="")
+        elif args[0] == "iptables-restore":
+            # Atómico como el real: si una regla a borrar no existe, no se aplica nada
+            cambios = [tuple(l.split()) for l in (input or "").splitlines() if l.startswith(("-A", "-I", "-D"))]
+            if any(c[0] == "-D" and c[1:] not in self.reglas for c in cambios):
+                self._falla(cmd)
+            for c in cambios:
+                if c[0] == "-D":
+                    self.reglas.discard(c[1:])
+                else:
+                    self.reglas.add(c[1:])
+        elif args[0] == "ipset":
+            if self.sin_ipset:
+                self._falla(cmd)
+            accion, nombre = args[1], (args[2] if len(args) > 2 else "")
+            if accion == "create":
+                self.sets.setdefault(nombre, set())
+            elif accion == "add":
+                self.sets.setdefault(nombre, set()).add(args[3])
+                if "timeout" in args:
+                    self.timeouts[(nombre, args[3])] = int(args[args.index("timeout") + 1])
+            elif accion == "del":
+                self.sets.setdefault(nombre, set()).discard(args[3])
+            elif accion == "save":
+                lineas = [f"create {nombre} hash:ip family inet hashsize 1024 maxelem 65536 timeout 0"]
+                lineas += [f"add {nombre} {ip} timeout 0" for ip in sorted(self.sets.get(nombre, ()))]
+                return subprocess.CompletedProcess(cmd, 0, stdout="\n".join(lineas) + "\n", stderr="")
+            elif accion == "restore":
+                for linea in (input or "").splitlines():
+                    partes = linea.split()
+                    if len(partes) >= 3 and partes[0] == "add":
+                        self.sets.setdefault(partes[1], set()).add(partes[2])
+                    elif len(partes) >= 3 and partes[0] == "del":
+                        self.sets.setdefault(partes[1], set()).discard(partes[2])
+        return subprocess.CompletedProcess(cmd, 0, stdout="", stderr="")
+
+
+# -------------------------------------------------------------
+# Backend clásico: una regla -s <ip> -j ACCEPT por invitado
+# -------------------------------------------------------------
+class IptablesBackend:
+    nombre = "iptables"
+
+    def __init__(self, executor=None):
+        self.executor = executor or SubprocessExecutor()
+
+    def autorizar(self, ip: str, timeout: int = 0):
+        # Las reglas de iptables no caducan en el kernel: el vencimiento lo
+        # llevan el programador y el lease, que se renuevan en cada login.
+        # Por eso una regla existente no necesita tocarse.
+        # evita duplicados: comprueba antes de insertar en posición 1
+        cmd = ["sudo", "iptables", "-C", "FORWARD", "-s", ip, "-j", "ACCEPT"]
+        try:
+            self.executor.run(cmd)
+            # si el -C no falla, la regla ya existe -> nada que hacer
+            return {"ok": True, "msg": "ya_autorizado"}
+        except subprocess.CalledProcessError:
+            # regla no existe -> añadirla
+            cmd2 = ["sudo", "iptables", "-I", "FORWARD", "-s", ip, "-j", "ACCEPT"]
+            self.executor.run(cmd2)
+            return {"ok": True, "msg": "autorizado"}
+
+    def revocar(self, ip: str):
+        cmd = ["sudo", "iptables", "-D", "FORWARD", "-s", ip, "-j", "ACCEPT"]
+        try:
+            self.executor.run(cmd)
+        except subprocess.CalledProcessError as e:
+            return {"ok": False, "error": str(e)}
+        # Un alta del reconciliador en paralelo con un login puede duplicar la
+        # regla: se borran las copias que queden
+        while True:
+            try:
+                self.executor.run(cmd)
+            except subprocess.CalledProcessError:
+                return {"ok": True}
+
+    def _contar_reglas(self) -> dict[str, int]:
+        """Copias de la regla `-s <ip> -j ACCEPT` en FORWARD por IP (una sola lectura con iptables-save)."""
+        salida = self.executor.run(["sudo", "iptables-save", "-t", "filter"]).stdout
+        cuentas: dict[str, int] = {}
+        for linea in salida.splitlines():
+            partes = linea.split()
+            if len(partes) == 6 and partes[:3] == ["-A", "FORWARD", "-s"] and partes[4:] == ["-j", "ACCEPT"]:
+                ip = partes[3].removesuffix("/32")
+                cuentas[ip] = cuentas.get(ip, 0) + 1
+        return cuentas
+
+    def reglas_autorizadas(self) -> set[str]:
+        """IPs con regla `-s <ip> -j ACCEPT` en FORWARD (una sola lectura con iptables-save)."""
+        return set(self._contar_reglas())
+
+    def sincronizar(self, agregar: dict[str, int], quitar: list[str]):
+        """Aplica altas (`ip -> timeout`, ignorado aquí) y bajas con un solo iptables-restore atómico."""
+        if not agregar and not quitar:
+            return
+        lineas = "".join(f"-I FORWARD -s {ip} -j ACCEPT\n" for ip in agregar)
+        lineas += "".join(f"-D FORWARD -s {ip} -j ACCEPT\n" for ip in quitar)
+        self.executor.run(["sudo", "iptables-restore", "--noflush"], input=f"*filter\n{lineas}COMMIT\n")
+
+    def revocar_varios(self, ips: list[str]):
+        """
+        Borra todas las reglas con un solo `iptables-restore --noflush`.
+        iptables-restore aborta el lote entero si falta una regla, así que
+        antes se leen las existentes y solo se borran esas.
+        """
+        if not ips:
+            return {}
+        try:
+            existentes = self._contar_reglas()
+            borrar = [ip for ip in dict.fromkeys(ips) if ip in existentes]
+            if borrar:
+                # una línea por copia: también caen las reglas duplicadas
+                lineas = "".join(f"-D FORWARD -s {ip} -j ACCEPT\n" * existentes[ip] for ip in borrar)
+                self.executor.run(["sudo", "iptables-restore", "--noflush"], input=f"*filter\n{lineas}COMMIT\n")
+        except subprocess.CalledProcessError as e:
+            return {ip: {"ok": False, "error": str(e)} for ip in ips}
+        return {ip: {"ok": True} if ip in existentes else {"ok": False, "error": "sin regla"} for ip in ips}
+
+
+# -------------------------------------------------------------
+# Backend ipset: una sola regla FORWARD contra un hash:ip
+# -------------------------------------------------------------
+class IpsetBackend:
     """
-    Inserta una regla iptables para aceptar tráfico desde la IP del cliente.
+    Mantiene una única regla `-m set --match-set <set> src -j ACCEPT` y
+    autoriza/revoca con operaciones O(1) sobre el set. Cada entrada lleva su
+    propio timeout en el kernel, así que caduca aunque el proceso muera.
+    El espejo en memoria evita lanzar procesos para autorizaciones repetidas.
+    """
+    nombre = "ipset"
+
+    def __init__(self, executor=None, set_name: str = "mininac_auth", clock=time.monotonic):
+        self.executor = executor or SubprocessExecutor()
+        self.set_name = set_name
+        self._clock = clock
+        self._miembros: dict[str, float] = {}  # ip -> vencimiento (inf = sin timeout)
+        self._lock = threading.Lock()
+        self._preparado = False
+
+    def preparar(self):
+        """Crea el set y la regla FORWARD si no existen. Lanza error si ipset no está disponible."""
+        if self._preparado:
+            return
+        self.executor.run(["sudo", "ipset", "create", self.set_name, "hash:ip", "timeout", "0", "-exist"])
+        regla = ["FORWARD", "-m", "set", "--match-set", self.set_name, "src", "-j", "ACCEPT"]
+        try:
+            self.executor.run(["sudo", "iptables", "-C", *regla])
+        except subprocess.CalledProcessError:
+            self.executor.run(["sudo", "iptables", "-I", *regla])
+        self._preparado = True
+
+    def es_miembro(self, ip: str) -> bool:
+        with self._lock:
+            vence = self._miembros.get(ip)
+            return vence is not None and vence > self._clock()
+
+    def autorizar(self, ip: str, timeout: int = 0):
+        nuevo = self._clock() + timeout if timeout else float("inf")
+        with self._lock:
+            actual = self._miembros.get(ip)
+            vigente = actual is not None and actual > self._clock()
+        # Ya autorizada hasta igual o más tarde (el kernel cuenta en segundos):
+        # sin procesos. Si el nuevo vencimiento es posterior, `add -exist`
+        # actualiza el timeout de la entrada en el kernel.
+        if vigente and actual >= nuevo - 1:
+            return {"ok": True, "msg": "ya_autorizado"}
+        self.preparar()
+        self.executor.run(["sudo", "ipset", "add", self.set_name, ip, "timeout", str(int(timeout)), "-exist"])
+        with self._lock:
+            self._miembros[ip] = max(nuevo, self._miembros.get(ip, 0.0))
+        return {"ok": True, "msg": "extendido" if vigente else "autorizado"}
+
+    def revocar(self, ip: str):
+        try:
+            self.executor.run(["sudo", "ipset", "del", self.set_name, ip, "-exist"])
+        except subprocess.CalledProcessError as e:
+            return {"ok": False, "error": str(e)}
+        finally:
+            with self._lock:
+                self._miembros.pop(ip, None)
+        return {"ok": True}
+
+    def reglas_autorizadas(self) -> set[str]:
+        """Miembros actuales del set según el kernel (`ipset save`)."""
+        self.preparar()
+        salida = self.executor.run(["sudo", "ipset", "save", self.set_name]).stdout
+        return {p[2] for p in (l.split() for l in salida.splitlines()) if len(p) >= 3 and p[0] == "add"}
+
+    def sincronizar(self, agregar: dict[str, int], quitar: list[str]):
+        """Altas con su timeout restante y bajas en un solo `ipset restore`."""
+        if not agregar and not quitar:
+            return
+        self.preparar()
+        lineas = "".join(f"add {self.set_name} {ip} timeout {int(t)}\n" for ip, t in agregar.items())
+        lineas += "".join(f"del {self.set_name} {ip}\n" for ip in quitar)
+        self.executor.run(["sudo", "ipset", "restore", "-exist"], input=lineas)
+        with self._lock:
+            for ip, t in agregar.items():
+                self._miembros[ip] = self._clock() + t if t else float("inf")
+            for ip in quitar:
+                self._miembros.pop(ip, None)
+
+    def revocar_varios(self, ips: list[str]):
+        """Quita todas las IPs con un solo `ipset restore` (un proceso para el lote)."""
+        if not ips:
+            return {}
+        lineas = "".join(f"del {self.set_name} {ip}\n" for ip in ips)
+        try:
+            self.executor.run(["sudo", "ipset", "restore", "-exist"], input=lineas)
+            resultado = {"ok": True}
+        except subprocess.CalledProcessError as e:
+            resultado = {"ok": False, "error": str(e)}
+        with self._lock:
+            for ip in ips:
+                self._miembros.pop(ip, None)
+        return {ip: resultado for ip in ips}
+
+
+# -------------------------------------------------------------
+# Selección del backend
+# -------------------------------------------------------------
+_backend = None
+_backend_lock = threading.Lock()
+
+# Espejo por proceso de las IPs abiertas en el firewall. Lo consulta el
+# atajo de sondeos del portal sin tocar la BD ni el kernel; se completa con
+# los leases de los demás workers en cada refresco.
+_autorizadas: set[str] = set()
+
+
+def crear_backend(nombre: str, executor=None):
+    """
+    Construye el backend pedido. Si ipset no está disponible en el host,
+    cae al backend clásico de iptables con el mismo ejecutor.
+    """
+    if nombre == "ipset":
+        backend = IpsetBackend(executor, set_name=settings.IPSET_NAME)
+        try:
+            backend.preparar()
+            return backend
+        except (subprocess.CalledProcessError, FileNotFoundError):
+            pass
+    return IptablesBackend(executor)
+
+
+def obtener_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = crear_backend(settings.FIREWALL_BACKEND)
+    return _backend
+
+
+def configurar_backend(backend):
+    """Reemplaza el backend activo (útil en pruebas con FakeExecutor)."""
+    global _backend
+    _backend = backend
+    _autorizadas.clear()
+
+
+def ip_autorizada(ip: str) -> bool:
+    return ip in _autorizadas
+
+
+def refrescar_autorizadas(obtener_ips) -> int:
+    """
+    Reemplaza el espejo por `obtener_ips()` (p. ej. los leases vigentes).
+    Las IPs autorizadas en este proceso mientras se consultaba se conservan.
+    """
+    global _autorizadas
+    antes = set(_autorizadas)
+    ips = set(obtener_ips())
+    _autorizadas = ips | (_autorizadas - antes)
+    return len(_autorizadas)
+
+
+def autorizar_usuario(ip: str, timeout: int = 0):
+    """
+    Autoriza tráfico desde la IP del cliente.
     Requiere que el servidor tenga NAT/reenvío habilitado y privilegios sudo.
+    `timeout` (segundos) solo lo aplica el backend ipset; 0 = sin límite.
     """
-    # evita duplicados: intenta insertar en posición 1
-    cmd = ["sudo", "iptables", "-C", "FORWARD", "-s", ip, "-j", "ACCEPT"]
-    try:
-        subprocess.run(cmd, check=True, capture_output=True, text=True)
-        # si el -C no falla, la regla ya existe -> nada que hacer
-        return {"ok": True, "msg": "ya_autorizado"}
-    except subprocess.CalledProcessError:
-        # regla no existe -> añadirla
-        cmd2 = ["sudo", "iptables", "-I", "FORWARD", "-s", ip, "-j", "ACCEPT"]
-        subprocess.run(cmd2, check=True)
-        return {"ok": True, "msg": "autorizado"}
+    resultado = obtener_backend().autorizar(ip, timeout)
+    if resultado.get("ok"):
+        _autorizadas.add(ip)
+    return resultado
+
 
 def revocar_usuario(ip: str):
     """
-    Elimina la regla que permite tráfico desde la IP del cliente.
+    Elimina la autorización de tráfico desde la IP del cliente.
     """
-    cmd = ["sudo", "iptables", "-D", "FORWARD", "-s", ip, "-j", "ACCEPT"]
-    try:
-        subprocess.run(cmd, check=True)
-        return {"ok": True}
-    except subprocess.CalledProcessError as e:
-        return {"ok": False, "error": str(e)}
+    _autorizadas.discard(ip)
+    return obtener_backend().revocar(ip)
+
+
+def revocar_usuarios(ips: list[str]):
+    """Revoca varias IPs de una vez; devuelve el resultado por IP."""
+    _autorizadas.difference_update(ips)
+    return obtener_backend().revocar_varios(list(ips))
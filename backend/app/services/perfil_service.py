@@ -0,0 +1,143 @@
+# app/services/perfil_service.py
+from collections import defaultdict
+from typing import Optional
+
+from sqlalchemy import select, insert, update, delete, func
+
+from app.db.radius_schema import radcheck, radgroupreply, radusergroup
+from app.db.session import get_engine_radius
+from app.services.radius_service import DELETE_RADREPLY
+
+# Atributo de radgroupreply -> campo del perfil (y conversión al leer)
+ATRIBUTOS = {
+    "Session-Timeout": ("session_timeout", lambda v: int(v) // 60),  # se guarda en segundos
+    "WISPr-Bandwidth-Max-Down": ("max_down", int),
+    "WISPr-Bandwidth-Max-Up": ("max_up", int),
+}
+
+
+class PerfilNoEncontrado(Exception):
+    pass
+
+
+class PerfilExistente(Exception):
+    pass
+
+
+def filas_perfil(nombre: str, session_timeout: int = 0, max_down: Optional[int] = None,
+                 max_up: Optional[int] = None) -> list[dict]:
+    """Las mismas filas que filas_radius pondría en radreply, pero a nivel de grupo."""
+    filas = []
+    if session_timeout and session_timeout > 0:
+        filas.append({"groupname": nombre, "attribute": "Session-Timeout", "op": ":=", "value": str(session_timeout * 60)})
+    if max_down:
+        filas.append({"groupname": nombre, "attribute": "WISPr-Bandwidth-Max-Down", "op": ":=", "value": str(max_down)})
+    if max_up:
+        filas.append({"groupname": nombre, "attribute": "WISPr-Bandwidth-Max-Up", "op": ":=", "value": str(max_up)})
+    return filas
+
+
+def _existe(conn, nombre: str) -> bool:
+    return conn.execute(
+        select(radgroupreply.c.id).where(radgroupreply.c.groupname == nombre).limit(1)
+    ).first() is not None
+
+
+def guardar_perfil(nombre: str, session_timeout: int = 0, max_down: Optional[int] = None,
+                   max_up: Optional[int] = None, crear: bool = True):
+    """
+    Crea (crear=True) o reemplaza los atributos de un perfil. Los usuarios del
+    grupo no se tocan: FreeRADIUS lee radgroupreply en cada autenticación.
+    """
+    filas = filas_perfil(nombre, session_timeout, max_down, max_up)
+    if not filas:
+        raise ValueError("El perfil necesita al menos un atributo")
+    with get_engine_radius().begin() as conn:
+        existe = _existe(conn, nombre)
+        if crear and existe:
+            raise PerfilExistente(nombre)
+        if not crear and not existe:
+            raise PerfilNoEncontrado(nombre)
+        conn.execute(delete(radgroupreply).where(radgroupreply.c.groupname == nombre))
+        conn.execute(insert(radgroupreply), filas)
+
+
+def listar_perfiles(nombre: Optional[str] = None) -> list[dict]:
+    filtro = [radgroupreply.c.groupname == nombre] if nombre else []
+    perfiles = defaultdict(lambda: {"session_timeout": 0, "max_down": None, "max_up": None})
+    with get_engine_radius().connect() as conn:
+        for f in conn.execute(select(radgroupreply).where(*filtro).order_by(radgroupreply.c.groupname)):
+            perfil = perfiles[f.groupname]
+            if f.attribute in ATRIBUTOS:
+                campo, convertir = ATRIBUTOS[f.attribute]
+                perfil[campo] = convertir(f.value)
+        if not perfiles:
+            return []
+        usuarios = dict(conn.execute(
+            select(radusergroup.c.groupname, func.count())
+            .where(radusergroup.c.groupname.in_(list(perfiles)))
+            .group_by(radusergroup.c.groupname)
+        ).all())
+    return [{"nombre": n, **p, "usuarios": usuarios.get(n, 0)} for n, p in perfiles.items()]
+
+
+def obtener_perfil(nombre: str) -> dict:
+    perfiles = listar_perfiles(nombre)
+    if not perfiles:
+        raise PerfilNoEncontrado(nombre)
+    return perfiles[0]
+
+
+def perfil_existe(nombre: str) -> bool:
+    with get_engine_radius().connect() as conn:
+        return _existe(conn, nombre)
+
+
+def asignar_perfil(nombre: str, usernames: list[str]) -> dict:
+    """
+    Pasa los usuarios al perfil con un UPDATE sobre radusergroup; los que aún
+    no tenían grupo (invitados creados con atributos propios) se insertan en
+    un executemany y pierden sus filas de radreply, que ahora vienen del perfil.
+    Los usernames sin fila en radcheck no se tocan: vuelven en `no_encontrados`.
+    Todo va en trozos de 1000 para no pasar el límite de parámetros por sentencia.
+    """
+    usernames = list(dict.fromkeys(usernames))
+    trozos = [usernames[i:i + 1000] for i in range(0, len(usernames), 1000)]
+    with get_engine_radius().begin() as conn:
+        if not _existe(conn, nombre):
+            raise PerfilNoEncontrado(nombre)
+        existentes = {
+            u for trozo in trozos
+            for u in conn.execute(select(radcheck.c.username).where(radcheck.c.username.in_(trozo))).scalars()
+        }
+        validos = [u for u in usernames if u in existentes]
+        movidos, nuevos = 0, []
+        for i in range(0, len(validos), 1000):
+            trozo = validos[i:i + 1000]
+            movidos_trozo = conn.execute(
+                update(radusergroup).where(radusergroup.c.username.in_(trozo)).values(groupname=nombre)
+            ).rowcount
+            movidos += movidos_trozo
+            if movidos_trozo < len(trozo):
+                con_grupo = set(conn.execute(
+                    select(radusergroup.c.username).where(radusergroup.c.username.in_(trozo))
+                ).scalars())
+                nuevos_trozo = [u for u in trozo if u not in con_grupo]
+                conn.execute(insert(radusergroup), [{"username": u, "groupname": nombre, "priority": 1} for u in nuevos_trozo])
+                conn.execute(DELETE_RADREPLY, {"usernames": nuevos_trozo})
+                nuevos += nuevos_trozo
+    return {
+        "perfil": nombre, "movidos": movidos, "agregados": len(nuevos),
+        "no_encontrados": [u for u in usernames if u not in existentes],
+    }
+
+
+def mover_perfil(desde: str, hacia: str) -> dict:
+    """Cambia de perfil a todos los miembros de `desde` con un solo UPDATE."""
+    with get_engine_radius().begin() as conn:
+        if not _existe(conn, hacia):
+            raise PerfilNoEncontrado(hacia)
+        movidos = conn.execute(
+            update(radusergroup).where(radusergroup.c.groupname == desde).values(groupname=hacia)
+        ).rowcount
+    return {"perfil": hacia, "desde": desde, "movidos": movidos}
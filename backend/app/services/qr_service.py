@@ -0,0 +1,252 @@
+# app/services/qr_service.py
+import hashlib
+import io
+import os
+import threading
+import zipfile
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Iterator, Optional
+
+from sqlalchemy import select, insert
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.radius_schema import radcheck
+from app.db.session import get_engine_radius
+from app.models.qr_code import QrCodes
+from app.services.credencial_service import es_hash, es_pendiente
+from app.services.uid_service import reservar_uids
+
+FORMATOS = {"png": "image/png", "svg": "image/svg+xml"}
+
+
+# -------------------------------------------------------------
+# Cadena WIFI: (formato que leen las cámaras de Android/iOS)
+# -------------------------------------------------------------
+def _escapar(valor: str) -> str:
+    for c in ("\\", ";", ",", ":", '"'):
+        valor = valor.replace(c, "\\" + c)
+    return valor
+
+
+def cadena_wifi(username: str, password: Optional[str], ssid: Optional[str] = None,
+                tipo_auth: Optional[str] = None) -> str:
+    """Con `password=None` se omite el campo P: (la versión que se guarda en qr_codes)."""
+    ssid = ssid or settings.WIFI_SSID
+    tipo_auth = tipo_auth or settings.WIFI_TIPO_AUTH
+    clave = "" if password is None else f"P:{_escapar(password)};"
+    if tipo_auth == "WPA2-EAP":
+        return (
+            f"WIFI:T:WPA2-EAP;S:{_escapar(ssid)};E:{settings.WIFI_EAP};PH2:{settings.WIFI_FASE2};"
+            f"I:{_escapar(username)};{clave};"
+        )
+    return f"WIFI:T:{tipo_auth};S:{_escapar(ssid)};{clave};"
+
+
+# -------------------------------------------------------------
+# Renderizado (función pura: se ejecuta también en el pool de procesos)
+# -------------------------------------------------------------
+def renderizar(cadena: str, formato: str = "png") -> bytes:
+    import qrcode
+    import qrcode.image.svg
+
+    qr = qrcode.QRCode(error_correction=qrcode.constants.ERROR_CORRECT_M, box_size=8, border=2)
+    qr.add_data(cadena)
+    qr.make(fit=True)
+    if formato == "svg":
+        return qr.make_image(image_factory=qrcode.image.svg.SvgPathImage).to_string()
+    buffer = io.BytesIO()
+    qr.make_image().save(buffer)
+    return buffer.getvalue()
+
+
+def _renderizar_par(args: tuple[str, str]) -> bytes:
+    return renderizar(*args)
+
+
+def clave_cache(cadena: str, formato: str) -> str:
+    """Dirección por contenido: la misma cadena y formato producen la misma imagen."""
+    return hashlib.sha256(f"{formato}\0{cadena}".encode()).hexdigest()
+
+
+# -------------------------------------------------------------
+# Caché LRU en memoria (sin copia en disco: cada imagen lleva la contraseña)
+# -------------------------------------------------------------
+class QrCache:
+    def __init__(self, max_items: int = 2048):
+        self.max_items = max_items
+        self._items: "OrderedDict[str, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def obtener(self, clave: str) -> Optional[bytes]:
+        with self._lock:
+            datos = self._items.get(clave)
+            if datos is not None:
+                self._items.move_to_end(clave)
+                self.aciertos += 1
+                return datos
+            self.fallos += 1
+            return None
+
+    def guardar(self, clave: str, datos: bytes):
+        with self._lock:
+            self._items[clave] = datos
+            self._items.move_to_end(clave)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+
+cache = QrCache(settings.QR_CACHE_ITEMS)
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _obtener_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=settings.QR_PROCESOS or os.cpu_count())
+        return _pool
+
+
+def cerrar_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def obtener_imagen(cadena: str, formato: str = "png") -> tuple[bytes, str]:
+    """Devuelve (imagen, clave); la clave sirve también como ETag."""
+    clave = clave_cache(cadena, formato)
+    datos = cache.obtener(clave)
+    if datos is None:
+        datos = renderizar(cadena, formato)
+        cache.guardar(clave, datos)
+    return datos, clave
+
+
+def renderizar_lote(items: list[tuple[str, str]], formato: str = "png",
+                    min_pool: int = 16) -> Iterator[tuple[str, bytes]]:
+    """
+    `items` son pares (nombre, cadena). Lo que ya está en caché sale directo;
+    el resto se reparte en el pool de procesos (el QR es CPU puro y el GIL
+    serializaría los hilos). Lotes de menos de `min_pool` faltantes se
+    renderizan aquí mismo para no pagar el envío entre procesos.
+    """
+    faltantes = []
+    for nombre, cadena in items:
+        clave = clave_cache(cadena, formato)
+        datos = cache.obtener(clave)
+        if datos is None:
+            faltantes.append((nombre, cadena, clave))
+        else:
+            yield nombre, datos
+    if not faltantes:
+        return
+    if len(faltantes) < min_pool:
+        imagenes = (renderizar(c, formato) for _, c, _ in faltantes)
+    else:
+        trozo = max(1, len(faltantes) // (4 * (settings.QR_PROCESOS or os.cpu_count() or 1)))
+        imagenes = _obtener_pool().map(_renderizar_par, [(c, formato) for _, c, _ in faltantes], chunksize=trozo)
+    for (nombre, _, clave), datos in zip(faltantes, imagenes):
+        cache.guardar(clave, datos)
+        yield nombre, datos
+
+
+class _SalidaZip(io.RawIOBase):
+    """Destino no buscable para ZipFile: acumula lo escrito hasta que se recoge."""
+
+    def __init__(self):
+        self._partes: list[bytes] = []
+
+    def writable(self):
+        return True
+
+    def write(self, datos):
+        self._partes.append(bytes(datos))
+        return len(datos)
+
+    def recoger(self) -> bytes:
+        datos = b"".join(self._partes)
+        self._partes.clear()
+        return datos
+
+
+def iter_zip(archivos: Iterable[tuple[str, bytes]]) -> Iterator[bytes]:
+    """Genera el ZIP archivo por archivo, sin armarlo completo en memoria."""
+    salida = _SalidaZip()
+    # PNG/SVG se guardan sin comprimir: el PNG ya viene comprimido
+    with zipfile.ZipFile(salida, "w", compression=zipfile.ZIP_STORED) as zf:
+        for nombre, datos in archivos:
+            # Fecha fija: el mismo lote produce los mismos bytes
+            zf.writestr(zipfile.ZipInfo(nombre, date_time=(1980, 1, 1, 0, 0, 0)), datos)
+            yield salida.recoger()
+    yield salida.recoger()
+
+
+# -------------------------------------------------------------
+# Persistencia en qr_codes
+# -------------------------------------------------------------
+def _passwords_en_claro(invitados: list) -> dict[str, str]:
+    """
+    El QR necesita la contraseña en claro. usuarios_invitados guarda el hash
+    scrypt (o PENDIENTE), así que se toma de radcheck (Cleartext-Password,
+    que EAP necesita en claro de todos modos), con una sola consulta para el lote.
+    """
+    claves = {
+        inv.username: inv.password
+        for inv in invitados if not es_hash(inv.password) and not es_pendiente(inv.password)
+    }
+    faltan = [inv.username for inv in invitados if inv.username not in claves]
+    if faltan:
+        with get_engine_radius().connect() as conn:
+            claves.update({
+                f.username: f.value
+                for f in conn.execute(
+                    select(radcheck.c.username, radcheck.c.value)
+                    .where(radcheck.c.username.in_(faltan), radcheck.c.attribute == "Cleartext-Password")
+                )
+            })
+    return claves
+
+
+def registrar_qrs(db: Session, invitados: list, ssid: Optional[str] = None,
+                  tipo_auth: Optional[str] = None) -> dict[int, str]:
+    """
+    Asegura una fila en qr_codes por invitado y devuelve {invitado_id: cadena}.
+    La fila guarda la cadena sin la contraseña; la completa se arma aquí en
+    cada llamada con la clave de radcheck. Los invitados sin Cleartext-Password
+    (revocados, o sin alta en RADIUS) no aparecen en el resultado: un QR sin
+    clave parecería válido y no conectaría. Las filas que faltan se insertan
+    con un solo executemany.
+    """
+    ssid = ssid or settings.WIFI_SSID
+    tipo_auth = tipo_auth or settings.WIFI_TIPO_AUTH
+    ids = [inv.id for inv in invitados]
+    redes = {
+        f.invitado_id: (f.ssid, f.tipo_auth)
+        for f in db.execute(
+            select(QrCodes.invitado_id, QrCodes.ssid, QrCodes.tipo_auth).where(QrCodes.invitado_id.in_(ids))
+        )
+    }
+    nuevos = [inv for inv in invitados if inv.id not in redes]
+    if nuevos:
+        filas = [
+            {"uid": uid, "invitado_id": inv.id, "ssid": ssid, "tipo_auth": tipo_auth,
+             "qr_string": cadena_wifi(inv.username, None, ssid, tipo_auth), "estado": "activo"}
+            for uid, inv in zip(reservar_uids("QR", len(nuevos)), nuevos)
+        ]
+        db.execute(insert(QrCodes), filas)
+        db.commit()
+        redes.update({inv.id: (ssid, tipo_auth) for inv in nuevos})
+    claves = _passwords_en_claro(invitados)
+    return {
+        inv.id: cadena_wifi(inv.username, claves[inv.username], *redes[inv.id])
+        for inv in invitados if inv.username in claves
+    }
@@ -1,42 +1,118 @@
-from sqlalchemy import text
-from app.db.session import engine_radius
+from sqlalchemy import text, bindparam
+from app.db.session import get_engine_radius
 
-def crear_usuario_radius(username: str, password: str, session_timeout: int = 0, max_down: int | None = None, max_up: int | None = None):
+INSERT_RADCHECK = text("""
+    INSERT INTO radcheck (username, attribute, op, value)
+    VALUES (:username, :attribute, ':=', :value)
+""")
+
+INSERT_RADREPLY = text("""
+    INSERT INTO radreply (username, attribute, op, value)
+    VALUES (:username, :attribute, ':=', :value)
+""")
+
+DELETE_RADCHECK = text("DELETE FROM radcheck WHERE username IN :usernames").bindparams(
+    bindparam("usernames", expanding=True))
+
+DELETE_RADREPLY = text("DELETE FROM radreply WHERE username IN :usernames").bindparams(
+    bindparam("usernames", expanding=True))
+
+INSERT_RADUSERGROUP = text("""
+    INSERT INTO radusergroup (username, groupname, priority)
+    VALUES (:username, :groupname, 1)
+""")
+
+SELECT_CLEARTEXT = text("""
+    SELECT value FROM radcheck WHERE username = :username AND attribute = 'Cleartext-Password'
+""")
+
+DELETE_RADUSERGROUP = text("DELETE FROM radusergroup WHERE username IN :usernames").bindparams(
+    bindparam("usernames", expanding=True))
+
+
+def filas_radius(username: str, password: str, session_timeout: int = 0, max_down: int | None = None, max_up: int | None = None):
+    """
+    Devuelve las filas (radcheck, radreply) que corresponden a un invitado,
+    listas para ejecutarse con executemany.
+    """
+    check = [{"username": username, "attribute": "Cleartext-Password", "value": password}]
+    reply = []
+    # ✅ Tiempo máximo de sesión
+    if session_timeout and session_timeout > 0:
+        reply.append({"username": username, "attribute": "Session-Timeout", "value": str(session_timeout * 60)})
+    # ✅ Límite de velocidad (bajada / subida)
+    if max_down:
+        reply.append({"username": username, "attribute": "WISPr-Bandwidth-Max-Down", "value": str(max_down)})
+    if max_up:
+        reply.append({"username": username, "attribute": "WISPr-Bandwidth-Max-Up", "value": str(max_up)})
+    return check, reply
+
+
+def crear_usuario_radius(username: str, password: str, session_timeout: int = 0, max_down: int | None = None, max_up: int | None = None,
+                         perfil: str | None = None):
     """
     Crea un usuario en FreeRADIUS (tablas radcheck y radreply).
     - username: nombre de usuario del invitado
     - password: contraseña en texto claro
     - session_timeout: duración máxima de sesión en minutos
     - max_down / max_up: límite de velocidad en Kbps
+    - perfil: grupo de radgroupreply; si se indica, los atributos salen del
+      perfil y no se escriben filas propias en radreply
     """
-    try:
-        with engine_radius.begin() as conn:  # begin() -> maneja commit automático
-            # ✅ Insertar credenciales en radcheck
-            conn.execute(text("""
-                INSERT INTO radcheck (username, attribute, op, value)
-                VALUES (:username, 'Cleartext-Password', ':=', :password)
-            """), {"username": username, "password": password})
-
-            # ✅ Tiempo máximo de sesión
-            if session_timeout > 0:
-                conn.execute(text("""
-                    INSERT INTO radreply (username, attribute, op, value)
-                    VALUES (:username, 'Session-Timeout', ':=', :timeout)
-                """), {"username": username, "timeout": str(session_timeout * 60)})
-
-            # ✅ Límite de velocidad (bajada)
-            if max_down:
-                conn.execute(text("""
-                    INSERT INTO radreply (username, attribute, op, value)
-                    VALUES (:username, 'WISPr-Bandwidth-Max-Down', ':=', :max_down)
-                """), {"username": username, "max_down": str(max_down)})
-
-            # ✅ Límite de velocidad (subida)
-            if max_up:
-                conn.execute(text("""
-                    INSERT INTO radreply (username, attribute, op, value)
-                    VALUES (:username, 'WISPr-Bandwidth-Max-Up', ':=', :max_up)
-                """), {"username": username, "max_up": str(max_up)})
+    crear_usuarios_radius([{
+        "username": username,
+        "password": password,
+        "session_timeout": session_timeout,
+        "max_down": max_down,
+        "max_up": max_up,
+        "perfil": perfil,
+    }])
+
+
+def crear_usuarios_radius(usuarios: list[dict]):
+    """
+    Crea varios usuarios en FreeRADIUS en una sola transacción.
+    Cada elemento tiene las mismas claves que los argumentos de
+    crear_usuario_radius. Las filas se insertan con executemany:
+    un lote para radcheck, otro para radreply y otro para radusergroup.
+    """
+    check, reply, grupos = [], [], []
+    for u in usuarios:
+        if u.get("perfil"):
+            c, _ = filas_radius(u["username"], u["password"])
+            grupos.append({"username": u["username"], "groupname": u["perfil"]})
+        else:
+            c, r = filas_radius(u["username"], u["password"], u.get("session_timeout") or 0, u.get("max_down"), u.get("max_up"))
+            reply.extend(r)
+        check.extend(c)
 
+    try:
+        with get_engine_radius().begin() as conn:  # begin() -> maneja commit automático
+            if check:
+                conn.execute(INSERT_RADCHECK, check)
+            if reply:
+                conn.execute(INSERT_RADREPLY, reply)
+            if grupos:
+                conn.execute(INSERT_RADUSERGROUP, grupos)
     except Exception as e:
         raise Exception(f"❌ Error creando usuario en RADIUS: {e}")
+
+
+def eliminar_usuarios_radius(usernames: list[str]):
+    """Borra radcheck/radreply/radusergroup de los usuarios indicados en una sola transacción."""
+    usernames = list(usernames)
+    if not usernames:
+        return
+    with get_engine_radius().begin() as conn:
+        # Trozos de 1000 para no pasar el límite de parámetros por sentencia
+        for i in range(0, len(usernames), 1000):
+            trozo = {"usernames": usernames[i:i + 1000]}
+            conn.execute(DELETE_RADCHECK, trozo)
+            conn.execute(DELETE_RADREPLY, trozo)
+            conn.execute(DELETE_RADUSERGROUP, trozo)
+
+
+def password_radius(username: str) -> str | None:
+    """Cleartext-Password del usuario en radcheck, o None si no tiene."""
+    with get_engine_radius().connect() as conn:
+        return conn.execute(SELECT_CLEARTEXT, {"username": username}).scalar()
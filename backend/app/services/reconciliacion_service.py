@@ -0,0 +1,78 @@
+# app/services/reconciliacion_service.py
+import logging
+import threading
+from datetime import datetime
+from typing import Optional
+
+from app.core.config import settings
+from app.core.periodic import TareaPeriodica
+from app.services.lease_service import leases_activos, purgar_vencidos
+from app.services.network_service import obtener_backend, refrescar_autorizadas
+from app.services.scheduler_service import scheduler
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()  # una sola reconciliación a la vez por proceso
+
+
+def reconciliar(ahora: Optional[datetime] = None) -> dict:
+    """
+    Lleva el firewall al estado que dicen los leases:
+      - IP con lease vigente y sin regla  -> se autoriza (con su tiempo restante)
+      - regla sin lease vigente           -> se quita
+    Ambas cosas en una sola escritura atómica del backend (iptables-restore /
+    ipset restore), a partir de una sola lectura (iptables-save / ipset save).
+    Después borra los leases vencidos y asegura que cada lease vigente tenga
+    su revocación programada en este proceso.
+    Las reglas `-s <ip> -j ACCEPT` de FORWARD (o los miembros del set) se
+    consideran propias: una autorización manual sin lease se retira.
+    Los logins escriben el lease antes de abrir el firewall, así que una
+    regla que aparece entre la lectura de leases y la del kernel ya tiene
+    lease: las candidatas a quitar se vuelven a consultar antes de retirarlas.
+    """
+    ahora = ahora or datetime.now()
+    with _lock:
+        leases = leases_activos(ahora)
+        backend = obtener_backend()
+        kernel = backend.reglas_autorizadas()
+
+        agregar = {
+            ip: max(1, int((expira_en - ahora).total_seconds()))
+            for ip, (_, expira_en) in leases.items() if ip not in kernel
+        }
+        huerfanas = kernel - set(leases)
+        if huerfanas:
+            leases.update(leases_activos(ahora, huerfanas))
+        quitar = sorted(kernel - set(leases))
+        backend.sincronizar(agregar, quitar)
+        refrescar_autorizadas(lambda: leases)
+        purgados = purgar_vencidos(ahora)
+
+        programadas = 0
+        for ip, (username, expira_en) in leases.items():
+            if scheduler.restante(ip) is None:
+                scheduler.programar(ip, (expira_en - ahora).total_seconds(), username)
+                programadas += 1
+
+    if agregar or quitar:
+        logger.warning("Reconciliación: %s IPs restauradas, %s reglas huérfanas retiradas", len(agregar), len(quitar))
+    return {"agregadas": len(agregar), "quitadas": len(quitar), "leases_purgados": purgados,
+            "programadas": programadas}
+
+
+def reconciliar_al_arrancar():
+    """Primera reconciliación en el arranque; un fallo no impide levantar la API."""
+    try:
+        return reconciliar()
+    except Exception:
+        logger.exception("No se pudo reconciliar el firewall al arrancar")
+        return None
+
+
+def refrescar_espejo() -> int:
+    """Recarga las IPs autorizadas que consulta el atajo de sondeos (incluye las de otros workers)."""
+    return refrescar_autorizadas(leases_activos)
+
+
+tarea_reconciliacion = TareaPeriodica("reconciliar-firewall", settings.RECONCILIAR_INTERVALO_SEG, reconciliar)
+tarea_espejo = TareaPeriodica("espejo-autorizadas", settings.SONDEOS_REFRESCO_SEG, refrescar_espejo)
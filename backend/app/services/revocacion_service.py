@@ -0,0 +1,118 @@
+# app/services/revocacion_service.py
+import asyncio
+import logging
+
+from sqlalchemy import select, update, delete
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.invitado import UsuarioInvitado
+from app.services.audit_service import registrar_evento
+from app.services.cache_service import cache_invitados
+from app.services.coa_service import obtener_cliente_coa
+from app.services.credencial_service import verificador
+from app.services.lease_service import liberar_leases
+from app.services.network_service import revocar_usuarios
+from app.services.radius_service import eliminar_usuarios_radius
+from app.services.scheduler_service import scheduler
+from app.services.sesion_ip_service import indice_sesiones
+
+logger = logging.getLogger(__name__)
+
+
+def _marcar_en_bd(usernames: list[str], eliminar: bool) -> set[str]:
+    """Un SELECT para saber cuáles existen y una sola sentencia para revocarlos (o borrarlos)."""
+    db = SessionLocal()
+    try:
+        encontrados = set(db.execute(
+            select(UsuarioInvitado.username).where(UsuarioInvitado.username.in_(usernames))
+        ).scalars())
+        if encontrados:
+            filtro = UsuarioInvitado.username.in_(list(encontrados))
+            if eliminar:
+                stmt = delete(UsuarioInvitado).where(filtro)
+            else:
+                stmt = update(UsuarioInvitado).where(filtro).values(estado="revocado")
+            db.execute(stmt, execution_options={"synchronize_session": False})
+            db.commit()
+        return encontrados
+    finally:
+        db.close()
+
+
+def _revocar_firewall(usernames: list[str]) -> dict[str, list[dict]]:
+    """
+    Cancela las revocaciones programadas, libera los leases (que cubren las
+    IPs autorizadas por otros workers) y quita todas las IPs en una
+    operación del backend.
+    """
+    ips_por_usuario: dict[str, list[str]] = {}
+    sesiones = scheduler.cancelar_usuarios(usernames) | liberar_leases(usernames)
+    for ip, username in sesiones.items():
+        ips_por_usuario.setdefault(username, []).append(ip)
+    ips = [ip for lista in ips_por_usuario.values() for ip in lista]
+    indice_sesiones.quitar(ips)
+    indice_sesiones.quitar_usuarios(usernames)  # también las IPs que solo conoce el índice
+    resultados = revocar_usuarios(ips) if ips else {}
+    return {
+        u: [{"ip": ip, **resultados.get(ip, {"ok": False})} for ip in lista]
+        for u, lista in ips_por_usuario.items()
+    }
+
+
+async def revocar_invitados(usernames: list[str], eliminar: bool = False) -> list[dict]:
+    """
+    Revoca el acceso de muchos invitados:
+      1. usuarios_invitados: una sentencia (estado=revocado, o DELETE si `eliminar`)
+      2. RADIUS: radcheck/radreply/radusergroup borrados por lotes, para que no reautentiquen
+      3. en paralelo: Disconnect-Request a cada sesión (acotado por un semáforo)
+         y retiro de sus IPs del firewall en una sola operación del backend
+    Devuelve un resultado por username, en el orden recibido.
+    """
+    usernames = list(dict.fromkeys(usernames))
+    encontrados = await run_in_threadpool(_marcar_en_bd, usernames, eliminar)
+    presentes = [u for u in usernames if u in encontrados]
+    cache_invitados.invalidar_usernames(presentes)
+    verificador.olvidar(presentes)
+
+    radius_ok = True
+    try:
+        await run_in_threadpool(eliminar_usuarios_radius, presentes)
+    except Exception:
+        logger.exception("Error borrando credenciales RADIUS en la revocación")
+        radius_ok = False
+
+    cupos = asyncio.Semaphore(settings.REVOCACION_CONCURRENCIA)
+    cliente = obtener_cliente_coa()
+
+    async def desconectar(username: str) -> dict:
+        async with cupos:
+            try:
+                r = await cliente.desconectar(username)
+                return {"ok": r["ok"], "respuesta": r["respuesta"]}
+            except Exception as e:
+                return {"ok": False, "respuesta": str(e)}
+
+    firewall_tarea = run_in_threadpool(_revocar_firewall, presentes)
+    coa, firewall = await asyncio.gather(
+        asyncio.gather(*(desconectar(u) for u in presentes)),
+        firewall_tarea,
+    )
+    coa_por_usuario = dict(zip(presentes, coa))
+
+    resultados = []
+    for u in usernames:
+        if u not in encontrados:
+            resultados.append({"username": u, "encontrado": False})
+            continue
+        resultados.append({
+            "username": u,
+            "encontrado": True,
+            "radius": radius_ok,
+            "coa": coa_por_usuario[u],
+            "firewall": firewall.get(u, []),
+        })
+        registrar_evento("eliminar_invitado" if eliminar else "revocar_invitado",
+                         f"username={u} coa={coa_por_usuario[u]['ok']} ips={len(firewall.get(u, []))}")
+    return resultados
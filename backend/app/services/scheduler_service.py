@@ -0,0 +1,181 @@
+# app/services/scheduler_service.py
+import heapq
+import itertools
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Optional
+
+from app.core.metrics import REVOCACIONES_PENDIENTES
+from app.services.lease_service import lease_de, liberar_leases
+from app.services.network_service import revocar_usuario
+
+logger = logging.getLogger(__name__)
+
+
+class ExpiryScheduler:
+    """
+    Programador único de revocaciones por proceso.
+    Mantiene un heap (vencimiento, secuencia, clave) y un solo hilo que duerme
+    hasta el próximo vencimiento, en lugar de ocupar un worker por invitado.
+    Cancelar o extender no reordena el heap: la entrada vieja queda obsoleta
+    y se descarta al salir (borrado perezoso).
+    """
+
+    def __init__(self, callback: Callable[[str], object], clock: Callable[[], float] = time.monotonic):
+        self._callback = callback
+        self._clock = clock
+        self._heap: list[tuple[float, int, str]] = []
+        self._vigentes: dict[str, tuple[float, int]] = {}
+        self._usuarios: dict[str, str] = {}  # clave (IP) -> username dueño de la sesión
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._hilo: Optional[threading.Thread] = None
+        self._detenido = False
+
+    # ---------------------------------------------------------
+    # API pública
+    # ---------------------------------------------------------
+    def programar(self, clave: str, duracion_seg: float, username: Optional[str] = None) -> float:
+        """Programa (o reprograma) la revocación de `clave` dentro de `duracion_seg`."""
+        vence = self._clock() + max(0.0, duracion_seg)
+        with self._cond:
+            self._push(clave, vence)
+            if username is not None:
+                self._usuarios[clave] = username
+            self._asegurar_hilo()
+            self._cond.notify()
+        return vence
+
+    def cancelar(self, clave: str) -> bool:
+        """Cancela la revocación pendiente. Devuelve False si no existía."""
+        with self._cond:
+            self._usuarios.pop(clave, None)
+            return self._vigentes.pop(clave, None) is not None
+
+    def cancelar_usuarios(self, usernames) -> dict[str, str]:
+        """Cancela las revocaciones de esos usuarios y devuelve {clave (IP): username}."""
+        usernames = set(usernames)
+        with self._cond:
+            claves = {c: u for c, u in self._usuarios.items() if u in usernames and c in self._vigentes}
+            for c in claves:
+                self._vigentes.pop(c, None)
+                self._usuarios.pop(c, None)
+            return claves
+
+    def extender(self, clave: str, segundos: float) -> Optional[float]:
+        """Suma `segundos` al vencimiento actual. Devuelve None si no estaba programada."""
+        with self._cond:
+            actual = self._vigentes.get(clave)
+            if actual is None:
+                return None
+            vence = actual[0] + segundos
+            self._push(clave, vence)
+            self._cond.notify()
+            return vence
+
+    def restante(self, clave: str) -> Optional[float]:
+        with self._cond:
+            actual = self._vigentes.get(clave)
+            return None if actual is None else max(0.0, actual[0] - self._clock())
+
+    def pendientes(self) -> int:
+        with self._cond:
+            return len(self._vigentes)
+
+    def detener(self):
+        with self._cond:
+            self._detenido = True
+            self._cond.notify()
+        if self._hilo is not None:
+            self._hilo.join(timeout=5)
+            self._hilo = None
+
+    # ---------------------------------------------------------
+    # Internos
+    # ---------------------------------------------------------
+    def _push(self, clave: str, vence: float):
+        seq = next(self._seq)
+        self._vigentes[clave] = (vence, seq)
+        heapq.heappush(self._heap, (vence, seq, clave))
+        # Evita que el heap crezca sin límite con entradas obsoletas
+        if len(self._heap) > 64 and len(self._heap) > 4 * len(self._vigentes):
+            self._heap = [(v, s, c) for c, (v, s) in self._vigentes.items()]
+            heapq.heapify(self._heap)
+
+    def _asegurar_hilo(self):
+        if self._hilo is None or not self._hilo.is_alive():
+            self._detenido = False
+            self._hilo = threading.Thread(target=self._loop, name="expiry-scheduler", daemon=True)
+            self._hilo.start()
+
+    def _siguiente_vencido(self) -> Optional[str]:
+        """Bloquea hasta que haya una clave vencida (o se detenga el programador)."""
+        with self._cond:
+            while not self._detenido:
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+                vence, seq, clave = self._heap[0]
+                if self._vigentes.get(clave) != (vence, seq):
+                    heapq.heappop(self._heap)  # entrada cancelada o reprogramada
+                    continue
+                espera = vence - self._clock()
+                if espera > 0:
+                    self._cond.wait(timeout=espera)
+                    continue
+                heapq.heappop(self._heap)
+                del self._vigentes[clave]
+                self._usuarios.pop(clave, None)
+                return clave
+            return None
+
+    def _loop(self):
+        while True:
+            clave = self._siguiente_vencido()
+            if clave is None:
+                return
+            try:
+                self._callback(clave)
+            except Exception:
+                logger.exception("Error revocando %s", clave)
+
+
+# -------------------------------------------------------------
+# Instancia compartida por proceso: la clave es la IP del cliente
+# -------------------------------------------------------------
+def _revocar_vencida(ip: str):
+    """
+    Antes de revocar consulta el lease: si otro worker (o un nuevo login)
+    lo extendió, se reprograma en vez de cortar la sesión. Sin base de
+    datos disponible se revoca igual, como antes.
+    """
+    try:
+        lease = lease_de(ip)
+        if lease is not None:
+            username, expira_en = lease
+            restante = (expira_en - datetime.now()).total_seconds()
+            if restante > 1:
+                scheduler.programar(ip, restante, username)
+                return None
+            liberar_leases(ips=[ip])
+    except Exception:
+        logger.exception("No se pudo consultar el lease de %s; se revoca igual", ip)
+    return revocar_usuario(ip)
+
+
+scheduler = ExpiryScheduler(_revocar_vencida)
+REVOCACIONES_PENDIENTES.set_function(scheduler.pendientes)
+
+
+def programar_revocacion(ip: str, duracion_seg: float, username: Optional[str] = None):
+    return scheduler.programar(ip, duracion_seg, username)
+
+
+def cancelar_revocacion(ip: str) -> bool:
+    return scheduler.cancelar(ip)
+
+
+def extender_revocacion(ip: str, segundos: float):
+    return scheduler.extender(ip, segundos)
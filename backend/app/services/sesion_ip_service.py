@@ -0,0 +1,124 @@
+# app/services/sesion_ip_service.py
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Iterable, Optional
+
+
+class IndiceSesionesIp:
+    """
+    Índice en memoria IP -> sesión, por proceso. Lo alimentan dos fuentes:
+      - el portal (login y sesión temporal): username y vencimiento del acceso
+      - el feed de radacct (framedipaddress): sesión RADIUS activa de esa IP
+    Permite reconocer en O(1) a un cliente que vuelve al portal con la sesión
+    todavía abierta y consultar por IP desde las herramientas de admin.
+    Las entradas vencidas se podan al consultarlas y cuando el índice crece.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self._clock = clock
+        self._por_ip: dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self._umbral_poda = 1024
+
+    # ---------------------------------------------------------
+    # Escrituras
+    # ---------------------------------------------------------
+    def registrar_portal(self, ip: str, username: str, duracion_seg: float):
+        with self._lock:
+            entrada = self._por_ip.get(ip)
+            if entrada is None or entrada["username"] != username:
+                entrada = self._por_ip[ip] = {"username": username, "vence": None, "radius": None}
+            entrada["vence"] = self._clock() + duracion_seg
+            entrada["vence_en"] = datetime.now() + timedelta(seconds=duracion_seg)
+            self._podar_si_crece()
+
+    def aplicar_cambios(self, delta: dict):
+        """Oyente del feed de sesiones: aplica altas, actualizaciones y bajas de radacct."""
+        with self._lock:
+            for cambio in delta.get("cambios", []):
+                ip = cambio.get("framedipaddress")
+                if not ip:
+                    continue
+                entrada = self._por_ip.get(ip)
+                if cambio["tipo"] == "stop":
+                    if entrada and entrada["radius"] and entrada["radius"]["radacctid"] == cambio["radacctid"]:
+                        entrada["radius"] = None
+                        if not self._vigente(entrada):
+                            del self._por_ip[ip]
+                    continue
+                if entrada is None or entrada["username"] != cambio["username"]:
+                    entrada = self._por_ip[ip] = {"username": cambio["username"], "vence": None, "radius": None}
+                entrada["radius"] = {
+                    "radacctid": cambio["radacctid"],
+                    "acctstarttime": cambio["acctstarttime"],
+                    "acctupdatetime": cambio["acctupdatetime"],
+                    "acctinputoctets": cambio["acctinputoctets"],
+                    "acctoutputoctets": cambio["acctoutputoctets"],
+                }
+            self._podar_si_crece()
+
+    def quitar(self, ips: Iterable[str]):
+        with self._lock:
+            for ip in ips:
+                self._por_ip.pop(ip, None)
+
+    def quitar_usuarios(self, usernames: Iterable[str]):
+        """Recorre el índice: para revocaciones, donde no siempre se conocen todas las IPs."""
+        usernames = set(usernames)
+        with self._lock:
+            for ip in [ip for ip, e in self._por_ip.items() if e["username"] in usernames]:
+                del self._por_ip[ip]
+
+    def limpiar(self):
+        with self._lock:
+            self._por_ip.clear()
+
+    # ---------------------------------------------------------
+    # Lecturas
+    # ---------------------------------------------------------
+    def sesion_vigente(self, ip: str, username: Optional[str] = None) -> Optional[float]:
+        """Segundos de acceso que le quedan a la IP por el portal (y a ese username, si se indica)."""
+        entrada = self._por_ip.get(ip)
+        if entrada is None or entrada["vence"] is None or (username is not None and entrada["username"] != username):
+            return None
+        restante = entrada["vence"] - self._clock()
+        return restante if restante > 0 else None
+
+    def consultar(self, ip: str) -> Optional[dict]:
+        with self._lock:
+            entrada = self._por_ip.get(ip)
+            if entrada is None:
+                return None
+            if not self._vigente(entrada):
+                del self._por_ip[ip]
+                return None
+            restante = self.sesion_vigente(ip)
+            return {
+                "ip": ip,
+                "username": entrada["username"],
+                "portal": None if restante is None else {
+                    "vence_en": entrada["vence_en"], "restante_seg": int(restante),
+                },
+                "radius": entrada["radius"],
+            }
+
+    def __len__(self) -> int:
+        return len(self._por_ip)
+
+    # ---------------------------------------------------------
+    # Internos
+    # ---------------------------------------------------------
+    def _vigente(self, entrada: dict) -> bool:
+        return entrada["radius"] is not None or (entrada["vence"] is not None and entrada["vence"] > self._clock())
+
+    def _podar_si_crece(self):
+        # Poda amortizada: solo cuando el índice duplica su tamaño desde la última
+        if len(self._por_ip) <= self._umbral_poda:
+            return
+        for ip in [ip for ip, e in self._por_ip.items() if not self._vigente(e)]:
+            del self._por_ip[ip]
+        self._umbral_poda = max(1024, 2 * len(self._por_ip))
+
+
+indice_sesiones = IndiceSesionesIp()
@@ -0,0 +1,108 @@
+# app/services/uid_service.py
+import threading
+import time
+
+from sqlalchemy import update, select
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.admin import Administrador
+from app.models.contador_uid import ContadorUid
+from app.models.invitado import UsuarioInvitado
+from app.models.qr_code import QrCodes
+
+# Columna donde vive cada tipo de UID (para sembrar el contador la primera vez)
+COLUMNAS_UID = {
+    "USR": UsuarioInvitado.uid,
+    "ADM": Administrador.uid,
+    "QR": QrCodes.uid,
+}
+
+
+class UidAllocator:
+    """
+    Reparte UIDs `<prefijo><n>` sin consultar la tabla destino.
+    Cada proceso reserva bloques de `bloque` números en `contadores_uid` con un
+    UPDATE atómico (siguiente = siguiente + n), así que dos workers nunca
+    reciben el mismo número y la mayoría de altas no hacen ninguna consulta.
+    Los números que queden sin usar al reiniciar el proceso se pierden (huecos).
+    """
+
+    def __init__(self, session_factory=SessionLocal, bloque: int = 50, columnas: dict | None = None):
+        self._session_factory = session_factory
+        self._bloque = bloque
+        self._columnas = columnas if columnas is not None else COLUMNAS_UID
+        self._rangos: dict[str, list[int]] = {}  # prefijo -> [actual, limite)
+        self._lock = threading.Lock()
+
+    def siguiente(self, prefijo: str) -> str:
+        with self._lock:
+            rango = self._rangos.get(prefijo)
+            if rango is None or rango[0] >= rango[1]:
+                inicio = self._reservar(prefijo, self._bloque)
+                rango = self._rangos[prefijo] = [inicio, inicio + self._bloque]
+            numero = rango[0]
+            rango[0] += 1
+        return f"{prefijo}{numero}"
+
+    def reservar(self, prefijo: str, n: int) -> list[str]:
+        """Reserva `n` UIDs consecutivos de una vez (altas masivas)."""
+        if n <= 0:
+            return []
+        inicio = self._reservar(prefijo, n)
+        return [f"{prefijo}{i}" for i in range(inicio, inicio + n)]
+
+    # ---------------------------------------------------------
+    # Internos
+    # ---------------------------------------------------------
+    def _reservar(self, prefijo: str, n: int) -> int:
+        """Avanza el contador `n` posiciones y devuelve el primer número reservado."""
+        for intento in range(20):
+            db = self._session_factory()
+            try:
+                # El UPDATE toma el bloqueo de escritura antes de leer: sin carreras
+                res = db.execute(
+                    update(ContadorUid)
+                    .where(ContadorUid.prefijo == prefijo)
+                    .values(siguiente=ContadorUid.siguiente + n)
+                )
+                if res.rowcount == 0:
+                    inicio = self._maximo_existente(db, prefijo) + 1
+                    db.add(ContadorUid(prefijo=prefijo, siguiente=inicio + n))
+                    db.commit()
+                    return inicio
+                siguiente = db.execute(
+                    select(ContadorUid.siguiente).where(ContadorUid.prefijo == prefijo)
+                ).scalar_one()
+                db.commit()
+                return siguiente - n
+            except (IntegrityError, OperationalError):
+                # Otro proceso sembró el contador a la vez, o la BD estaba bloqueada
+                db.rollback()
+                time.sleep(0.01 * (intento + 1))
+            finally:
+                db.close()
+        raise RuntimeError(f"No se pudo reservar UIDs para {prefijo}")
+
+    def _maximo_existente(self, db, prefijo: str) -> int:
+        """Mayor número ya usado en la tabla destino (solo al crear el contador)."""
+        maximo = 0
+        columna = self._columnas.get(prefijo)
+        if columna is not None:
+            for (uid,) in db.execute(select(columna).where(columna.like(f"{prefijo}%"))):
+                sufijo = uid[len(prefijo):]
+                if sufijo.isdigit():
+                    maximo = max(maximo, int(sufijo))
+        return maximo
+
+
+uid_allocator = UidAllocator(bloque=settings.UID_BLOCK_SIZE)
+
+
+def siguiente_uid(prefijo: str) -> str:
+    return uid_allocator.siguiente(prefijo)
+
+
+def reservar_uids(prefijo: str, n: int) -> list[str]:
+    return uid_allocator.reservar(prefijo, n)
@@ -0,0 +1,72 @@
+# Configuración común de pruebas: las variables de entorno deben existir
+# antes de importar app.core.config (Settings() se instancia al importar).
+import os
+import tempfile
+
+_TMP = tempfile.mkdtemp(prefix="mininac-tests-")
+os.environ.setdefault("MYSQL_MAIN_URL", f"sqlite:///{_TMP}/main.db")
+os.environ.setdefault("MYSQL_RADIUS_URL", f"sqlite:///{_TMP}/radius.db")
+os.environ.setdefault("FIREBASE_CREDENTIALS", f"{_TMP}/firebase.json")
+# Sin NAS real: los CoA que no atiende un stub fallan rápido
+os.environ.setdefault("COA_HOST", "127.0.0.1")
+os.environ.setdefault("COA_TIMEOUT", "0.05")
+os.environ.setdefault("COA_REINTENTOS", "1")
+# scrypt barato: las pruebas verifican el formato, no el costo
+os.environ.setdefault("HASH_SCRYPT_N", "1024")
+
+import pytest
+
+
+@pytest.fixture
+def bd():
+    """Crea los esquemas principal y RADIUS en SQLite y los vacía al terminar."""
+    from app.db.base_class import Base
+    from app.db.radius_schema import radius_metadata
+    from app.db.rollup_schema import rollup_metadata
+    from app.db.session import engine_main, engine_radius
+    from app.models import admin, contador_uid, invitado, log, notificacion, qr_code, sesion_lease  # noqa: F401  (registra los modelos)
+
+    Base.metadata.create_all(engine_main)
+    radius_metadata.create_all(engine_radius)
+    rollup_metadata.create_all(engine_radius)
+    yield
+    from app.services.uid_service import uid_allocator
+    uid_allocator._rangos.clear()
+    from app.services.cache_service import cache_invitados
+    cache_invitados.limpiar()
+    from app.services.sesion_ip_service import indice_sesiones
+    indice_sesiones.limpiar()
+    from app.services.credencial_service import verificador
+    from app.services.limite_service import limite_login_ip, limite_login_usuario
+    verificador.esperar_fondo()  # hashes de altas masivas: antes de vaciar las tablas
+    verificador.limpiar()
+    limite_login_ip.limpiar()
+    limite_login_usuario.limpiar()
+    for engine, metadata in ((engine_main, Base.metadata), (engine_radius, radius_metadata),
+                             (engine_radius, rollup_metadata)):
+        with engine.begin() as conn:
+            for tabla in reversed(metadata.sorted_tables):
+                conn.execute(tabla.delete())
+
+
+@pytest.fixture
+def firewall():
+    """Reemplaza el firewall real por un FakeExecutor (sin sudo)."""
+    from app.services import network_service
+    fake = network_service.FakeExecutor()
+    network_service.configurar_backend(network_service.IptablesBackend(fake))
+    yield fake
+    network_service.configurar_backend(None)
+
+
+@pytest.fixture
+def client(bd, firewall):
+    from fastapi.testclient import TestClient
+    from main import app
+
+    from app.services.credencial_service import verificador
+
+    with TestClient(app) as c:
+        yield c
+        # El apagado de la app cierra el pool sin esperar: que no siga hasheando en la próxima prueba
+        verificador.esperar_fondo()
@@ -0,0 +1,20 @@
+import os
+import subprocess
+import sys
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def test_importar_main_no_crea_motores_ni_carga_firebase(tmp_path):
+    codigo = (
+        "import sys, main\n"
+        "from app.db import session\n"
+        "assert not session._engines, session._engines\n"
+        "assert not session._async_engines\n"
+        "assert 'firebase_admin' not in sys.modules\n"
+    )
+    # URL inalcanzable: importar no debe intentar conectarse
+    env = dict(os.environ, MYSQL_MAIN_URL="mysql+pymysql://u:p@192.0.2.1/x",
+               MYSQL_RADIUS_URL="mysql+pymysql://u:p@192.0.2.1/y",
+               FIREBASE_CREDENTIALS=str(tmp_path / "no-existe.json"))
+    subprocess.run([sys.executable, "-c", codigo], cwd=BACKEND, env=env, check=True, timeout=60)
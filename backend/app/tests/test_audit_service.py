@@ -0,0 +1,70 @@
+import threading
+import time
+
+from sqlalchemy import event
+
+from app.db.session import engine_main
+from app.services.audit_service import AuditWriter, auditoria
+
+
+def test_writer_agrupa_en_inserts_de_varias_filas(bd):
+    sentencias = []
+
+    def contar(conn, cursor, statement, params, context, executemany):
+        if statement.startswith("INSERT INTO admin_logs"):
+            sentencias.append(statement)
+
+    event.listen(engine_main, "before_cursor_execute", contar)
+    writer = AuditWriter(tam_lote=100, intervalo=60)
+    try:
+        inicio = time.perf_counter()
+        hilos = [
+            threading.Thread(target=lambda n=n: [writer.registrar("prueba", f"{n}-{i}", None) for i in range(250)])
+            for n in range(4)
+        ]
+        for h in hilos:
+            h.start()
+        for h in hilos:
+            h.join()
+        encolado = time.perf_counter() - inicio
+        assert writer.vaciar()
+    finally:
+        writer.detener()
+        event.remove(engine_main, "before_cursor_execute", contar)
+    assert writer.escritas == 1000
+    assert len(sentencias) <= 12  # 10 lotes llenos (+ restos), no 1000 INSERT
+    assert encolado < 1  # registrar no toca la base
+
+
+def test_writer_vacia_por_tiempo(bd):
+    writer = AuditWriter(tam_lote=1000, intervalo=0.05)
+    try:
+        writer.registrar("prueba", "solo uno")
+        limite = time.monotonic() + 2
+        while writer.escritas == 0 and time.monotonic() < limite:
+            time.sleep(0.01)
+        assert writer.escritas == 1
+    finally:
+        writer.detener()
+
+
+def test_acciones_quedan_en_logs_y_se_paginan(client):
+    for i in range(3):
+        client.post("/users/", json={"username": f"aud{i}", "password": "pw", "creado_por": 7})
+    client.post("/portal/login", data={"username": "aud0", "password": "mala"})
+    client.post("/portal/login", data={"username": "aud1", "password": "pw"})
+    assert auditoria.vaciar()
+
+    r = client.get("/admin/logs", params={"admin_id": 7, "limit": 2})
+    assert r.status_code == 200
+    pagina1 = r.json()
+    assert [l["accion"] for l in pagina1] == ["crear_invitado"] * 2
+    assert "username=aud2" in pagina1[0]["detalle"]  # más reciente primero
+    r2 = client.get("/admin/logs", params={"admin_id": 7, "cursor": r.headers["X-Next-Cursor"]})
+    assert [l["detalle"].split()[1] for l in r2.json()] == ["username=aud0"]
+    assert "X-Next-Cursor" not in r2.headers
+
+    acciones = [l["accion"] for l in client.get("/admin/logs", params={"accion": "login_portal"}).json()]
+    assert acciones == ["login_portal"]
+    assert len(client.get("/admin/logs", params={"accion": "login_portal_fallido"}).json()) == 1
+    assert client.get("/admin/logs", params={"cursor": "basura"}).status_code == 400
@@ -0,0 +1,52 @@
+from datetime import datetime
+from types import SimpleNamespace
+
+from app.services.cache_service import CacheInvitados, cache_invitados
+from app.services.expiracion_service import barrer_expirados
+
+
+class Reloj:
+    def __init__(self):
+        self.t = 0.0
+
+    def __call__(self):
+        return self.t
+
+
+def _inv(uid, username):
+    return SimpleNamespace(uid=uid, username=username)
+
+
+def test_lru_ttl_por_uid_y_username():
+    reloj = Reloj()
+    cache = CacheInvitados(max_items=2, ttl=10, clock=reloj)
+    cache.guardar(_inv("USR1", "ana"))
+    cache.guardar(_inv("USR2", "beto"))
+    assert cache.obtener_por_username("ana").uid == "USR1"  # USR1 pasa a ser el más reciente
+    cache.guardar(_inv("USR3", "caro"))
+    assert cache.obtener_por_uid("USR2") is None and cache.obtener_por_username("beto") is None
+    reloj.t = 11
+    assert cache.obtener_por_uid("USR1") is None
+    assert len(cache) == 1 and (cache.aciertos, cache.fallos) == (1, 3)
+
+
+def test_estado_desde_cache_con_etag_e_invalidacion(client):
+    r = client.post("/users/", json={"username": "poll", "password": "pw", "session_timeout": 30, "creado_por": 1})
+    uid = r.json()["uid"]
+
+    primero = client.get(f"/users/{uid}/estado")
+    assert primero.json()["activo"] is True and primero.json()["expiracion"]
+    aciertos = cache_invitados.aciertos
+    segundo = client.get(f"/users/{uid}/estado", headers={"If-None-Match": primero.headers["ETag"]})
+    assert segundo.status_code == 304
+    assert client.get(f"/users/{uid}").json()["username"] == "poll"
+    assert cache_invitados.aciertos == aciertos + 2
+
+    # El barrido cambia el estado: la caché se invalida y el ETag deja de coincidir
+    barrer_expirados(ahora=datetime.now().replace(year=2100))
+    tercero = client.get(f"/users/{uid}/estado", headers={"If-None-Match": primero.headers["ETag"]})
+    assert tercero.status_code == 200 and tercero.json()["activo"] is False
+
+    client.delete(f"/users/{uid}")
+    assert client.get(f"/users/{uid}").status_code == 404
+    assert "nac_cache_invitados_total{resultado=\"hit\"}" in client.get("/metrics").text
@@ -0,0 +1,77 @@
+import asyncio
+
+from app.services.coa_service import (
+    COA_ACK, CoAClient, DISCONNECT_REQUEST, StubNasServer, autenticador_respuesta,
+)
+
+SECRET = "testing123"
+
+
+def test_disconnect_ack_y_nak():
+    async def escenario():
+        nas = StubNasServer(SECRET, responder=lambda u: u != "fantasma")
+        port = await nas.iniciar()
+        cliente = CoAClient("127.0.0.1", port, SECRET, timeout=0.5)
+        ok = await cliente.desconectar("ana")
+        nak = await cliente.desconectar("fantasma")
+        cliente.cerrar()
+        nas.detener()
+        return ok, nak, nas.recibidos
+
+    ok, nak, recibidos = asyncio.run(escenario())
+    assert ok["ok"] and ok["respuesta"] == "Disconnect-ACK"
+    assert not nak["ok"] and nak["error_cause"] == 503
+    assert [r["codigo"] for r in recibidos] == [DISCONNECT_REQUEST, DISCONNECT_REQUEST]
+
+
+def test_retransmite_y_descarta_secret_incorrecto():
+    async def escenario():
+        nas = StubNasServer(SECRET, descartar=1)
+        port = await nas.iniciar()
+        cliente = CoAClient("127.0.0.1", port, SECRET, timeout=0.1, reintentos=3)
+        reintentado = await cliente.desconectar("ana")
+        malo = CoAClient("127.0.0.1", port, "otro", timeout=0.05, reintentos=2)
+        rechazado = await malo.desconectar("ana")
+        cliente.cerrar(); malo.cerrar(); nas.detener()
+        return reintentado, rechazado
+
+    reintentado, rechazado = asyncio.run(escenario())
+    assert reintentado["ok"] and reintentado["intentos"] == 2
+    assert rechazado == {"ok": False, "codigo": None, "respuesta": "timeout", "intentos": 2, "username": "ana"}
+
+
+class _NasCodigoCruzado(StubNasServer):
+    """Responde CoA-ACK (bien firmado) a cualquier petición."""
+
+    def _atender(self, data):
+        respuesta = bytearray(super()._atender(data))
+        respuesta[0] = COA_ACK
+        respuesta[4:20] = autenticador_respuesta(bytes(respuesta), data[4:20], self.secret)
+        return bytes(respuesta)
+
+
+def test_descarta_respuesta_de_otro_tipo():
+    async def escenario():
+        nas = _NasCodigoCruzado(SECRET)
+        port = await nas.iniciar()
+        cliente = CoAClient("127.0.0.1", port, SECRET, timeout=0.05, reintentos=2)
+        resultado = await cliente.desconectar("ana")
+        cliente.cerrar(); nas.detener()
+        return resultado
+
+    assert asyncio.run(escenario())["respuesta"] == "timeout"
+
+
+def test_cientos_en_vuelo_sobre_un_socket():
+    async def escenario():
+        nas = StubNasServer(SECRET)
+        port = await nas.iniciar()
+        cliente = CoAClient("127.0.0.1", port, SECRET, timeout=1)
+        resultados = await cliente.desconectar_varios([f"u{i}" for i in range(600)])
+        cliente.cerrar(); nas.detener()
+        return resultados, nas.recibidos
+
+    resultados, recibidos = asyncio.run(escenario())
+    assert all(r["ok"] for r in resultados)
+    assert [r["username"] for r in resultados] == [f"u{i}" for i in range(600)]
+    assert len(recibidos) == 600
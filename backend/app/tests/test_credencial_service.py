@@ -0,0 +1,89 @@
+import asyncio
+
+import pytest
+from sqlalchemy import insert, select
+
+from app.db.session import SessionLocal
+from app.models.invitado import UsuarioInvitado
+from app.services import credencial_service
+from app.services.credencial_service import (
+    VerificacionSaturada, VerificadorCredenciales, es_hash, hashear, necesita_rehash, verificar,
+)
+from app.services.limite_service import LimitadorTokens
+
+
+def test_hash_scrypt_y_compatibilidad_en_claro():
+    h = hashear("secreta")
+    assert es_hash(h) and "secreta" not in h and h != hashear("secreta")  # sal aleatoria
+    assert verificar("secreta", h) and not verificar("otra", h)
+    assert verificar("vieja", "vieja") and necesita_rehash("vieja")
+    assert not necesita_rehash(h) and necesita_rehash(hashear("x", n=2048))
+    # Valores con el prefijo pero mal formados: inválidos, nunca un 500
+    for roto in ("scrypt$", "scrypt$1024", "scrypt$abc$8$1$c2Fs$aGFzaA=="):
+        assert necesita_rehash(roto) and not verificar("x", roto)
+    assert not verificar("x", "scrypt$roto")
+
+
+def test_verificador_cachea_aciertos_y_se_satura(monkeypatch):
+    llamadas = []
+    real = credencial_service.verificar
+    monkeypatch.setattr(credencial_service, "verificar", lambda p, a: llamadas.append(p) or real(p, a))
+    v = VerificadorCredenciales(hilos=2, max_pendientes=1)
+    h = hashear("pw")
+
+    async def escenario():
+        assert await v.verificar("pw", h)
+        assert await v.verificar("pw", h)  # desde la caché
+        assert not await v.verificar("mala", h)
+        assert not await v.verificar("mala", h)  # los fallos no se cachean
+        v._cupos.acquire()
+        with pytest.raises(VerificacionSaturada):
+            await v.verificar("otra", h)
+        v._cupos.release()
+
+    asyncio.run(escenario())
+    v.cerrar()
+    assert llamadas == ["pw", "mala", "mala"]
+
+
+def test_token_bucket():
+    ahora = [0.0]
+    lim = LimitadorTokens(rafaga=3, por_minuto=60, clock=lambda: ahora[0])
+    assert [lim.permitir("ip") for _ in range(4)] == [True, True, True, False]
+    assert lim.permitir("otra_ip")
+    assert lim.espera("ip") == 1
+    ahora[0] += 1.0
+    assert lim.permitir("ip") and not lim.permitir("ip")
+    assert LimitadorTokens(rafaga=0, por_minuto=0).permitir("x")
+
+
+def test_login_rehashea_en_claro_y_limita_intentos(client, firewall):
+    from app.services.limite_service import limite_login_usuario
+    from app.services.scheduler_service import scheduler
+
+    # Fila previa a la migración, con la contraseña en claro
+    with SessionLocal() as db:
+        db.execute(insert(UsuarioInvitado).values(uid="USR900", username="legado", password="pw",
+                                                  session_timeout=30, creado_por=1, estado="activo"))
+        db.commit()
+    assert client.post("/portal/login", data={"username": "legado", "password": "pw"}).status_code == 200
+    scheduler.cancelar("testclient")
+    with SessionLocal() as db:
+        guardada = db.execute(select(UsuarioInvitado.password).where(UsuarioInvitado.username == "legado")).scalar()
+    assert es_hash(guardada) and verificar("pw", guardada)
+
+    # Las altas guardan el hash; radcheck y el QR siguen usando la clave en claro
+    uid = client.post("/users/", json={"username": "nuevo", "password": "clave", "creado_por": 1}).json()["uid"]
+    with SessionLocal() as db:
+        assert es_hash(db.execute(select(UsuarioInvitado.password).where(UsuarioInvitado.uid == uid)).scalar())
+    from app.models.qr_code import QrCodes
+    client.get(f"/qr/{uid}")
+    with SessionLocal() as db:
+        assert "clave" not in db.execute(select(QrCodes.qr_string)).scalar()
+
+    # Fuerza bruta sobre un username: 429 antes de tocar la BD
+    rafaga = limite_login_usuario.rafaga
+    codigos = [client.post("/portal/login", data={"username": "victima", "password": "x"}).status_code
+               for _ in range(rafaga + 1)]
+    assert codigos[:rafaga] == [401] * rafaga
+    assert codigos[-1] == 429
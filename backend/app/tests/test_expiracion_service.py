@@ -0,0 +1,77 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+from app.db.session import SessionLocal, engine_radius
+from app.models.invitado import UsuarioInvitado
+from app.services import expiracion_service
+from app.services.scheduler_service import scheduler
+
+
+def _invitado(client, username, **extra):
+    r = client.post("/users/", json={"username": username, "password": "pw", "creado_por": 1, **extra})
+    assert r.status_code == 200, r.text
+    return r.json()
+
+
+def test_crear_fija_expiracion_desde_session_timeout(client):
+    inv = _invitado(client, "ana", session_timeout=30)
+    assert inv["expiracion"] is not None
+    restante = datetime.fromisoformat(inv["expiracion"]) - datetime.now()
+    assert timedelta(minutes=29) < restante <= timedelta(minutes=30)
+
+
+def test_barrido_expira_borra_radius_y_revoca_por_lotes(client, firewall):
+    pasado = (datetime.now() - timedelta(minutes=1)).isoformat()
+    futuro = (datetime.now() + timedelta(hours=1)).isoformat()
+    for i in range(5):
+        _invitado(client, f"vencido{i}", expiracion=pasado, session_timeout=10)
+    vigente = _invitado(client, "vigente", expiracion=futuro, session_timeout=10)
+    # crear_invitado autoriza la IP del cliente de pruebas; el programador la asocia al username
+    firewall.run(["sudo", "iptables", "-I", "FORWARD", "-s", "10.0.0.5", "-j", "ACCEPT"])
+    scheduler.programar("10.0.0.5", 3600, "vencido3")
+    scheduler.programar("10.0.0.6", 3600, "vigente")
+    firewall.comandos.clear()
+
+    try:
+        resultado = expiracion_service.barrer_expirados(tam_lote=2)
+    finally:
+        restante_vigente = scheduler.restante("10.0.0.6")
+        scheduler.cancelar("10.0.0.6")
+    assert resultado["expirados"] == 5
+    assert ("FORWARD", "-s", "10.0.0.5", "-j", "ACCEPT") not in firewall.reglas
+    assert restante_vigente is not None
+
+    db = SessionLocal()
+    try:
+        estados = dict(db.query(UsuarioInvitado.username, UsuarioInvitado.estado))
+    finally:
+        db.close()
+    assert estados.pop("vigente") == "activo"
+    assert set(estados.values()) == {"expirado"}
+    with engine_radius.connect() as conn:
+        assert conn.execute(text("SELECT username FROM radcheck")).scalars().all() == ["vigente"]
+
+    assert client.get(f"/users/{vigente['uid']}/estado").json()["activo"] is True
+    # un segundo barrido no encuentra nada nuevo
+    assert expiracion_service.barrer_expirados()["expirados"] == 0
+
+
+def test_login_rechaza_expirados_y_acota_a_la_expiracion(client, firewall):
+    pasado = (datetime.now() - timedelta(minutes=1)).isoformat()
+    _invitado(client, "vencido", expiracion=pasado, session_timeout=10)
+    # Aún activo en la BD (el barrido no pasó): igual se rechaza
+    assert client.post("/portal/login", data={"username": "vencido", "password": "pw"}).status_code == 403
+    expiracion_service.barrer_expirados()
+    assert client.post("/portal/login", data={"username": "vencido", "password": "pw"}).status_code == 403
+    assert not any(r[2] == "testclient" for r in firewall.reglas if r[0] == "FORWARD")
+
+    # session_timeout de 60 min, pero el invitado vence en 5: el acceso dura 5
+    pronto = (datetime.now() + timedelta(minutes=5)).isoformat()
+    _invitado(client, "pronto", expiracion=pronto, session_timeout=60)
+    r = client.post("/portal/login", data={"username": "pronto", "password": "pw"})
+    try:
+        assert r.status_code == 200
+        assert 290 < scheduler.restante("testclient") <= 300
+    finally:
+        scheduler.cancelar("testclient")
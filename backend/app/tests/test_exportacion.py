@@ -0,0 +1,66 @@
+import gzip
+import io
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import insert
+
+from app.db.radius_schema import radacct
+from app.db.session import engine_radius
+from app.services import exportacion_service
+
+T0 = datetime(2026, 9, 1)
+
+
+def _sembrar_radacct(n):
+    with engine_radius.begin() as conn:
+        conn.execute(insert(radacct), [
+            {"acctsessionid": f"s{i}", "acctuniqueid": f"uq{i}", "username": f"u{i % 7}",
+             "framedipaddress": "10.0.0.1", "acctstarttime": T0 + timedelta(hours=i),
+             "acctinputoctets": i * 10, "acctoutputoctets": i}
+            for i in range(n)
+        ])
+
+
+def test_csv_gzip_por_particiones_con_rango(client):
+    _sembrar_radacct(1000)
+    r = client.get("/export/radacct", params={"desde": (T0 + timedelta(hours=100)).isoformat(),
+                                              "hasta": (T0 + timedelta(hours=400)).isoformat(), "tam_lote": 100})
+    assert r.status_code == 200 and r.headers["content-type"] == "application/gzip"
+    assert 'radacct_20260905_20260917.csv.gz' in r.headers["content-disposition"]
+    lineas = gzip.decompress(r.content).decode().splitlines()
+    assert lineas[0].startswith("radacctid,acctsessionid")
+    assert len(lineas) == 301 and lineas[1].startswith("101,s100,")
+
+    invitados = gzip.decompress(client.get("/export/invitados").content).decode()
+    assert "password" not in invitados.splitlines()[0]
+    assert client.get("/export/nada").status_code == 404
+
+
+def test_parquet_un_row_group_por_particion(bd):
+    pq = pytest.importorskip("pyarrow.parquet")
+    _sembrar_radacct(250)
+    datos = b"".join(exportacion_service.exportar("radacct", "parquet", tam_lote=100))
+    archivo = pq.ParquetFile(io.BytesIO(datos))
+    assert archivo.metadata.num_rows == 250 and archivo.metadata.num_row_groups == 3
+    tabla = archivo.read(columns=["radacctid", "acctstarttime", "acctinputoctets"])
+    assert tabla.column("acctinputoctets").to_pylist()[-1] == 2490
+    assert tabla.column("acctstarttime").to_pylist()[0] == T0
+
+
+def test_cupo_de_exportaciones(bd, monkeypatch):
+    import threading
+    monkeypatch.setattr(exportacion_service, "_cupos", threading.BoundedSemaphore(1))
+    primera = exportacion_service.exportar("admin_logs", "csv")
+    with pytest.raises(exportacion_service.ExportacionOcupada):
+        exportacion_service.exportar("admin_logs", "csv")
+    primera.close()  # cerrar el generador libera el cupo
+    assert gzip.decompress(b"".join(exportacion_service.exportar("admin_logs", "csv"))).startswith(b"id,")
+
+
+def test_cli_exporta_a_archivo(bd, tmp_path):
+    from app.cli import main
+    _sembrar_radacct(10)
+    destino = tmp_path / "r.csv.gz"
+    assert main(["exportar", "radacct", "--out", str(destino)]) == 0
+    assert len(gzip.decompress(destino.read_bytes()).decode().splitlines()) == 11
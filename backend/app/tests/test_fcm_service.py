@@ -0,0 +1,68 @@
+import time
+
+from app.services.fcm_service import Outbox, FakeTransport, _cargar_pendientes
+
+
+def test_envia_por_lotes_y_fusiona_duplicados():
+    fake = FakeTransport(latencia=0.05)
+    outbox = Outbox(fake, tam_lote=100)
+    for i in range(1000):
+        outbox.encolar("Alerta", f"Invitado {i} conectado")
+    assert outbox.vaciar(10)
+    outbox.detener()
+    assert len(fake.enviados) == 1000
+    assert max(len(lote) for lote in fake.lotes) <= 100
+    assert len(fake.lotes) < 1000  # se agruparon
+
+
+def test_fusiona_alertas_identicas_pendientes():
+    fake = FakeTransport(latencia=0.1)
+    outbox = Outbox(fake)
+    outbox.encolar("Caída", "AP sin respuesta")
+    outbox.encolar("Caída", "AP sin respuesta")
+    outbox.encolar("Caída", "AP sin respuesta")
+    assert outbox.vaciar()
+    outbox.detener()
+    assert outbox.fusionadas >= 1
+    assert len(fake.enviados) <= 2
+
+
+def test_reintenta_fallos_con_backoff():
+    fake = FakeTransport(fallar=2)
+    outbox = Outbox(fake, backoff=0.01)
+    outbox.encolar("A", "1")
+    outbox.encolar("B", "2")
+    assert outbox.vaciar()
+    outbox.detener()
+    exitosos = [n.titulo for n in fake.lotes[-1]]
+    assert sorted(exitosos) == ["A", "B"]
+    assert outbox.descartadas == 0
+
+
+def test_persistencia_y_recuperacion(bd):
+    fake = FakeTransport()
+    outbox = Outbox(FakeTransport(fallar=10**6), persistir=True, max_intentos=10**6, backoff=60)
+    outbox.encolar("Persistida", "sobrevive al reinicio")
+    outbox.detener(timeout=0.1)  # "se cae" con la notificación aún pendiente
+    # Un proceso nuevo recupera lo que quedó en la tabla
+    nuevo = Outbox(fake, persistir=True)
+    nuevo.recuperar()
+    assert nuevo.vaciar()
+    nuevo.detener()
+    assert [n.titulo for n in fake.enviados] == ["Persistida"]
+    assert _cargar_pendientes() == []
+
+
+def test_reintento_reemplazado_no_deja_fila(bd):
+    fake = FakeTransport(fallar=1, latencia=0.2)
+    outbox = Outbox(fake, persistir=True, backoff=0.01)
+    outbox.encolar("Caída", "AP sin respuesta")
+    limite = time.monotonic() + 2
+    while outbox._en_envio == 0 and time.monotonic() < limite:
+        time.sleep(0.005)
+    # Llega otra idéntica mientras la primera está en vuelo (y va a fallar)
+    assert outbox.encolar("Caída", "AP sin respuesta")
+    assert outbox.vaciar()
+    outbox.detener()
+    assert outbox.fusionadas == 1
+    assert _cargar_pendientes() == []
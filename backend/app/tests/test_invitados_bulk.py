@@ -0,0 +1,79 @@
+from sqlalchemy import text
+
+from app.db.session import SessionLocal, engine_radius
+from app.api import invitados_router
+from app.models.invitado import UsuarioInvitado
+from app.services.credencial_service import PENDIENTE, es_hash, hashear, verificador
+
+
+def _lote(n, inicio=0):
+    return [
+        {"username": f"evento{i}", "password": f"pw{i}", "session_timeout": 60,
+         "creado_por": 1, "max_down": 2048, "max_up": 512}
+        for i in range(inicio, inicio + n)
+    ]
+
+
+def test_alta_masiva_mil_invitados(client):
+    r = client.post("/users/bulk", json={"invitados": _lote(1000)})
+    assert r.status_code == 200, r.text
+    cuerpo = r.json()
+    assert len(cuerpo["creados"]) == 1000
+    assert cuerpo["errores"] == []
+    assert len({c["uid"] for c in cuerpo["creados"]}) == 1000
+    with engine_radius.connect() as conn:
+        assert conn.execute(text("SELECT COUNT(*) FROM radcheck")).scalar() == 1000
+        assert conn.execute(text("SELECT COUNT(*) FROM radreply")).scalar() == 3000
+
+
+def test_alta_masiva_reporta_errores_por_fila(client):
+    client.post("/users/bulk", json={"invitados": _lote(2)})
+    lote = _lote(3) + _lote(1, inicio=10) + _lote(1, inicio=10)
+    r = client.post("/users/bulk", json={"invitados": lote})
+    cuerpo = r.json()
+    assert [c["username"] for c in cuerpo["creados"]] == ["evento2", "evento10"]
+    assert sorted((e["indice"], e["error"]) for e in cuerpo["errores"]) == [
+        (0, "username ya existe"), (1, "username ya existe"), (4, "username repetido en el lote"),
+    ]
+
+
+def test_alta_masiva_por_trozos_y_con_tope(client):
+    client.post("/users/bulk", json={"invitados": _lote(1200)})
+    r = client.post("/users/bulk", json={"invitados": _lote(1500, inicio=300)})
+    cuerpo = r.json()
+    assert len(cuerpo["errores"]) == 900 and {e["error"] for e in cuerpo["errores"]} == {"username ya existe"}
+    assert [c["username"] for c in cuerpo["creados"]] == [f"evento{i}" for i in range(1200, 1800)]
+    # Mismo tope que /users/revoke
+    assert client.post("/users/bulk", json={"invitados": _lote(10001)}).status_code == 422
+
+
+def test_alta_masiva_difiere_los_hashes(client, monkeypatch):
+    hasheados = []
+
+    def hashear_contando(password, n=None):
+        hasheados.append(password)
+        return hashear(password, 16)
+
+    encolados = []
+    monkeypatch.setattr(invitados_router, "hashear", hashear_contando)
+    monkeypatch.setattr(verificador, "en_segundo_plano", lambda funcion, *args: encolados.append((funcion, args)))
+
+    r = client.post("/users/bulk", json={"invitados": _lote(1000)})
+    assert r.status_code == 200 and len(r.json()["creados"]) == 1000
+    # Ningún hash dentro de la petición: un solo trabajo de fondo con las 1000 filas
+    assert hasheados == []
+    assert len(encolados) == 1
+    funcion, (pendientes,) = encolados[0]
+    assert funcion is invitados_router.hashear_alta_masiva and len(pendientes) == 1000
+    with SessionLocal() as db:
+        assert {p for (p,) in db.query(UsuarioInvitado.password)} == {PENDIENTE}
+
+    # Mientras siguen en PENDIENTE, el login verifica contra radcheck
+    assert client.post("/portal/login", data={"username": "evento999", "password": "x"}).status_code == 401
+    assert client.post("/portal/login", data={"username": "evento999", "password": "pw999"}).status_code == 200
+
+    funcion(pendientes)
+    assert len(hasheados) == 1000
+    with SessionLocal() as db:
+        guardadas = db.query(UsuarioInvitado.password).all()
+    assert all(es_hash(p) for (p,) in guardadas)
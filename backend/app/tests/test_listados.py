@@ -0,0 +1,45 @@
+import json
+
+
+def _crear(client, n):
+    invitados = [
+        {"username": f"g{i}", "password": "x", "creado_por": 1 + i % 2, "session_timeout": 30}
+        for i in range(n)
+    ]
+    assert client.post("/users/bulk", json={"invitados": invitados}).status_code == 200
+
+
+def test_paginacion_por_cursor(client):
+    _crear(client, 25)
+    vistos, after = [], None
+    while True:
+        params = {"limit": 10} | ({"after": after} if after else {})
+        r = client.get("/users/", params=params)
+        assert r.status_code == 200
+        vistos += [i["username"] for i in r.json()]
+        after = r.headers.get("X-Next-Cursor")
+        if not after:
+            break
+    assert vistos == [f"g{i}" for i in range(25)]
+
+
+def test_filtros_y_ndjson(client):
+    _crear(client, 10)
+    r = client.get("/users/", params={"creado_por": 2})
+    assert [i["username"] for i in r.json()] == ["g1", "g3", "g5", "g7", "g9"]
+
+    r = client.get("/users/", params={"formato": "ndjson", "creado_por": 1})
+    assert r.headers["content-type"].startswith("application/x-ndjson")
+    filas = [json.loads(linea) for linea in r.text.splitlines()]
+    assert [f["username"] for f in filas] == ["g0", "g2", "g4", "g6", "g8"]
+    assert "password" not in filas[0]
+
+
+def test_admins_paginados(client):
+    for i in range(3):
+        r = client.post("/admin/users", json={"nombre": f"a{i}", "correo": f"a{i}@x.com", "password": "x"})
+        assert r.status_code == 200, r.text
+    r = client.get("/admin/users", params={"limit": 2})
+    assert len(r.json()) == 2 and r.headers["X-Next-Cursor"]
+    r = client.get("/admin/users", headers={"Accept": "application/x-ndjson"})
+    assert len(r.text.splitlines()) == 3
@@ -0,0 +1,54 @@
+import subprocess
+
+import pytest
+
+from app.core import metrics
+from app.core.metrics import medir_comando
+from app.services.scheduler_service import scheduler
+
+
+def _valor(texto: str, prefijo: str) -> float:
+    for linea in texto.splitlines():
+        if linea.startswith(prefijo):
+            return float(linea.rsplit(" ", 1)[1])
+    return 0.0
+
+
+def test_metrics_por_ruta_pool_y_consultas(client):
+    uid = client.post("/users/", json={"username": "met", "password": "pw", "creado_por": 1}).json()["uid"]
+    for _ in range(3):
+        client.get(f"/users/{uid}/estado")
+    scheduler.programar("10.9.9.9", 3600)
+    try:
+        texto = client.get("/metrics").text
+    finally:
+        scheduler.cancelar("10.9.9.9")
+    # La ruta se etiqueta con su plantilla, no con el UID concreto
+    assert _valor(texto, 'nac_http_request_duration_seconds_count{method="GET",route="/users/{uid}/estado",status="200"}') >= 3
+    assert uid not in texto
+    assert _valor(texto, 'nac_db_pool_checkout_wait_seconds_count{engine="main"}') > 0
+    assert _valor(texto, 'nac_db_query_duration_seconds_count{engine="radius"}') > 0
+    assert _valor(texto, "nac_revocaciones_pendientes") >= 1
+    # /estado consulta con AsyncSession: el motor asíncrono también se mide
+    assert _valor(texto, 'nac_db_query_duration_seconds_count{engine="main_async"}') > 0
+    assert _valor(texto, 'nac_db_pool_checkout_wait_seconds_count{engine="main_async"}') > 0
+    assert "nac_http_requests_in_progress" in texto
+
+
+def test_comandos_fallidos_y_peticiones_lentas(client, monkeypatch):
+    antes = metrics.COMANDO_FALLOS.labels("falso")._value.get()
+    with pytest.raises(subprocess.CalledProcessError):
+        with medir_comando("falso"):
+            raise subprocess.CalledProcessError(1, ["falso"])
+    assert metrics.COMANDO_FALLOS.labels("falso")._value.get() == antes + 1
+
+    lentas = []
+    monkeypatch.setattr(metrics, "hook_lenta", lambda *args: lentas.append(args))
+    app = client.app
+    middleware = metrics.MetricsMiddleware(app.router, umbral_lento_ms=0.001)
+    from fastapi.testclient import TestClient
+    with TestClient(middleware) as c:
+        c.get("/users/")
+    metodo, ruta, duracion, desglose = lentas[0]
+    assert (metodo, ruta) == ("GET", "/users/")
+    assert desglose["db:main"][0] >= 1  # la consulta del endpoint síncrono cuenta para la petición
@@ -0,0 +1,76 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert, update
+
+from app.db.radius_schema import radacct
+from app.db.session import engine_radius
+from app.services.monitor_service import obtener_cambios_sesiones
+
+T0 = datetime(2026, 1, 1, 10, 0, 0)
+
+
+def _sesion(conn, n, ts, username="u"):
+    conn.execute(insert(radacct).values(
+        acctsessionid=f"s{n}", acctuniqueid=f"uq{n}", username=f"{username}{n}",
+        framedipaddress=f"10.0.0.{n}", acctstarttime=ts, acctupdatetime=ts,
+        acctinputoctets=0, acctoutputoctets=0,
+    ))
+
+
+def test_feed_entrega_solo_deltas(bd):
+    with engine_radius.begin() as conn:
+        _sesion(conn, 1, T0)
+        _sesion(conn, 2, T0)
+    foto = obtener_cambios_sesiones()
+    assert [c["tipo"] for c in foto["cambios"]] == ["activa", "activa"]
+
+    # Sin cambios: nada, aunque las filas compartan el segundo de la marca de agua
+    vacio = obtener_cambios_sesiones(foto["cursor"])
+    assert vacio["cambios"] == []
+
+    with engine_radius.begin() as conn:
+        _sesion(conn, 3, T0 + timedelta(seconds=5))
+        conn.execute(update(radacct).where(radacct.c.radacctid == 1).values(
+            acctupdatetime=T0 + timedelta(seconds=5), acctinputoctets=100))
+        conn.execute(update(radacct).where(radacct.c.radacctid == 2).values(
+            acctupdatetime=T0 + timedelta(seconds=6), acctstoptime=T0 + timedelta(seconds=6)))
+    delta = obtener_cambios_sesiones(vacio["cursor"])
+    assert sorted((c["radacctid"], c["tipo"]) for c in delta["cambios"]) == [(1, "update"), (2, "stop"), (3, "start")]
+    assert obtener_cambios_sesiones(delta["cursor"])["cambios"] == []
+
+
+def test_endpoint_cambios(client):
+    with engine_radius.begin() as conn:
+        _sesion(conn, 1, T0)
+    r = client.get("/monitor/sesiones/cambios")
+    assert r.status_code == 200 and len(r.json()["cambios"]) == 1
+    assert client.get("/monitor/sesiones/cambios", params={"cursor": "basura"}).status_code == 400
+
+
+def test_indice_ip_desde_el_feed(bd):
+    from app.services.sesion_ip_service import IndiceSesionesIp
+
+    indice = IndiceSesionesIp()
+    with engine_radius.begin() as conn:
+        _sesion(conn, 1, T0)
+    foto = obtener_cambios_sesiones()
+    indice.aplicar_cambios(foto)
+    assert indice.consultar("10.0.0.1")["radius"]["radacctid"] == 1
+    assert indice.consultar("10.0.0.1")["portal"] is None
+
+    with engine_radius.begin() as conn:
+        conn.execute(update(radacct).where(radacct.c.radacctid == 1).values(
+            acctupdatetime=T0 + timedelta(seconds=6), acctstoptime=T0 + timedelta(seconds=6)))
+    indice.aplicar_cambios(obtener_cambios_sesiones(foto["cursor"]))
+    assert indice.consultar("10.0.0.1") is None
+
+
+def test_endpoint_sesion_por_ip(client):
+    from app.services.sesion_ip_service import indice_sesiones
+
+    indice_sesiones.registrar_portal("10.0.0.9", "ana", 600)
+    r = client.get("/monitor/ip/10.0.0.9")
+    assert r.status_code == 200
+    assert r.json()["username"] == "ana" and 590 < r.json()["portal"]["restante_seg"] <= 600
+    assert r.json()["autorizada"] is False
+    assert client.get("/monitor/ip/10.0.0.10").status_code == 404
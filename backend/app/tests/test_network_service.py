@@ -0,0 +1,59 @@
+from app.services.network_service import FakeExecutor, IpsetBackend, IptablesBackend, crear_backend
+
+
+def test_ipset_una_regla_y_sin_procesos_duplicados():
+    fake = FakeExecutor()
+    backend = IpsetBackend(fake, set_name="test_set")
+    assert backend.autorizar("10.0.0.1", 600)["msg"] == "autorizado"
+    n = len(fake.comandos)
+    # Autorización repetida: resuelta por el espejo en memoria, sin procesos
+    assert backend.autorizar("10.0.0.1", 600)["msg"] == "ya_autorizado"
+    assert len(fake.comandos) == n
+    backend.autorizar("10.0.0.2", 600)
+    assert fake.sets["test_set"] == {"10.0.0.1", "10.0.0.2"}
+    reglas_forward = [r for r in fake.reglas if r[0] == "FORWARD"]
+    assert len(reglas_forward) == 1
+    backend.revocar("10.0.0.1")
+    assert fake.sets["test_set"] == {"10.0.0.2"}
+    assert not backend.es_miembro("10.0.0.1")
+
+
+def test_ipset_espejo_respeta_timeout():
+    ahora = [1000.0]
+    fake = FakeExecutor()
+    backend = IpsetBackend(fake, clock=lambda: ahora[0])
+    backend.autorizar("10.0.0.1", 60)
+    assert backend.es_miembro("10.0.0.1")
+    ahora[0] += 61
+    assert not backend.es_miembro("10.0.0.1")
+    n = len(fake.comandos)
+    backend.autorizar("10.0.0.1", 60)
+    assert len(fake.comandos) == n + 1
+
+
+def test_fallback_a_iptables_sin_ipset():
+    fake = FakeExecutor(sin_ipset=True)
+    backend = crear_backend("ipset", fake)
+    assert isinstance(backend, IptablesBackend)
+    assert backend.autorizar("10.0.0.1")["msg"] == "autorizado"
+    assert backend.autorizar("10.0.0.1")["msg"] == "ya_autorizado"
+    assert backend.revocar("10.0.0.1") == {"ok": True}
+    assert not fake.reglas
+
+
+def test_ipset_extiende_timeout_si_el_nuevo_vence_despues():
+    ahora = [1000.0]
+    fake = FakeExecutor()
+    backend = IpsetBackend(fake, set_name="test_set", clock=lambda: ahora[0])
+    backend.autorizar("10.0.0.1", 600)
+    ahora[0] += 300
+    # Vence antes que la entrada actual: nada que hacer
+    n = len(fake.comandos)
+    assert backend.autorizar("10.0.0.1", 60)["msg"] == "ya_autorizado"
+    assert len(fake.comandos) == n
+    # Vence después: se reescribe el timeout del kernel con -exist
+    assert backend.autorizar("10.0.0.1", 1800)["msg"] == "extendido"
+    assert fake.comandos[-1][-4:] == ["10.0.0.1", "timeout", "1800", "-exist"]
+    assert fake.timeouts[("test_set", "10.0.0.1")] == 1800
+    ahora[0] += 1000
+    assert backend.es_miembro("10.0.0.1")
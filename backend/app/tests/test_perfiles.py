@@ -0,0 +1,64 @@
+from sqlalchemy import text
+
+from app.db.session import engine_radius
+
+
+def _filas(sql):
+    with engine_radius.connect() as conn:
+        return conn.execute(text(sql)).all()
+
+
+def test_invitados_con_perfil_escriben_una_fila_de_grupo(client):
+    r = client.post("/perfiles/", json={"nombre": "evento-basico", "session_timeout": 60, "max_down": 1024, "max_up": 256})
+    assert r.status_code == 200
+    assert r.json() == {"nombre": "evento-basico", "session_timeout": 60, "max_down": 1024, "max_up": 256, "usuarios": 0}
+    assert client.post("/perfiles/", json={"nombre": "evento-basico", "max_down": 1}).status_code == 409
+
+    lote = [{"username": f"p{i}", "password": "pw", "creado_por": 1, "perfil": "evento-basico"} for i in range(50)]
+    lote.append({"username": "sinperfil", "password": "pw", "creado_por": 1, "perfil": "no-existe"})
+    cuerpo = client.post("/users/bulk", json={"invitados": lote}).json()
+    assert len(cuerpo["creados"]) == 50
+    assert cuerpo["errores"] == [{"indice": 50, "username": "sinperfil", "error": "perfil no existe"}]
+    assert _filas("SELECT COUNT(*) FROM radreply")[0][0] == 0
+    assert _filas("SELECT COUNT(*) FROM radusergroup WHERE groupname = 'evento-basico'")[0][0] == 50
+    assert client.get("/perfiles/evento-basico").json()["usuarios"] == 50
+
+    # Subir la velocidad de todo el evento: solo cambian las filas del grupo
+    r = client.put("/perfiles/evento-basico", json={"session_timeout": 60, "max_down": 4096, "max_up": 1024})
+    assert r.json()["max_down"] == 4096
+    assert _filas("SELECT value FROM radgroupreply WHERE attribute = 'WISPr-Bandwidth-Max-Down'") == [("4096",)]
+    assert client.put("/perfiles/otro", json={"max_down": 1}).status_code == 404
+
+
+def test_mover_invitados_entre_perfiles(client):
+    client.post("/perfiles/", json={"nombre": "basico", "max_down": 512})
+    client.post("/perfiles/", json={"nombre": "vip", "max_down": 8192})
+    client.post("/users/bulk", json={"invitados": [
+        {"username": f"m{i}", "password": "pw", "creado_por": 1, "perfil": "basico"} for i in range(10)
+    ]})
+    client.post("/users/", json={"username": "suelto", "password": "pw", "creado_por": 1, "max_down": 100})
+
+    r = client.post("/perfiles/vip/usuarios", json={"usernames": ["m0", "m1", "suelto", "fantasma"]})
+    assert r.json() == {"perfil": "vip", "movidos": 2, "agregados": 1, "no_encontrados": ["fantasma"]}
+    assert _filas("SELECT COUNT(*) FROM radreply WHERE username = 'suelto'")[0][0] == 0
+    # Sin fila en radcheck no se crea un radusergroup huérfano
+    assert _filas("SELECT COUNT(*) FROM radusergroup WHERE username = 'fantasma'")[0][0] == 0
+
+    r = client.post("/perfiles/vip/mover", json={"desde": "basico"})
+    assert r.json()["movidos"] == 8
+    perfiles = {p["nombre"]: p["usuarios"] for p in client.get("/perfiles/").json()}
+    assert perfiles == {"basico": 0, "vip": 11}
+    assert client.post("/perfiles/nada/usuarios", json={"usernames": ["m0"]}).status_code == 404
+
+
+def test_asignar_perfil_por_trozos(client):
+    client.post("/perfiles/", json={"nombre": "masivo", "max_down": 1024})
+    client.post("/users/bulk", json={"invitados": [
+        {"username": f"t{i}", "password": "pw", "creado_por": 1, "max_down": 100} for i in range(1500)
+    ]})
+    usernames = [f"t{i}" for i in range(1500)] + ["x1", "x2"]
+    r = client.post("/perfiles/masivo/usuarios", json={"usernames": usernames})
+    assert r.json() == {"perfil": "masivo", "movidos": 0, "agregados": 1500, "no_encontrados": ["x1", "x2"]}
+    assert _filas("SELECT COUNT(*) FROM radreply")[0][0] == 0
+    r = client.post("/perfiles/masivo/usuarios", json={"usernames": usernames})
+    assert r.json()["movidos"] == 1500 and r.json()["agregados"] == 0
@@ -0,0 +1,76 @@
+from app.services.scheduler_service import scheduler
+
+
+def test_login_portal_async_autoriza_y_programa(client, firewall):
+    client.post("/users/bulk", json={"invitados": [
+        {"username": "ana", "password": "secreta", "session_timeout": 30, "creado_por": 1},
+    ]})
+    r = client.post("/portal/login", data={"username": "ana", "password": "mala"})
+    assert r.status_code == 401
+    r = client.post("/portal/login", data={"username": "ana", "password": "secreta"})
+    assert r.status_code == 200
+    # acotado a la expiración del invitado (creado + 30 min)
+    assert 1790 < int(r.text.split("por ")[1].split(" segundos")[0]) <= 1800
+    assert ("FORWARD", "-s", "testclient", "-j", "ACCEPT") in firewall.reglas
+    assert 1790 < scheduler.restante("testclient") <= 1800
+    scheduler.cancelar("testclient")
+
+
+def test_consulta_y_estado_async(client):
+    r = client.post("/users/bulk", json={"invitados": [
+        {"username": "bea", "password": "x", "session_timeout": 30, "creado_por": 1},
+    ]})
+    uid = r.json()["creados"][0]["uid"]
+    assert client.get(f"/users/{uid}").json()["username"] == "bea"
+    assert client.get(f"/users/{uid}/estado").json()["activo"] is True
+    assert client.get("/users/USR999999").status_code == 404
+
+
+def test_sondeos_redirigen_o_confirman_sin_firewall(client, firewall):
+    from app.services import network_service
+
+    n = len(firewall.comandos)
+    r = client.get("/generate_204", follow_redirects=False)
+    assert r.status_code == 302 and r.headers["location"] == "/portal/login"
+    assert client.get("/hotspot-detect.html", follow_redirects=False).status_code == 302
+
+    network_service.autorizar_usuario("testclient")
+    assert client.get("/generate_204").status_code == 204
+    r = client.get("/hotspot-detect.html")
+    assert r.status_code == 200 and "Success" in r.text
+    assert client.get("/connecttest.txt").text == "Microsoft Connect Test"
+    assert len(firewall.comandos) == n + 2  # solo el -C / -I de autorizar
+
+    network_service.revocar_usuario("testclient")
+    assert client.get("/generate_204", follow_redirects=False).status_code == 302
+    r = client.get("/portal/login")
+    assert "Ingresar credenciales" in r.text
+    # La página depende de la IP: ningún proxy compartido debe guardarla
+    assert r.headers["cache-control"] == "private, no-cache"
+
+
+def test_espejo_incluye_leases_de_otros_workers(bd, firewall):
+    from app.services import network_service
+    from app.services.lease_service import registrar_lease
+    from app.services.reconciliacion_service import refrescar_espejo
+
+    registrar_lease("10.7.0.1", "otro_worker", 600)
+    registrar_lease("10.7.0.2", "vencido", -1)
+    assert not network_service.ip_autorizada("10.7.0.1")
+    refrescar_espejo()
+    assert network_service.ip_autorizada("10.7.0.1")
+    assert not network_service.ip_autorizada("10.7.0.2")
+
+
+def test_cliente_que_vuelve_no_reautentica(client, firewall):
+    client.post("/users/bulk", json={"invitados": [
+        {"username": "ceci", "password": "pw", "session_timeout": 30, "creado_por": 1},
+    ]})
+    assert client.post("/portal/login", data={"username": "ceci", "password": "pw"}).status_code == 200
+    n = len(firewall.comandos)
+    # Mismo usuario desde la misma IP: respuesta desde memoria, sin firewall
+    r = client.post("/portal/login", data={"username": "ceci", "password": "pw"})
+    assert r.status_code == 200 and "Sesión activa" in r.text
+    assert "Ya tienes acceso" in client.get("/portal/login").text
+    assert len(firewall.comandos) == n
+    scheduler.cancelar("testclient")
@@ -0,0 +1,76 @@
+import io
+import zipfile
+
+from sqlalchemy import select, text
+
+from app.db.session import SessionLocal, engine_radius
+from app.models.qr_code import QrCodes
+from app.services import qr_service
+from app.services.qr_service import cadena_wifi, clave_cache, renderizar_lote, iter_zip
+
+
+def test_cadena_wifi_escapa_caracteres_especiales():
+    cadena = cadena_wifi("ana;1", 'p:w,"x', ssid="Evento", tipo_auth="WPA2-EAP")
+    assert cadena.startswith("WIFI:T:WPA2-EAP;S:Evento;")
+    assert r"I:ana\;1;" in cadena and 'P:p\\:w\\,\\"x;;' in cadena
+    assert cadena_wifi("ana", "clave", ssid="Casa", tipo_auth="WPA") == "WIFI:T:WPA;S:Casa;P:clave;;"
+    assert cadena_wifi("ana", None, ssid="Casa", tipo_auth="WPA") == "WIFI:T:WPA;S:Casa;;"
+
+
+def test_qr_de_invitado_usa_cache_y_etag(client):
+    uid = client.post("/users/", json={"username": "qr1", "password": "pw", "creado_por": 1}).json()["uid"]
+    r = client.get(f"/qr/{uid}")
+    assert r.status_code == 200 and r.content.startswith(b"\x89PNG")
+    aciertos = qr_service.cache.aciertos
+    r2 = client.get(f"/qr/{uid}", headers={"If-None-Match": r.headers["ETag"]})
+    assert r2.status_code == 304
+    assert qr_service.cache.aciertos == aciertos + 1
+    svg = client.get(f"/qr/{uid}", params={"formato": "svg"})
+    assert svg.headers["content-type"].startswith("image/svg+xml") and b"<svg" in svg.content
+
+
+def test_qr_codes_no_guarda_la_clave(client):
+    uid = client.post("/users/", json={"username": "qr2", "password": "secreta", "creado_por": 1}).json()["uid"]
+    r = client.get(f"/qr/{uid}")
+    # La imagen se arma con la clave de radcheck...
+    assert r.headers["ETag"] == f'"{clave_cache(cadena_wifi("qr2", "secreta"), "png")}"'
+    # ...pero en qr_codes solo queda la cadena sin el campo P:
+    with SessionLocal() as db:
+        guardada = db.execute(select(QrCodes.qr_string)).scalar()
+    assert guardada == cadena_wifi("qr2", None) and "secreta" not in guardada
+
+
+def test_sin_credencial_en_radius_no_hay_qr(client):
+    uids = [client.post("/users/", json={"username": u, "password": "pw", "creado_por": 1}).json()["uid"]
+            for u in ("qr3", "qr4")]
+    with engine_radius.begin() as conn:
+        conn.execute(text("DELETE FROM radcheck WHERE username = 'qr4'"))
+    assert client.get(f"/qr/{uids[0]}").status_code == 200
+    r = client.get(f"/qr/{uids[1]}")
+    assert r.status_code == 409
+    r = client.post("/qr/lote", json={"uids": uids})
+    assert r.status_code == 409 and uids[1] in r.json()["detail"]
+
+
+def test_lote_en_pool_de_procesos_como_zip(client):
+    invitados = [{"username": f"badge{i}", "password": f"pw{i}", "creado_por": 1} for i in range(20)]
+    creados = client.post("/users/bulk", json={"invitados": invitados}).json()["creados"]
+    r = client.post("/qr/lote", json={"uids": [c["uid"] for c in creados]})
+    assert r.status_code == 200
+    with zipfile.ZipFile(io.BytesIO(r.content)) as zf:
+        nombres = zf.namelist()
+        assert nombres == [f"badge{i}.png" for i in range(20)]
+        assert all(zf.read(n).startswith(b"\x89PNG") for n in nombres)
+    # segunda vez todo sale de la caché, sin tocar el pool
+    qr_service.cerrar_pool()
+    r2 = client.post("/qr/lote", json={"uids": [c["uid"] for c in creados]})
+    assert r2.content == r.content and qr_service._pool is None
+    assert client.post("/qr/lote", json={"uids": ["USR999999"]}).status_code == 404
+
+
+def test_zip_en_streaming_no_requiere_seek():
+    items = [("a", "WIFI:T:WPA;S:x;P:1;;"), ("b", "WIFI:T:WPA;S:x;P:2;;")]
+    partes = list(iter_zip(renderizar_lote(items, "svg", min_pool=100)))
+    assert len(partes) == 3
+    with zipfile.ZipFile(io.BytesIO(b"".join(partes))) as zf:
+        assert zf.namelist() == ["a", "b"]
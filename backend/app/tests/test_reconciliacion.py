@@ -0,0 +1,76 @@
+import pytest
+
+from app.services import network_service
+from app.services.lease_service import lease_de, leases_activos, registrar_lease
+from app.services.reconciliacion_service import reconciliar
+from app.services.scheduler_service import _revocar_vencida, scheduler
+
+
+@pytest.fixture
+def limpiar_scheduler():
+    yield
+    for ip in ("10.9.0.1", "10.9.0.2", "10.9.0.3"):
+        scheduler.cancelar(ip)
+
+
+@pytest.mark.parametrize("tipo", ["iptables", "ipset"])
+def test_reconstruye_firewall_desde_leases(bd, limpiar_scheduler, tipo):
+    fake = network_service.FakeExecutor()
+    backend = (network_service.IpsetBackend(fake, "test_set") if tipo == "ipset"
+               else network_service.IptablesBackend(fake))
+    network_service.configurar_backend(backend)
+    try:
+        # Simula una caída: el kernel conserva una IP vencida y otra sin lease,
+        # y perdió la de una sesión vigente
+        registrar_lease("10.9.0.1", "ana", 600)
+        registrar_lease("10.9.0.2", "beto", -5)
+        backend.autorizar("10.9.0.2")
+        backend.autorizar("10.9.0.3")
+
+        n = len(fake.comandos)
+        r = reconciliar()
+        assert r["agregadas"] == 1 and r["quitadas"] == 2 and r["leases_purgados"] == 1
+        # Una lectura y una escritura atómica
+        assert len(fake.comandos) - n == 2
+        assert backend.reglas_autorizadas() == {"10.9.0.1"}
+        assert set(leases_activos()) == {"10.9.0.1"}
+        assert 590 < scheduler.restante("10.9.0.1") <= 600
+
+        # Sin cambios: la segunda pasada no escribe
+        n = len(fake.comandos)
+        assert reconciliar()["agregadas"] == 0
+        assert len(fake.comandos) - n == 1
+    finally:
+        network_service.configurar_backend(None)
+
+
+def test_revocacion_respeta_lease_extendido(bd, firewall, limpiar_scheduler):
+    network_service.autorizar_usuario("10.9.0.1")
+    # Otro worker renovó la sesión: el vencimiento local se reprograma
+    registrar_lease("10.9.0.1", "ana", 300)
+    _revocar_vencida("10.9.0.1")
+    assert ("FORWARD", "-s", "10.9.0.1", "-j", "ACCEPT") in firewall.reglas
+    assert scheduler.restante("10.9.0.1") > 290
+
+    # Lease ya vencido: se revoca y se libera
+    registrar_lease("10.9.0.1", "ana", -1)
+    _revocar_vencida("10.9.0.1")
+    assert ("FORWARD", "-s", "10.9.0.1", "-j", "ACCEPT") not in firewall.reglas
+    assert lease_de("10.9.0.1") is None
+
+
+def test_login_entre_lecturas_no_pierde_la_ip(bd, firewall, limpiar_scheduler, monkeypatch):
+    backend = network_service.obtener_backend()
+    leer_kernel = backend.reglas_autorizadas
+
+    def login_y_leer():
+        # Un login de otro worker cae entre la lectura de leases y la del kernel
+        registrar_lease("10.9.0.2", "beto", 600)
+        network_service.autorizar_usuario("10.9.0.2")
+        return leer_kernel()
+
+    monkeypatch.setattr(backend, "reglas_autorizadas", login_y_leer)
+    r = reconciliar()
+    assert r["quitadas"] == 0
+    assert ("FORWARD", "-s", "10.9.0.2", "-j", "ACCEPT") in firewall.reglas
+    assert 590 < scheduler.restante("10.9.0.2") <= 601
@@ -0,0 +1,99 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.db.session import SessionLocal, engine_radius
+from app.models.invitado import UsuarioInvitado
+from app.services.coa_service import StubNasServer
+from app.services.scheduler_service import scheduler
+
+
+@pytest.fixture
+def nas():
+    """NAS falso en su propio hilo/loop; la app le envía los Disconnect-Request."""
+    stub = StubNasServer(settings.COA_SECRET)
+    loop = asyncio.new_event_loop()
+    listo = threading.Event()
+
+    def correr():
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(stub.iniciar())
+        listo.set()
+        loop.run_forever()
+
+    hilo = threading.Thread(target=correr, daemon=True)
+    hilo.start()
+    listo.wait(5)
+    puerto_original = settings.COA_PORT
+    settings.COA_PORT = stub.port
+    yield stub
+    settings.COA_PORT = puerto_original
+    loop.call_soon_threadsafe(stub.detener)
+    loop.call_soon_threadsafe(loop.stop)
+    hilo.join(5)
+
+
+def test_revocar_evento_completo(client, firewall, nas):
+    lote = [{"username": f"ev{i}", "password": "pw", "session_timeout": 60, "creado_por": 1} for i in range(300)]
+    client.post("/users/bulk", json={"invitados": lote})
+    for i in range(300):
+        ip = f"10.1.{i // 250}.{i % 250}"
+        firewall.run(["sudo", "iptables", "-I", "FORWARD", "-s", ip, "-j", "ACCEPT"])
+        scheduler.programar(ip, 3600, f"ev{i}")
+    firewall.comandos.clear()
+
+    inicio = time.perf_counter()
+    r = client.post("/users/revoke", json={"usernames": [f"ev{i}" for i in range(300)] + ["fantasma"]})
+    duracion = time.perf_counter() - inicio
+    cuerpo = r.json()
+    assert r.status_code == 200 and cuerpo["revocados"] == 300
+    assert duracion < 5
+
+    primero, ultimo = cuerpo["resultados"][0], cuerpo["resultados"][-1]
+    assert primero["coa"]["ok"] and primero["radius"] and primero["firewall"] == [{"ip": "10.1.0.0", "ok": True}]
+    assert ultimo == {"username": "fantasma", "encontrado": False}
+    assert len(nas.recibidos) == 300
+    # Firewall: una lectura y un solo iptables-restore para las 300 IPs
+    assert [c[1] for c in firewall.comandos] == ["iptables-save", "iptables-restore"]
+    assert not [r for r in firewall.reglas if r[1] == "-s"]
+    assert scheduler.restante("10.1.0.0") is None and scheduler.restante("10.1.1.49") is None
+    with engine_radius.connect() as conn:
+        assert conn.execute(text("SELECT COUNT(*) FROM radcheck")).scalar() == 0
+    db = SessionLocal()
+    try:
+        assert {e for (e,) in db.query(UsuarioInvitado.estado)} == {"revocado"}
+    finally:
+        db.close()
+
+
+def test_eliminar_invitado_revoca_todo(client, nas):
+    uid = client.post("/users/", json={"username": "borrar", "password": "pw", "creado_por": 1}).json()["uid"]
+    r = client.delete(f"/users/{uid}")
+    assert r.status_code == 200
+    assert r.json()["revocacion"]["coa"]["ok"] is True
+    assert client.get(f"/users/{uid}").status_code == 404
+    with engine_radius.connect() as conn:
+        assert conn.execute(text("SELECT COUNT(*) FROM radcheck WHERE username = 'borrar'")).scalar() == 0
+
+
+def test_revocado_no_vuelve_a_entrar(client, firewall, nas):
+    from app.services.credencial_service import verificador
+    from app.services.sesion_ip_service import indice_sesiones
+
+    client.post("/users/bulk", json={"invitados": [
+        {"username": "rita", "password": "pw", "session_timeout": 30, "creado_por": 1},
+    ]})
+    assert client.post("/portal/login", data={"username": "rita", "password": "pw"}).status_code == 200
+    assert "rita" in verificador._por_usuario and indice_sesiones.sesion_vigente("testclient") is not None
+
+    assert client.post("/users/revoke", json={"usernames": ["rita"]}).json()["revocados"] == 1
+    # Ni la caché de credenciales ni el índice de sesiones la recuerdan
+    assert "rita" not in verificador._por_usuario
+    assert indice_sesiones.consultar("testclient") is None
+    r = client.post("/portal/login", data={"username": "rita", "password": "pw"})
+    assert r.status_code == 403 and "Sesión activa" not in r.text
+    assert ("FORWARD", "-s", "testclient", "-j", "ACCEPT") not in firewall.reglas
@@ -0,0 +1,92 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import insert, update, select
+
+from app.db.radius_schema import radacct
+from app.db.rollup_schema import uso_por_hora, rollup_checkpoint
+from app.db.session import engine_radius
+from app.services import rollup_service
+from app.services.rollup_service import ejecutar_rollup, consultar_uso
+
+H10 = datetime(2026, 3, 1, 10, 15)
+H11 = datetime(2026, 3, 1, 11, 5)
+
+
+def _actualizar(radacctid, ts, entrada, salida, segundos, stop=False):
+    valores = dict(acctupdatetime=ts, acctinputoctets=entrada, acctoutputoctets=salida, acctsessiontime=segundos)
+    if stop:
+        valores["acctstoptime"] = ts
+    with engine_radius.begin() as conn:
+        conn.execute(update(radacct).where(radacct.c.radacctid == radacctid).values(**valores))
+
+
+def test_rollup_incremental_por_hora_y_dia(bd):
+    with engine_radius.begin() as conn:
+        conn.execute(insert(radacct), [
+            dict(acctsessionid="s1", acctuniqueid="u1", username="ana", acctstarttime=H10, acctupdatetime=H10,
+                 acctinputoctets=100, acctoutputoctets=1000, acctsessiontime=0),
+            dict(acctsessionid="s2", acctuniqueid="u2", username="beto", acctstarttime=H10, acctupdatetime=H10,
+                 acctinputoctets=5, acctoutputoctets=5, acctsessiontime=0),
+        ])
+    assert ejecutar_rollup()["filas_procesadas"] == 2
+    # Sin cambios: la segunda corrida no suma nada aunque vuelva a ver filas del mismo segundo
+    ejecutar_rollup()
+    _actualizar(1, H11, 300, 4000, 3000, stop=True)
+    ejecutar_rollup()
+
+    serie = consultar_uso(["ana"], "hora")
+    assert [(s["periodo"].hour, s["bytes_in"], s["bytes_out"], s["sesiones"], s["segundos"]) for s in serie] == [
+        (10, 100, 1000, 1, 0),
+        (11, 200, 3000, 0, 3000),
+    ]
+    dia = consultar_uso(["ana", "beto"], "dia")
+    assert len(dia) == 1
+    assert (dia[0]["bytes_in"], dia[0]["sesiones"]) == (305, 2)
+
+    # Los agregados son la suma exacta de los contadores finales
+    with engine_radius.connect() as conn:
+        total = conn.execute(select(uso_por_hora.c.bytes_out).where(uso_por_hora.c.username == "ana")).scalars().all()
+    assert sum(total) == 4000
+
+
+def test_endpoints_de_uso(client):
+    with engine_radius.begin() as conn:
+        conn.execute(insert(radacct).values(acctsessionid="s1", acctuniqueid="u1", username="g0",
+                                            acctstarttime=H10, acctupdatetime=H10, acctinputoctets=7, acctoutputoctets=9))
+    client.post("/users/bulk", json={"invitados": [{"username": "g0", "password": "x", "creado_por": 3}]})
+    assert client.post("/monitor/uso/rollup").json()["filas_procesadas"] == 1
+    r = client.get("/monitor/uso/usuarios/g0", params={"granularidad": "dia"})
+    assert r.json()["serie"][0]["bytes_out"] == 9
+    r = client.get("/monitor/uso/admins/3", params={"desde": "2026-03-01T00:00:00"})
+    assert r.json()["invitados"] == 1 and r.json()["serie"][0]["bytes_in"] == 7
+
+
+def test_lotes_confirmados_sobreviven_a_un_corte(bd, monkeypatch):
+    with engine_radius.begin() as conn:
+        conn.execute(insert(radacct), [
+            dict(acctsessionid=f"s{i}", acctuniqueid=f"u{i}", username="ana", acctstarttime=H10,
+                 acctupdatetime=H10, acctinputoctets=10, acctoutputoctets=10, acctsessiontime=0)
+            for i in range(3)
+        ])
+    plegar = rollup_service._plegar
+    llamadas = []
+
+    def plegar_y_cortar(conn, filas):
+        llamadas.append(len(filas))
+        if len(llamadas) == 2:
+            raise RuntimeError("worker caído")
+        return plegar(conn, filas)
+
+    monkeypatch.setattr(rollup_service, "_plegar", plegar_y_cortar)
+    with pytest.raises(RuntimeError):
+        ejecutar_rollup(tam_lote=1)
+    # El primer lote quedó confirmado; el checkpoint no avanzó
+    assert consultar_uso(["ana"])[0]["bytes_in"] == 10
+    with engine_radius.connect() as conn:
+        assert conn.execute(select(rollup_checkpoint.c.ultimo_id)).scalar() == 0
+
+    monkeypatch.setattr(rollup_service, "_plegar", plegar)
+    assert ejecutar_rollup(tam_lote=1)["ultimo_id"] == 3
+    # Repetir la fila ya sumada no la cuenta dos veces
+    assert (consultar_uso(["ana"])[0]["bytes_in"], consultar_uso(["ana"])[0]["sesiones"]) == (30, 3)
@@ -0,0 +1,54 @@
+import threading
+import time
+
+from app.services.scheduler_service import ExpiryScheduler
+
+
+def _scheduler():
+    revocadas = []
+    evento = threading.Event()
+
+    def callback(ip):
+        revocadas.append(ip)
+        evento.set()
+
+    return ExpiryScheduler(callback), revocadas, evento
+
+
+def test_revoca_en_orden_de_vencimiento():
+    sched, revocadas, _ = _scheduler()
+    sched.programar("10.0.0.3", 0.15)
+    sched.programar("10.0.0.1", 0.05)
+    sched.programar("10.0.0.2", 0.10)
+    time.sleep(0.4)
+    assert revocadas == ["10.0.0.1", "10.0.0.2", "10.0.0.3"]
+    assert sched.pendientes() == 0
+    sched.detener()
+
+
+def test_cancelar_y_extender():
+    sched, revocadas, evento = _scheduler()
+    sched.programar("10.0.0.1", 0.05)
+    sched.programar("10.0.0.2", 0.05)
+    assert sched.cancelar("10.0.0.1")
+    assert not sched.cancelar("10.0.0.9")
+    assert sched.extender("10.0.0.2", 0.2) is not None
+    time.sleep(0.15)
+    assert revocadas == []
+    assert evento.wait(1)
+    assert revocadas == ["10.0.0.2"]
+    sched.detener()
+
+
+def test_miles_de_revocaciones_pendientes():
+    sched, revocadas, _ = _scheduler()
+    for i in range(5000):
+        sched.programar(f"10.1.{i // 256}.{i % 256}", 3600 + i)
+    assert sched.pendientes() == 5000
+    # Reprogramar todas no debe dejar crecer el heap indefinidamente
+    for i in range(5000):
+        sched.programar(f"10.1.{i // 256}.{i % 256}", 7200)
+    assert sched.pendientes() == 5000
+    assert len(sched._heap) <= 4 * 5000
+    sched.detener()
+    assert revocadas == []
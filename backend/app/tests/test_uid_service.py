@@ -0,0 +1,41 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from app.db.session import SessionLocal
+from app.models.admin import Administrador
+from app.models.invitado import UsuarioInvitado
+from app.services.uid_service import UidAllocator
+
+
+def test_siembra_desde_uids_existentes_con_orden_numerico(bd):
+    db = SessionLocal()
+    for uid in ("ADM2", "ADM9", "ADM10"):
+        db.add(Administrador(uid=uid, nombre=uid, correo=f"{uid}@x.com", password="x"))
+    db.commit()
+    db.close()
+    allocator = UidAllocator(bloque=5)
+    assert allocator.siguiente("ADM") == "ADM11"
+    assert allocator.siguiente("ADM") == "ADM12"
+    assert allocator.reservar("ADM", 3) == ["ADM16", "ADM17", "ADM18"]
+
+
+def test_uids_unicos_con_varios_procesos_en_paralelo(bd):
+    # Cuatro asignadores simulan cuatro workers que comparten la misma BD
+    workers = [UidAllocator(bloque=25) for _ in range(4)]
+
+    def crear(i):
+        uid = workers[i % 4].siguiente("USR")
+        db = SessionLocal()
+        try:
+            db.add(UsuarioInvitado(uid=uid, username=f"u{i}", password="x", creado_por=1))
+            db.commit()
+        finally:
+            db.close()
+        return uid
+
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        uids = list(pool.map(crear, range(2000)))
+
+    assert len(set(uids)) == 2000
+    db = SessionLocal()
+    assert db.query(UsuarioInvitado).count() == 2000
+    db.close()
@@ -0,0 +1,248 @@
+"""
+Benchmark de carga sin infraestructura: levanta la app completa en el mismo
+proceso contra SQLite (bases principal y RADIUS), con firewall falso
+(FakeExecutor) y un NAS falso para CoA (StubNasServer), y la ejercita con
+una mezcla de peticiones a concurrencia configurable.
+
+    python benchmarks/load_bench.py --concurrencia 32 --peticiones 5000 --out carga.json
+    python benchmarks/load_bench.py --mezcla login=5,crear=1,listar=2,estado=6 --duracion 30
+
+Reporta por endpoint: peticiones, errores, peticiones/s y latencias
+p50/p95/p99 (ms). Con --base-dir se pueden reutilizar las bases entre
+corridas; por defecto se crean en un directorio temporal.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MEZCLA_POR_DEFECTO = "login=40,crear=10,listar=10,estado=35,desconectar=5"
+
+
+def _preparar_entorno(base_dir: str):
+    # Debe ocurrir antes de importar la app: Settings() lee el entorno al importar
+    os.environ.setdefault("MYSQL_MAIN_URL", f"sqlite:///{base_dir}/main.db?timeout=30")
+    os.environ.setdefault("MYSQL_RADIUS_URL", f"sqlite:///{base_dir}/radius.db?timeout=30")
+    os.environ.setdefault("FIREBASE_CREDENTIALS", f"{base_dir}/firebase.json")
+    # Sin jobs periódicos: solo se mide el camino de las peticiones
+    os.environ.setdefault("ROLLUP_INTERVALO_SEG", "0")
+    os.environ.setdefault("BARRIDO_INTERVALO_SEG", "0")
+    os.environ.setdefault("RECONCILIAR_INTERVALO_SEG", "0")
+    # Cada worker es una sola IP que hace cientos de logins: sin límite de intentos
+    os.environ.setdefault("LOGIN_RAFAGA_IP", "0")
+    os.environ.setdefault("LOGIN_RAFAGA_USUARIO", "0")
+    sys.path.insert(0, BACKEND)
+
+
+def percentil(valores: list[float], p: float) -> float:
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    k = (len(ordenados) - 1) * p / 100
+    bajo, alto = int(k), min(int(k) + 1, len(ordenados) - 1)
+    return ordenados[bajo] + (ordenados[alto] - ordenados[bajo]) * (k - bajo)
+
+
+def parsear_mezcla(texto: str) -> dict[str, int]:
+    mezcla = {}
+    for parte in texto.split(","):
+        nombre, _, peso = parte.partition("=")
+        mezcla[nombre.strip()] = int(peso or 1)
+    return mezcla
+
+
+class Carga:
+    """Estado compartido por los workers: invitados sembrados y latencias medidas."""
+
+    def __init__(self, semilla: int):
+        self.rng = random.Random(semilla)
+        self.invitados: list[dict] = []  # {"uid", "username", "password"}
+        self.latencias: dict[str, list[float]] = defaultdict(list)
+        self.errores: dict[str, int] = defaultdict(int)
+        self._siguiente = 0
+
+    def nuevo_username(self) -> str:
+        self._siguiente += 1
+        return f"carga{self._siguiente}"
+
+
+async def _op_login(c, carga):
+    inv = carga.rng.choice(carga.invitados)
+    return await c.post("/portal/login", data={"username": inv["username"], "password": inv["password"]})
+
+
+async def _op_crear(c, carga):
+    username = carga.nuevo_username()
+    r = await c.post("/users/", json={"username": username, "password": "pw", "session_timeout": 60, "creado_por": 1})
+    if r.status_code == 200:
+        carga.invitados.append({"uid": r.json()["uid"], "username": username, "password": "pw"})
+    return r
+
+
+async def _op_listar(c, carga):
+    return await c.get("/users/", params={"limit": 100})
+
+
+async def _op_estado(c, carga):
+    return await c.get(f"/users/{carga.rng.choice(carga.invitados)['uid']}/estado")
+
+
+async def _op_desconectar(c, carga):
+    return await c.post(f"/users/{carga.rng.choice(carga.invitados)['username']}/desconectar")
+
+
+OPERACIONES = {
+    "login": _op_login,
+    "crear": _op_crear,
+    "listar": _op_listar,
+    "estado": _op_estado,
+    "desconectar": _op_desconectar,
+}
+
+
+async def _worker(n: int, app, carga: Carga, mezcla: dict[str, int], fin, contador: list[int]):
+    import httpx
+
+    nombres, pesos = list(mezcla), list(mezcla.values())
+    # Cada worker simula un cliente distinto (el portal autoriza por IP)
+    transporte = httpx.ASGITransport(app=app, client=(f"10.{n // 250}.{n % 250}.10", 40000 + n))
+    async with httpx.AsyncClient(transport=transporte, base_url="http://nac") as c:
+        while not fin(contador[0]):
+            contador[0] += 1
+            nombre = carga.rng.choices(nombres, pesos)[0]
+            inicio = time.perf_counter()
+            try:
+                r = await OPERACIONES[nombre](c, carga)
+                ok = r.status_code < 400
+            except Exception:
+                ok = False
+            carga.latencias[nombre].append(time.perf_counter() - inicio)
+            if not ok:
+                carga.errores[nombre] += 1
+
+
+async def ejecutar(args) -> dict:
+    import httpx
+    from sqlalchemy import insert
+
+    import main
+    from app.core.config import settings
+    from app.db.base_class import Base
+    from app.db.radius_schema import radius_metadata
+    from app.db.rollup_schema import rollup_metadata
+    from app.db.session import get_engine_main, get_engine_radius
+    from app.models.admin import Administrador
+    from app.services import network_service
+    from app.services.coa_service import StubNasServer
+
+    Base.metadata.create_all(get_engine_main())
+    radius_metadata.create_all(get_engine_radius())
+    rollup_metadata.create_all(get_engine_radius())
+    with get_engine_main().begin() as conn:
+        if conn.execute(Administrador.__table__.select().limit(1)).first() is None:
+            conn.execute(insert(Administrador), [{"uid": "ADM1", "nombre": "bench", "correo": "bench@nac",
+                                                 "rol": "admin", "password": "x"}])
+
+    fake = network_service.FakeExecutor()
+    backend = (network_service.IpsetBackend(fake, settings.IPSET_NAME) if args.firewall == "ipset"
+               else network_service.IptablesBackend(fake))
+    network_service.configurar_backend(backend)
+    nas = StubNasServer(settings.COA_SECRET)
+    settings.COA_HOST, settings.COA_PORT = "127.0.0.1", await nas.iniciar()
+
+    carga = Carga(args.semilla)
+    mezcla = parsear_mezcla(args.mezcla)
+    desconocidas = set(mezcla) - set(OPERACIONES)
+    if desconocidas:
+        raise SystemExit(f"Operaciones desconocidas en --mezcla: {sorted(desconocidas)}")
+
+    async with main.app.router.lifespan_context(main.app):
+        # Invitados de partida, con el mismo endpoint masivo que usaría un evento
+        transporte = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transporte, base_url="http://nac") as c:
+            for inicio in range(0, args.invitados, 1000):
+                lote = [
+                    {"username": carga.nuevo_username(), "password": "pw", "session_timeout": 60, "creado_por": 1}
+                    for _ in range(min(1000, args.invitados - inicio))
+                ]
+                r = await c.post("/users/bulk", json={"invitados": lote})
+                r.raise_for_status()
+                carga.invitados += [{"uid": x["uid"], "username": x["username"], "password": "pw"}
+                                    for x in r.json()["creados"]]
+
+        contador = [0]
+        if args.duracion:
+            limite = time.perf_counter() + args.duracion
+            fin = lambda _: time.perf_counter() >= limite  # noqa: E731
+        else:
+            fin = lambda hechas: hechas >= args.peticiones  # noqa: E731
+        inicio = time.perf_counter()
+        await asyncio.gather(*(
+            _worker(n, main.app, carga, mezcla, fin, contador) for n in range(args.concurrencia)
+        ))
+        total_s = time.perf_counter() - inicio
+    nas.detener()
+
+    endpoints = {}
+    for nombre, valores in sorted(carga.latencias.items()):
+        endpoints[nombre] = {
+            "peticiones": len(valores),
+            "errores": carga.errores.get(nombre, 0),
+            "rps": round(len(valores) / total_s, 1),
+            "media_ms": round(statistics.fmean(valores) * 1000, 2),
+            "p50_ms": round(percentil(valores, 50) * 1000, 2),
+            "p95_ms": round(percentil(valores, 95) * 1000, 2),
+            "p99_ms": round(percentil(valores, 99) * 1000, 2),
+        }
+    total = sum(len(v) for v in carga.latencias.values())
+    return {
+        "config": {
+            "concurrencia": args.concurrencia, "mezcla": mezcla, "invitados_iniciales": args.invitados,
+            "firewall": args.firewall, "python": sys.version.split()[0],
+        },
+        "total": {"peticiones": total, "segundos": round(total_s, 2), "rps": round(total / total_s, 1)},
+        "endpoints": endpoints,
+    }
+
+
+def imprimir_tabla(resultado: dict):
+    print(f"{'endpoint':<12} {'n':>7} {'err':>5} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8}  (ms)")
+    for nombre, e in resultado["endpoints"].items():
+        print(f"{nombre:<12} {e['peticiones']:>7} {e['errores']:>5} {e['rps']:>8} "
+              f"{e['p50_ms']:>8} {e['p95_ms']:>8} {e['p99_ms']:>8}")
+    t = resultado["total"]
+    print(f"{'total':<12} {t['peticiones']:>7} {'':>5} {t['rps']:>8}   en {t['segundos']} s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrencia", type=int, default=16, help="clientes simultáneos")
+    parser.add_argument("--peticiones", type=int, default=2000, help="total de peticiones (si no hay --duracion)")
+    parser.add_argument("--duracion", type=float, default=0, help="segundos de carga; reemplaza a --peticiones")
+    parser.add_argument("--mezcla", default=MEZCLA_POR_DEFECTO, help="pesos por operación, p. ej. login=4,estado=6")
+    parser.add_argument("--invitados", type=int, default=1000, help="invitados creados antes de medir")
+    parser.add_argument("--firewall", choices=("iptables", "ipset"), default="ipset")
+    parser.add_argument("--semilla", type=int, default=1)
+    parser.add_argument("--base-dir", help="directorio de las bases SQLite (por defecto, uno temporal)")
+    parser.add_argument("--out", help="archivo JSON donde guardar los resultados")
+    args = parser.parse_args()
+
+    base_dir = args.base_dir or tempfile.mkdtemp(prefix="mininac-carga-")
+    _preparar_entorno(base_dir)
+    resultado = asyncio.run(ejecutar(args))
+    imprimir_tabla(resultado)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(resultado, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
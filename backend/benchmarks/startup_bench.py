@@ -0,0 +1,68 @@
+"""
+Benchmark de arranque: tiempo de `import main` y tiempo hasta la primera
+respuesta (lifespan de arranque + GET /), cada medición en un proceso nuevo.
+
+    python benchmarks/startup_bench.py --runs 5 --out startup.json
+
+Usa SQLite en un directorio temporal, así que no necesita MySQL ni Firebase.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MEDICION = r"""
+import json, time
+t0 = time.perf_counter()
+import main
+t1 = time.perf_counter()
+from fastapi.testclient import TestClient
+with TestClient(main.app) as client:
+    client.get("/")
+    t2 = time.perf_counter()
+print(json.dumps({"import_s": t1 - t0, "primera_respuesta_s": t2 - t0}))
+"""
+
+
+def medir_una_vez(env) -> dict:
+    salida = subprocess.run(
+        [sys.executable, "-c", MEDICION], cwd=BACKEND, env=env,
+        check=True, capture_output=True, text=True,
+    )
+    return json.loads(salida.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--out", help="archivo JSON donde guardar los resultados")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="mininac-startup-")
+    env = dict(os.environ)
+    env.setdefault("MYSQL_MAIN_URL", f"sqlite:///{tmp}/main.db")
+    env.setdefault("MYSQL_RADIUS_URL", f"sqlite:///{tmp}/radius.db")
+    env.setdefault("FIREBASE_CREDENTIALS", f"{tmp}/firebase.json")
+
+    medidas = [medir_una_vez(env) for _ in range(args.runs)]
+    resumen = {
+        clave: {
+            "mediana_ms": round(statistics.median(m[clave] for m in medidas) * 1000, 1),
+            "max_ms": round(max(m[clave] for m in medidas) * 1000, 1),
+        }
+        for clave in ("import_s", "primera_respuesta_s")
+    }
+    resumen["runs"] = args.runs
+    print(json.dumps(resumen, indent=2))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({"resumen": resumen, "medidas": medidas}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
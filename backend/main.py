@@ -1,20 +1,86 @@
-from fastapi import FastAPI
-from app.api import admin_router, invitados_router, portal_router 
-from app.db import base_class, session
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Response
+from app.api import admin_router, invitados_router, portal_router, monitor_router, qr_router, perfiles_router, export_router
+from app.core.config import settings
+from app.core.metrics import MetricsMiddleware, respuesta_metricas
+from app.core.sondeos import SondeosPortalMiddleware
+from app.db import session
+from app.db.init_db import crear_tablas_auxiliares
+from app.services.audit_service import auditoria
+from app.services.credencial_service import verificador
+from app.services.expiracion_service import tarea_barrido
+from app.services.fcm_service import outbox
+from app.services.monitor_service import session_feed
+from app.services.network_service import ip_autorizada
+from app.services.qr_service import cerrar_pool
+from app.services.reconciliacion_service import reconciliar_al_arrancar, tarea_espejo, tarea_reconciliacion
+from app.services.rollup_service import tarea_rollup
+from app.services.scheduler_service import scheduler
+from app.services.sesion_ip_service import indice_sesiones
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.concurrency import run_in_threadpool
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Arranque: aquí se toca la base de datos por primera vez (no al importar)
+    await run_in_threadpool(crear_tablas_auxiliares)
+    if outbox.persistir:
+        await run_in_threadpool(outbox.recuperar)
+    tarea_rollup.iniciar()
+    tarea_barrido.iniciar()
+    # Reconstruye el firewall desde los leases (reinicio o caída del proceso)
+    await run_in_threadpool(reconciliar_al_arrancar)
+    tarea_reconciliacion.iniciar()
+    if settings.SONDEOS_HABILITADOS:
+        tarea_espejo.iniciar()
+    if settings.SESIONES_IP_DESDE_FEED:
+        session_feed.agregar_oyente(indice_sesiones.aplicar_cambios)
+        session_feed.iniciar()
+    yield
+    # Apagado: detener hilos de fondo y cerrar pools
+    tarea_rollup.detener()
+    tarea_barrido.detener()
+    tarea_reconciliacion.detener()
+    tarea_espejo.detener()
+    session_feed.detener()
+    scheduler.detener()
+    await run_in_threadpool(outbox.detener)
+    await run_in_threadpool(auditoria.detener)
+    cerrar_pool()
+    verificador.cerrar()
+    await session.dispose_async_engines()
+    session.dispose_engines()
 
-app = FastAPI(title="Mini NAC Backend")
+
+app = FastAPI(title="Mini NAC Backend", lifespan=lifespan)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],  # Puedes restringirlo luego a tu dominio Flutter o ngrok
     allow_credentials=True,
     allow_methods=["*"],  # Permitir todos los métodos: GET, POST, OPTIONS, etc.
     allow_headers=["*"],  # Permitir todos los encabezados
+    expose_headers=["X-Next-Cursor"],  # Cursor de paginación para el cliente
 )
+if settings.METRICAS_HABILITADAS:
+    app.add_middleware(MetricsMiddleware, umbral_lento_ms=settings.METRICAS_LENTO_MS)
+if settings.SONDEOS_HABILITADOS:
+    # El más externo: los sondeos no pasan por CORS, métricas ni routing
+    app.add_middleware(SondeosPortalMiddleware, es_autorizada=ip_autorizada, url_login=settings.PORTAL_LOGIN_URL)
 # Routers
 app.include_router(admin_router.router)
 app.include_router(invitados_router.router)
 app.include_router(portal_router.router)
+app.include_router(monitor_router.router)
+app.include_router(qr_router.router)
+app.include_router(perfiles_router.router)
+app.include_router(export_router.router)
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    contenido, tipo = respuesta_metricas()
+    return Response(contenido, media_type=tipo)
 
 @app.get("/")
 def root():
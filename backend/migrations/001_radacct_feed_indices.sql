@@ -0,0 +1,10 @@
+-- Base de datos RADIUS
+-- Índice para el feed incremental de sesiones (monitor_service.obtener_cambios_sesiones).
+-- La consulta de cambios usa dos ramas unidas con UNION:
+--   * acctupdatetime >= :ts   -> idx_radacct_update (rango sobre la marca de agua)
+--   * radacctid > :id         -> PRIMARY KEY
+-- y MAX(acctupdatetime) para el cursor inicial se resuelve leyendo el extremo del índice.
+-- El esquema estándar de FreeRADIUS ya trae el índice sobre acctstoptime que usa la
+-- foto de sesiones activas (WHERE acctstoptime IS NULL).
+
+CREATE INDEX idx_radacct_update ON radacct (acctupdatetime, radacctid);
@@ -0,0 +1,12 @@
+-- Base de datos principal
+-- Índice para el barrido de invitados vencidos (expiracion_service.barrer_expirados):
+--   WHERE estado = 'activo' AND expiracion <= :ahora ORDER BY expiracion
+-- se resuelve como un rango sobre idx_invitados_estado_expiracion.
+CREATE INDEX idx_invitados_estado_expiracion ON usuarios_invitados (estado, expiracion);
+
+-- Desde este cambio la expiración se fija al crear el invitado. Las filas
+-- existentes con session_timeout se completan una sola vez; las que no tienen
+-- ni expiracion ni session_timeout quedan fuera del barrido.
+UPDATE usuarios_invitados
+SET expiracion = creado_en + INTERVAL session_timeout MINUTE
+WHERE expiracion IS NULL AND session_timeout > 0;
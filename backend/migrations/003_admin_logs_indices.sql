@@ -0,0 +1,9 @@
+-- Base de datos principal
+-- Índices para GET /admin/logs (audit_service.consultar_logs), que pagina por
+-- (fech, id) descendente y filtra por admin o por acción:
+--   * admin_id = :a [AND fech BETWEEN ...] -> idx_logs_admin_fech
+--   * accion = :x   [AND fech BETWEEN ...] -> idx_logs_accion_fech
+-- InnoDB agrega el id al final de cada índice secundario, así que el orden
+-- (fech, id) sale del propio índice sin ordenar en memoria.
+CREATE INDEX idx_logs_admin_fech ON admin_logs (admin_id, fech);
+CREATE INDEX idx_logs_accion_fech ON admin_logs (accion, fech);
@@ -0,0 +1,7 @@
+-- Base de datos RADIUS
+-- Perfiles de servicio (perfil_service): cada invitado tiene una fila en
+-- radusergroup y los atributos viven en radgroupreply. El esquema estándar de
+-- FreeRADIUS solo indexa radusergroup por username; mover todo un perfil
+-- (UPDATE radusergroup SET groupname = :hacia WHERE groupname = :desde)
+-- necesita también el índice por groupname.
+CREATE INDEX idx_radusergroup_groupname ON radusergroup (groupname);
@@ -0,0 +1,10 @@
+-- Base de datos principal
+-- qr_codes.qr_string ya no guarda la contraseña: la cadena completa se arma
+-- al pedir el QR con la clave de radcheck (qr_service.registrar_qrs). Las
+-- filas existentes se limpian una sola vez quitando el campo ";P:...;" de la
+-- cadena WIFI: (respetando los caracteres escapados con "\").
+-- Si QR_CACHE_DIR estaba configurado, borrar también ese directorio: sus
+-- imágenes contienen la contraseña y ya no se usan.
+UPDATE qr_codes
+SET qr_string = REGEXP_REPLACE(qr_string, ';P:([^;\\\\]|\\\\.)*;', ';')
+WHERE qr_string LIKE '%;P:%';
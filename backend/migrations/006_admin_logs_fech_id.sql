@@ -0,0 +1,6 @@
+-- Base de datos principal
+-- GET /admin/logs sin filtro de admin ni de acción pagina solo por
+-- ORDER BY fech DESC, id DESC [AND (fech, id) < cursor]. Ninguno de los
+-- índices de 003 empieza por fech: sin este, cada página recorría y ordenaba
+-- la tabla entera.
+CREATE INDEX idx_logs_fech_id ON admin_logs (fech, id);